@@ -0,0 +1,18 @@
+"""
+Benchmarks
+----------
+
+Throughput and memory benchmarks for the compiler pipeline.
+
+Run a benchmark with ``python -m benchmarks.<name>`` from the repository root.
+``--against REV`` runs the same measurement on another git revision and
+prints both results side by side.
+"""
+import os
+import sys
+
+# Set by benchmarks.common.run_against: import falconback from the
+# exported revision instead of the working tree.
+_tree = os.environ.get('FALCON_BENCH_TREE')
+if _tree:
+    sys.path.insert(0, _tree)
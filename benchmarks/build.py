@@ -0,0 +1,82 @@
+"""
+Build benchmark
+---------------
+
+Wall time of ``falcon build -j N`` on a cold cache over distinct copies of
+the ``tests/*.flc`` programs. With enough programs the time should be close
+to the ``-j 1`` time divided by ``min(N, cores)``.
+
+    python -m benchmarks.build --programs 48 --jobs 1,2,4
+"""
+import glob
+import os
+import shutil
+import tempfile
+
+from falconback import build
+from benchmarks.common import ROOT, best_of, main
+
+
+def add_arguments(argparser):
+    argparser.add_argument('--programs', type=int, default=24)
+    argparser.add_argument('--jobs', default='1,2,4')
+    # every measurement runs g++, keep the default run short
+    argparser.set_defaults(repeat=1)
+
+
+def write_programs(count, directory):
+    programs = []
+    for path in sorted(glob.glob(os.path.join(ROOT, 'tests', '*.flc'))):
+        with open(path) as f:
+            programs.append(f.read())
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, 'p{}.flc'.format(i))
+        with open(path, 'w') as f:
+            # a distinct source per copy, so the cache cannot share builds
+            f.write('// copy {}\n'.format(i) + programs[i % len(programs)])
+        paths.append(path)
+    return paths
+
+
+def measure(args):
+    results = {}
+    work = tempfile.mkdtemp(prefix='falcon-bench-')
+    old_cache = os.environ.get('FALCON_CACHE_DIR')
+    try:
+        paths = write_programs(args.programs, work)
+        cache = os.path.join(work, 'cache')
+        os.environ['FALCON_CACHE_DIR'] = cache
+        # the runtime is built once per toolchain; keep it out of the timings
+        build.runtime()
+
+        def cold_build(jobs):
+            for name in os.listdir(cache):
+                if name != 'runtime':
+                    shutil.rmtree(os.path.join(cache, name))
+            return build.build_many(paths, jobs=jobs)
+
+        for jobs in [int(j) for j in args.jobs.split(',')]:
+            seconds, built = best_of(lambda: cold_build(jobs), args.repeat)
+            results['-j {}'.format(jobs)] = {
+                'programs': len(paths),
+                'failed': sum(result.executable is None for result in built),
+                'seconds': seconds,
+                'programs_per_sec': len(paths) / seconds,
+            }
+    finally:
+        if old_cache is None:
+            os.environ.pop('FALCON_CACHE_DIR', None)
+        else:
+            os.environ['FALCON_CACHE_DIR'] = old_cache
+        shutil.rmtree(work, ignore_errors=True)
+    return results
+
+
+if __name__ == '__main__':
+    main('benchmarks.build', measure, [
+        ('programs', 'programs', '{}'),
+        ('failed', 'failed', '{}'),
+        ('seconds', 'time', '{:.3f}s'),
+        ('programs_per_sec', 'programs/s', '{:,.2f}'),
+    ], add_arguments)
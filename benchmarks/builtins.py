@@ -0,0 +1,120 @@
+"""
+Builtins benchmark
+------------------
+
+Micro-benchmarks of the runtime builtins in ``falcon.h``. Each case is a
+small program built with ``falcon`` and timed as a whole, so it measures
+what generated code gets. Run it ``--against`` an older revision to catch
+regressions; the program outputs must stay identical.
+
+    python -m benchmarks.builtins --size 20000 --against HEAD~1
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+
+from falconback import build
+from benchmarks.common import main, run_executable
+
+# {size} is the number of elements; __cpp__ fills the containers since
+# Falcon has no way to grow them yet
+CASES = {
+    'len in loop condition': '''
+func main() -> i32:
+    let array = [0]
+    __cpp__:
+        "array.resize({size}, 1);"
+    let index = 0
+    let total = 0
+    while index < len(array):
+        total = total + array[index]
+        index = index + 1
+    println(total)
+    return 0
+''',
+    'print vector': '''
+func main() -> i32:
+    let array = [0]
+    __cpp__:
+        "array.resize({size}, 7);"
+    let i = 0
+    while i < 20:
+        println(array)
+        i = i + 1
+    return 0
+''',
+    'slice vector': '''
+func main() -> i32:
+    let array = [0]
+    __cpp__:
+        "array.resize({size}, 3);"
+    let i = 0
+    let total = 0
+    while i < 1000:
+        let part = slice(array, 0, {size} / 2)
+        total = total + len(part)
+        i = i + 1
+    println(total)
+    return 0
+''',
+    'slice string': '''
+func main() -> i32:
+    let text = "x"
+    __cpp__:
+        "text.assign({size}, 'x');"
+    let i = 0
+    let total = 0
+    while i < 1000:
+        let part = slice(text, 1, {size} / 2)
+        total = total + len(part)
+        i = i + 1
+    println(total)
+    return 0
+''',
+}
+
+
+def add_arguments(argparser):
+    argparser.add_argument('--size', type=int, default=20000, help='elements per container')
+    argparser.set_defaults(repeat=3)
+
+
+def measure(args):
+    results = {}
+    work = tempfile.mkdtemp(prefix='falcon-bench-')
+    old_cache = os.environ.get('FALCON_CACHE_DIR')
+    try:
+        os.environ['FALCON_CACHE_DIR'] = os.path.join(work, 'cache')
+        for i, (name, source) in enumerate(sorted(CASES.items())):
+            path = os.path.join(work, 'case{}.flc'.format(i))
+            with open(path, 'w') as f:
+                f.write(source.format(size=args.size))
+            executable = build.build(path)
+            best = None
+            for _ in range(args.repeat):
+                measured = run_executable(executable)
+                if best is None or measured[0] < best[0]:
+                    best = measured
+            seconds, peak, output = best
+            results[name] = {
+                'seconds': seconds,
+                'peak_bytes': peak,
+                'runs_per_sec': 1 / seconds,
+                'digest': hashlib.sha1(output).hexdigest(),
+            }
+    finally:
+        if old_cache is None:
+            os.environ.pop('FALCON_CACHE_DIR', None)
+        else:
+            os.environ['FALCON_CACHE_DIR'] = old_cache
+        shutil.rmtree(work, ignore_errors=True)
+    return results
+
+
+if __name__ == '__main__':
+    main('benchmarks.builtins', measure, [
+        ('seconds', 'time', '{:.4f}s'),
+        ('peak_bytes', 'peak memory', '{:,} B'),
+        ('runs_per_sec', 'runs/s', '{:,.1f}'),
+    ], add_arguments)
@@ -0,0 +1,142 @@
+"""
+Common
+------
+
+Synthetic corpora, timing and revision comparison shared by the benchmarks.
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def corpus(lines):
+    """
+    Concatenate the programs in ``tests`` until the source has at least
+    ``lines`` lines. Tabs are expanded so every copy indents the same way.
+    """
+    programs = []
+    for path in sorted(glob.glob(os.path.join(ROOT, 'tests', '*.flc'))):
+        with open(path) as f:
+            programs.append(f.read().expandtabs(4).strip('\n') + '\n\n')
+
+    chunk = ''.join(programs)
+    chunk_lines = chunk.count('\n')
+    return chunk * max(1, -(-lines // chunk_lines))
+
+
+def digest(items):
+    h = hashlib.sha1()
+    for item in items:
+        h.update(repr(item).encode('utf-8'))
+    return h.hexdigest()
+
+
+def best_of(func, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, result
+
+
+def run_executable(executable, stdin=None):
+    """
+    Run ``executable`` with the file ``stdin`` as its input, if given, and
+    return its wall time, peak RSS in bytes and output.
+    """
+    input_file = open(stdin, 'rb') if stdin is not None else None
+    start = time.perf_counter()
+    try:
+        process = subprocess.Popen([executable], stdin=input_file, stdout=subprocess.PIPE)
+        output = process.stdout.read()
+    finally:
+        if input_file is not None:
+            input_file.close()
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    seconds = time.perf_counter() - start
+    if process.returncode:
+        raise subprocess.CalledProcessError(process.returncode, executable)
+    return seconds, usage.ru_maxrss * 1024, output
+
+
+def run_against(module, rev, argv):
+    """Run ``module`` in worker mode on the falconback package of ``rev``."""
+    tree = tempfile.mkdtemp(prefix='falcon-bench-')
+    try:
+        archive = subprocess.run(['git', 'archive', rev, 'falconback'], cwd=ROOT, stdout=subprocess.PIPE, check=True)
+        subprocess.run(['tar', '-x', '-C', tree], input=archive.stdout, check=True)
+        env = dict(os.environ, FALCON_BENCH_TREE=tree)
+        out = subprocess.run([sys.executable, '-m', module, '--worker'] + argv,
+                             cwd=ROOT, env=env, stdout=subprocess.PIPE, check=True)
+        return json.loads(out.stdout.decode('utf-8'))
+    finally:
+        shutil.rmtree(tree, ignore_errors=True)
+
+
+def main(module, measure, columns, add_arguments=None):
+    """
+    Shared command line driver.
+
+    ``measure(args)`` returns a dict of named results, each a dict of
+    metrics. ``columns`` lists the ``(metric, label, format)`` triples to
+    print. Results carrying a ``digest`` are checked to be identical across
+    revisions.
+    """
+    argparser = argparse.ArgumentParser(prog='python -m ' + module)
+    argparser.add_argument('--against', metavar='REV', help='also measure this git revision')
+    argparser.add_argument('--repeat', type=int, default=5)
+    argparser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    if add_arguments is not None:
+        add_arguments(argparser)
+    args, _ = argparser.parse_known_args()
+    argv = [a for a in sys.argv[1:] if a != '--worker']
+
+    results = measure(args)
+    if args.worker:
+        print(json.dumps(results))
+        return
+
+    rows = [('working tree', results)]
+    if args.against:
+        strip = []
+        skip = False
+        for a in argv:
+            if skip:
+                skip = False
+            elif a == '--against':
+                skip = True
+            elif not a.startswith('--against='):
+                strip.append(a)
+        rows.insert(0, (args.against, run_against(module, args.against, strip)))
+
+    for name in results:
+        print('\033[92m{}\033[0m'.format(name))
+        for label, result in rows:
+            if name not in result:
+                continue
+            cells = ['{:>14}'.format(label)]
+            for metric, title, fmt in columns:
+                if metric in result[name]:
+                    cells.append('{}: {}'.format(title, fmt.format(result[name][metric])))
+            print('  '.join(cells))
+        if len(rows) > 1 and name in rows[0][1]:
+            base, current = rows[0][1][name], results[name]
+            if 'digest' in base and base['digest'] != current['digest']:
+                print('\033[91m  output differs from {}\033[0m'.format(args.against))
+            for metric, title, fmt in columns:
+                if metric.endswith('_per_sec') and metric in base and base[metric]:
+                    print('  {} speedup: {:.2f}x'.format(title, current[metric] / base[metric]))
@@ -0,0 +1,50 @@
+"""
+Compile many benchmark
+----------------------
+
+Programs per second of ``compile_many`` over copies of the ``tests/*.flc``
+programs with a growing number of workers.
+
+    python -m benchmarks.compile_many --copies 40 --workers 1,2,4
+"""
+import glob
+import os
+
+from falconback import compile_many
+from benchmarks.common import ROOT, best_of, digest, main
+
+
+def add_arguments(argparser):
+    argparser.add_argument('--copies', type=int, default=40)
+    argparser.add_argument('--workers', default='1,2,4')
+    argparser.add_argument('--threads', action='store_true', help='use a thread pool instead of processes')
+
+
+def sources(copies):
+    programs = []
+    for path in sorted(glob.glob(os.path.join(ROOT, 'tests', '*.flc'))):
+        with open(path) as f:
+            programs.append((os.path.basename(path), f.read()))
+    return programs * copies
+
+
+def measure(args):
+    batch = sources(args.copies)
+    results = {}
+    for workers in [int(w) for w in args.workers.split(',')]:
+        seconds, compiled = best_of(lambda: compile_many(batch, workers=workers, processes=not args.threads), args.repeat)
+        results['{} workers'.format(workers)] = {
+            'programs': len(batch),
+            'seconds': seconds,
+            'programs_per_sec': len(batch) / seconds,
+            'digest': digest(result.code for result in compiled),
+        }
+    return results
+
+
+if __name__ == '__main__':
+    main('benchmarks.compile_many', measure, [
+        ('programs', 'programs', '{}'),
+        ('seconds', 'time', '{:.3f}s'),
+        ('programs_per_sec', 'programs/s', '{:,.0f}'),
+    ], add_arguments)
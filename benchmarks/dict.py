@@ -0,0 +1,152 @@
+"""
+Dict benchmark
+--------------
+
+Run time and peak memory of compiled programs that are dominated by hash
+map lookups: integer keys probed with a mix of hits and misses, and a
+word count over the lines of a file. Each ``dict`` program is timed next
+to the same loop over ``std::unordered_map``.
+
+    python -m benchmarks.dict --keys 1000000 --lookups 20000000 --words 5000000
+"""
+import os
+import random
+import shutil
+import tempfile
+
+from falconback import build, interpreter
+from benchmarks.common import main, run_executable
+
+# keys are i * 2654435761 mod 2**32, which are distinct; lookups ask for
+# twice as many keys as were inserted, so half of them miss
+LOOKUP = '''
+    let i: i64 = 0
+    while i < {keys}:
+        table[i * 2654435761 % 4294967296] = i
+        i = i + 1
+    let total: i64 = 0
+    let j: i64 = 0
+    while j < {lookups}:
+        let key: i64 = j * 7919 % (2 * {keys}) * 2654435761 % 4294967296
+        if contains(table, key):
+            total = total + table[key]
+        j = j + 1
+    println(total)
+    return 0
+'''
+
+# (builtin needed, input, program); {path} is the input file
+CASES = {
+    'dict lookup': ('contains', None, '''
+func main() -> i32:
+    let table: dict[i64, i64] = {}
+''' + LOOKUP),
+    'unordered_map lookup': (None, None, '''
+__cpp__:
+    "#include <unordered_map>"
+
+func main() -> i32:
+    let i: i64 = 0
+    let total: i64 = 0
+    __cpp__:
+        "std::unordered_map<i64, i64> table;"
+        "for (; i < {keys}; i++) table[i * 2654435761 % 4294967296] = i;"
+        "for (i64 j = 0; j < {lookups}; j++) {"
+        "i64 key = j * 7919 % (2 * {keys}) * 2654435761 % 4294967296;"
+        "if (table.count(key)) total += table[key];"
+        "}"
+    println(total)
+    return 0
+'''),
+    'dict words': ('contains', 'words', '''
+func main() -> i32:
+    let fp = open("{path}", "r")
+    let counts: dict[string, i64] = {}
+    for line in lines(fp):
+        counts[line] = counts[line] + 1
+    closefile(fp)
+    println(len(counts))
+    println(counts["w1"])
+    return 0
+'''),
+    'unordered_map words': ('lines', 'words', '''
+__cpp__:
+    "#include <unordered_map>"
+
+func main() -> i32:
+    let fp = open("{path}", "r")
+    let size = 0
+    let first = 0
+    __cpp__:
+        "std::unordered_map<string, i64> counts;"
+        "for (strview line : lines(fp)) counts[string(line)]++;"
+        "size = counts.size(); first = counts[\\"w1\\"];"
+    closefile(fp)
+    println(size)
+    println(first)
+    return 0
+'''),
+}
+
+
+def add_arguments(argparser):
+    argparser.add_argument('--keys', type=int, default=1000000, help='integer keys to insert')
+    argparser.add_argument('--lookups', type=int, default=20000000, help='integer keys to look up')
+    argparser.add_argument('--words', type=int, default=5000000, help='lines of the word count input')
+    argparser.add_argument('--vocabulary', type=int, default=100000, help='distinct words of the word count input')
+    argparser.set_defaults(repeat=3)
+
+
+def write_inputs(work, args):
+    rng = random.Random(17)
+    path = os.path.join(work, 'words.txt')
+    with open(path, 'w') as f:
+        for _ in range(args.words // 1000):
+            f.write(''.join('w{}\n'.format(rng.randrange(args.vocabulary)) for _ in range(1000)))
+    return {'words': path}
+
+
+def measure(args):
+    results = {}
+    work = tempfile.mkdtemp(prefix='falcon-bench-')
+    old_cache = os.environ.get('FALCON_CACHE_DIR')
+    try:
+        os.environ['FALCON_CACHE_DIR'] = os.path.join(work, 'cache')
+        inputs = write_inputs(work, args)
+        builtins = interpreter.create_global_env(exit_on_error=False)
+        for i, (name, (builtin, kind, source)) in enumerate(sorted(CASES.items())):
+            if builtin is not None and builtins.get(builtin) is None:
+                continue
+            path = os.path.join(work, 'case{}.flc'.format(i))
+            with open(path, 'w') as f:
+                f.write(source.replace('{keys}', str(args.keys)).replace('{lookups}', str(args.lookups))
+                        .replace('{path}', inputs.get(kind, '')))
+            executable = build.build(path)
+            best = None
+            for _ in range(args.repeat):
+                measured = run_executable(executable)
+                if best is None or measured[0] < best[0]:
+                    best = measured
+            seconds, peak, output = best
+            operations = args.keys + args.lookups if kind is None else args.words
+            results[name] = {
+                'seconds': seconds,
+                'peak_bytes': peak,
+                'operations_per_sec': operations / seconds,
+                'digest': output.decode('utf-8').strip(),
+            }
+    finally:
+        if old_cache is None:
+            os.environ.pop('FALCON_CACHE_DIR', None)
+        else:
+            os.environ['FALCON_CACHE_DIR'] = old_cache
+        shutil.rmtree(work, ignore_errors=True)
+    return results
+
+
+if __name__ == '__main__':
+    main('benchmarks.dict', measure, [
+        ('seconds', 'time', '{:.3f}s'),
+        ('peak_bytes', 'peak memory', '{:,} B'),
+        ('operations_per_sec', 'operations', '{:,.0f}/s'),
+    ], add_arguments)
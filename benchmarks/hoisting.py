@@ -0,0 +1,82 @@
+"""
+Hoisting benchmark
+------------------
+
+Run time of a compiled program whose loop asks a dict the same question
+on every iteration and compares against ``len`` of an array it does not
+change. Run it ``--against`` a revision that evaluates loop conditions
+and bodies verbatim to see what the repeated calls cost.
+
+    python -m benchmarks.hoisting --iterations 20000000 --against HEAD~1
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+
+from falconback import build, interpreter
+from benchmarks.common import main, run_executable
+
+PROGRAM = '''
+func scan(table: dict[string, i64], key: string, items, count: i64) -> i64:
+    let total: i64 = 0
+    let i: i64 = 0
+    while i < count:
+        if contains(table, key):
+            total = total + len(items)
+        i = i + 1
+    return total
+
+func main() -> i32:
+    let table: dict[string, i64] = {}
+    table["{key}"] = 1
+    let items = [1, 2, 3, 4, 5, 6, 7, 8]
+    println(scan(table, "{key}", items, {iterations}))
+    return 0
+'''
+
+
+def add_arguments(argparser):
+    argparser.add_argument('--iterations', type=int, default=20000000, help='iterations of the loop')
+    argparser.set_defaults(repeat=3)
+
+
+def measure(args):
+    results = {}
+    builtins = interpreter.create_global_env(exit_on_error=False)
+    if builtins.get('contains') is None:
+        return results
+    work = tempfile.mkdtemp(prefix='falcon-bench-')
+    old_cache = os.environ.get('FALCON_CACHE_DIR')
+    try:
+        os.environ['FALCON_CACHE_DIR'] = os.path.join(work, 'cache')
+        path = os.path.join(work, 'hoisting.flc')
+        with open(path, 'w') as f:
+            # the key is longer than the small string buffer, so hashing it walks memory
+            f.write(PROGRAM.replace('{key}', 'k' * 32).replace('{iterations}', str(args.iterations)))
+        executable = build.build(path)
+        best = None
+        for _ in range(args.repeat):
+            measured = run_executable(executable)
+            if best is None or measured[0] < best[0]:
+                best = measured
+        seconds, peak, output = best
+        results['{:,} iterations'.format(args.iterations)] = {
+            'seconds': seconds,
+            'iterations_per_sec': args.iterations / seconds,
+            'digest': hashlib.sha1(output).hexdigest(),
+        }
+    finally:
+        if old_cache is None:
+            os.environ.pop('FALCON_CACHE_DIR', None)
+        else:
+            os.environ['FALCON_CACHE_DIR'] = old_cache
+        shutil.rmtree(work, ignore_errors=True)
+    return results
+
+
+if __name__ == '__main__':
+    main('benchmarks.hoisting', measure, [
+        ('seconds', 'time', '{:.3f}s'),
+        ('iterations_per_sec', 'iterations/s', '{:,.0f}'),
+    ], add_arguments)
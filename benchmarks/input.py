@@ -0,0 +1,120 @@
+"""
+Input benchmark
+---------------
+
+Run time of compiled programs that parse a large input: summing integers
+from standard input, and measuring the lines of a file. Each builtin is
+timed next to the iostream code a program had to inline before it, which
+also keeps stdio synced since the program mixes in C++.
+
+    python -m benchmarks.input --numbers 5000000 --lines 2000000
+"""
+import os
+import random
+import shutil
+import tempfile
+
+from falconback import build, interpreter
+from benchmarks.common import main, run_executable
+
+# (builtin needed, input, program); {path} is the input file
+CASES = {
+    'read_i64': ('read_i64', 'numbers', '''
+func main() -> i32:
+    let n = read_i64()
+    let total: i64 = 0
+    let i = 0
+    while i < n:
+        total = total + read_i64()
+        i = i + 1
+    println(total)
+    return 0
+'''),
+    'cin >> i64': (None, 'numbers', '''
+func main() -> i32:
+    let total: i64 = 0
+    __cpp__:
+        "i64 n, x; std::cin >> n; while (n-- > 0 && std::cin >> x) total += x;"
+    println(total)
+    return 0
+'''),
+    'lines': ('lines', 'lines', '''
+func main() -> i32:
+    let fp = open("{path}", "r")
+    let total = 0
+    for line in lines(fp):
+        total = total + len(line)
+    closefile(fp)
+    println(total)
+    return 0
+'''),
+    'getline': (None, 'lines', '''
+func main() -> i32:
+    let total = 0
+    __cpp__:
+        "std::ifstream in(\\"{path}\\"); string line; while (std::getline(in, line)) total += line.size();"
+    println(total)
+    return 0
+'''),
+}
+
+
+def add_arguments(argparser):
+    argparser.add_argument('--numbers', type=int, default=5000000, help='integers to sum')
+    argparser.add_argument('--lines', type=int, default=2000000, help='lines to measure')
+    argparser.set_defaults(repeat=3)
+
+
+def write_inputs(work, args):
+    rng = random.Random(17)
+    inputs = {'numbers': os.path.join(work, 'numbers.txt'), 'lines': os.path.join(work, 'lines.txt')}
+    with open(inputs['numbers'], 'w') as f:
+        f.write('{}\n'.format(args.numbers))
+        for _ in range(args.numbers // 10):
+            f.write(' '.join(str(rng.randint(-10 ** 9, 10 ** 9)) for _ in range(10)) + '\n')
+    with open(inputs['lines'], 'w') as f:
+        for _ in range(args.lines):
+            f.write('x' * rng.randint(0, 120) + '\n')
+    return inputs
+
+
+def measure(args):
+    results = {}
+    work = tempfile.mkdtemp(prefix='falcon-bench-')
+    old_cache = os.environ.get('FALCON_CACHE_DIR')
+    try:
+        os.environ['FALCON_CACHE_DIR'] = os.path.join(work, 'cache')
+        inputs = write_inputs(work, args)
+        builtins = interpreter.create_global_env(exit_on_error=False)
+        for i, (name, (builtin, kind, source)) in enumerate(sorted(CASES.items())):
+            if builtin is not None and builtins.get(builtin) is None:
+                continue
+            path = os.path.join(work, 'case{}.flc'.format(i))
+            with open(path, 'w') as f:
+                f.write(source.replace('{path}', inputs[kind]))
+            executable = build.build(path)
+            best = None
+            for _ in range(args.repeat):
+                measured = run_executable(executable, stdin=inputs[kind])
+                if best is None or measured[0] < best[0]:
+                    best = measured
+            seconds, peak, output = best
+            results[name] = {
+                'seconds': seconds,
+                'peak_bytes': peak,
+                'digest': output.decode('utf-8').strip(),
+            }
+    finally:
+        if old_cache is None:
+            os.environ.pop('FALCON_CACHE_DIR', None)
+        else:
+            os.environ['FALCON_CACHE_DIR'] = old_cache
+        shutil.rmtree(work, ignore_errors=True)
+    return results
+
+
+if __name__ == '__main__':
+    main('benchmarks.input', measure, [
+        ('seconds', 'time', '{:.3f}s'),
+        ('peak_bytes', 'peak memory', '{:,} B'),
+    ], add_arguments)
@@ -0,0 +1,83 @@
+"""
+Lexer benchmark
+---------------
+
+Tokens per second of ``Lexer.tokenize`` on a scaled-up ``tests/*.flc``
+corpus, and peak memory of tokenizing a file eagerly versus streaming it
+through ``LazyTokenStream``.
+
+    python -m benchmarks.lexer --lines 50000 --against HEAD~1
+"""
+import os
+import tempfile
+import tracemalloc
+
+from falconback import lexer
+from falconback.lexer import Lexer, TokenStream
+from benchmarks.common import best_of, corpus, digest, main
+
+
+def add_arguments(argparser):
+    argparser.add_argument('--lines', type=int, default=50000)
+
+
+def drain(tokens):
+    count = 0
+    while not tokens.is_end():
+        tokens.consume()
+        count += 1
+    return count
+
+
+def peak_memory(func):
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def measure(args):
+    source = corpus(args.lines)
+    seconds, tokens = best_of(lambda: Lexer('bench').tokenize(source), args.repeat)
+    results = {
+        'tokenize': {
+            'lines': source.count('\n'),
+            'tokens': len(tokens),
+            'seconds': seconds,
+            'tokens_per_sec': len(tokens) / seconds,
+            'digest': digest(tokens),
+        },
+    }
+    del tokens
+
+    fd, path = tempfile.mkstemp(suffix='.flc')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(source)
+        del source
+
+        def eager():
+            with open(path) as f:
+                return drain(TokenStream(Lexer(path).tokenize(f.read())))
+        results['eager file'] = {'peak_bytes': peak_memory(eager)}
+
+        if hasattr(lexer, 'LazyTokenStream'):
+            def streamed():
+                with open(path) as f:
+                    return drain(lexer.LazyTokenStream(Lexer(path).iter_tokens(f)))
+            results['streamed file'] = {'peak_bytes': peak_memory(streamed)}
+    finally:
+        os.remove(path)
+
+    return results
+
+
+if __name__ == '__main__':
+    main('benchmarks.lexer', measure, [
+        ('tokens', 'tokens', '{}'),
+        ('seconds', 'time', '{:.3f}s'),
+        ('tokens_per_sec', 'tokens/s', '{:,.0f}'),
+        ('peak_bytes', 'peak memory', '{:,} B'),
+    ], add_arguments)
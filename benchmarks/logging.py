@@ -0,0 +1,95 @@
+"""
+Logging benchmark
+-----------------
+
+Run time of a compiled program that calls ``logf`` in a loop, as a service
+logging every request does, built with the synchronous ``log``/``logf``
+and with ``--async-log``, where the call only stores a record and a
+background thread formats and writes it.
+
+    python -m benchmarks.logging --calls 1000000
+"""
+import os
+import shutil
+import tempfile
+
+from falconback import build
+from benchmarks.common import main, run_executable
+
+PROGRAM = '''
+func main() -> i32:
+    let fp = open("{path}", "w")
+    let i = 0
+    while i < {calls}:
+        logf(fp, i)
+        i = i + 1
+    closefile(fp)
+    return 0
+'''
+
+
+def add_arguments(argparser):
+    argparser.add_argument('--calls', type=int, default=1000000, help='logf calls')
+    argparser.set_defaults(repeat=3)
+
+
+def count_records(path):
+    # read in blocks: the next program forked would inherit a large heap
+    marker = b'(): fp @'
+    count = 0
+    tail = b''
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            block = tail + block
+            count += block.count(marker)
+            # a marker cut in two is found with the next block
+            tail = block[-(len(marker) - 1):]
+    return count
+
+
+def modes():
+    yield 'sync', build.CXXFLAGS
+    if 'async_log' in getattr(build, 'program_flags', lambda: None).__code__.co_varnames:
+        yield 'async', build.program_flags(async_log=True)
+
+
+def measure(args):
+    results = {}
+    work = tempfile.mkdtemp(prefix='falcon-bench-')
+    old_cache = os.environ.get('FALCON_CACHE_DIR')
+    try:
+        os.environ['FALCON_CACHE_DIR'] = os.path.join(work, 'cache')
+        log_path = os.path.join(work, 'program.log')
+        path = os.path.join(work, 'logging.flc')
+        with open(path, 'w') as f:
+            f.write(PROGRAM.format(path=log_path, calls=args.calls))
+        for mode, flags in modes():
+            executable = build.build(path, flags=flags)
+            best = None
+            for _ in range(args.repeat):
+                measured = run_executable(executable)
+                if best is None or measured[0] < best[0]:
+                    best = measured
+            written = count_records(log_path)
+            seconds, peak, _ = best
+            results[mode] = {
+                'seconds': seconds,
+                'peak_bytes': peak,
+                'calls_per_sec': args.calls / seconds,
+                'digest': written,
+            }
+    finally:
+        if old_cache is None:
+            os.environ.pop('FALCON_CACHE_DIR', None)
+        else:
+            os.environ['FALCON_CACHE_DIR'] = old_cache
+        shutil.rmtree(work, ignore_errors=True)
+    return results
+
+
+if __name__ == '__main__':
+    main('benchmarks.logging', measure, [
+        ('seconds', 'time', '{:.3f}s'),
+        ('peak_bytes', 'peak memory', '{:,} B'),
+        ('calls_per_sec', 'calls/s', '{:,.0f}'),
+    ], add_arguments)
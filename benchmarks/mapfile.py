@@ -0,0 +1,98 @@
+"""
+Mapfile benchmark
+-----------------
+
+Run time and peak memory of a compiled program that counts the lines of a
+large file read with ``readfile`` and with ``mapfile``. ``readfile`` copies
+the whole file into the heap, ``mapfile`` reads it in place from the page
+cache. The file is written once and read warm by both.
+
+    python -m benchmarks.mapfile --megabytes 1024
+"""
+import os
+import shutil
+import tempfile
+
+from falconback import build, interpreter
+from benchmarks.common import main, run_executable
+
+# __cpp__ does the counting so both programs spend the same time on it
+CASES = {
+    'readfile': '''
+func main() -> i32:
+    let fp = open("{path}", "r")
+    let data = readfile(fp)
+    closefile(fp)
+    let total = 0
+    __cpp__:
+        "for (const char *c = data.data(); c < data.data() + data.size(); c++) total += *c == '\\\\n';"
+    println(total)
+    return 0
+''',
+    'mapfile': '''
+func main() -> i32:
+    let data = mapfile("{path}")
+    let total = 0
+    __cpp__:
+        "for (const char *c = data.data(); c < data.data() + data.size(); c++) total += *c == '\\\\n';"
+    println(total)
+    unmapfile(data)
+    return 0
+''',
+}
+
+LINE = b'x' * 63 + b'\n'
+
+
+def add_arguments(argparser):
+    argparser.add_argument('--megabytes', type=int, default=1024, help='size of the input file')
+    argparser.set_defaults(repeat=3)
+
+
+def measure(args):
+    results = {}
+    work = tempfile.mkdtemp(prefix='falcon-bench-')
+    old_cache = os.environ.get('FALCON_CACHE_DIR')
+    try:
+        os.environ['FALCON_CACHE_DIR'] = os.path.join(work, 'cache')
+        data = os.path.join(work, 'input.txt')
+        block = LINE * (1024 * 1024 // len(LINE))
+        with open(data, 'wb') as f:
+            for _ in range(args.megabytes):
+                f.write(block)
+
+        builtins = interpreter.create_global_env(exit_on_error=False)
+        for name, source in sorted(CASES.items()):
+            if builtins.get(name) is None:
+                continue
+            path = os.path.join(work, name + '.flc')
+            with open(path, 'w') as f:
+                f.write(source.format(path=data))
+            executable = build.build(path)
+            best = None
+            for _ in range(args.repeat):
+                measured = run_executable(executable)
+                if best is None or measured[0] < best[0]:
+                    best = measured
+            seconds, peak, output = best
+            results[name] = {
+                'seconds': seconds,
+                'peak_bytes': peak,
+                'megabytes_per_sec': args.megabytes / seconds,
+                'digest': output.decode('utf-8').strip(),
+            }
+    finally:
+        if old_cache is None:
+            os.environ.pop('FALCON_CACHE_DIR', None)
+        else:
+            os.environ['FALCON_CACHE_DIR'] = old_cache
+        shutil.rmtree(work, ignore_errors=True)
+    return results
+
+
+if __name__ == '__main__':
+    main('benchmarks.mapfile', measure, [
+        ('seconds', 'time', '{:.3f}s'),
+        ('peak_bytes', 'peak memory', '{:,} B'),
+        ('megabytes_per_sec', 'throughput', '{:,.0f} MB/s'),
+    ], add_arguments)
@@ -0,0 +1,90 @@
+"""
+Nesting benchmark
+-----------------
+
+Time of transpiling machine generated expressions of growing depth: a
+long operator chain, nested groups and minuses, and calls, member calls
+and dict literals nested in each other's arguments. The time should grow
+linearly with the depth, and no shape may hit the recursion limit.
+
+    python -m benchmarks.nesting --depth 10000 --steps 3 --against HEAD~1
+"""
+import io
+import os
+
+from falconback import interpreter
+from benchmarks.common import best_of, digest, main
+
+try:
+    from falconback.writer import CodeWriter
+except ImportError:
+    CodeWriter = None
+
+PRELUDE = '''
+class Box:
+    let value: i32
+
+    func wrap(x: i32) -> i32:
+        return x
+
+func f(x: i32) -> i32:
+    return x
+
+func main() -> i32:
+    let a = 1
+    let box: Box = Box(1)
+'''
+
+# name -> expression of the given depth
+SHAPES = {
+    'chain': lambda depth: 'a' + ' + a' * depth,
+    'groups': lambda depth: '(' * depth + 'a' + ')' * depth,
+    'unary': lambda depth: '-' * depth + 'a',
+    'calls': lambda depth: 'f(' * depth + 'a' + ')' * depth,
+    'members': lambda depth: 'box::wrap(' * depth + 'a' + ')' * depth,
+    'dicts': lambda depth: '{1: ' * depth + 'a' + '}' * depth,
+}
+
+
+def add_arguments(argparser):
+    argparser.add_argument('--depth', type=int, default=10000, help='depth of the smallest expressions')
+    argparser.add_argument('--steps', type=int, default=3, help='number of doublings')
+
+
+def program(shape, depth):
+    return PRELUDE + '    let x = {}\n    return 0\n'.format(SHAPES[shape](depth))
+
+
+def transpile(source):
+    f = io.StringIO(source)
+    f.name = 'bench'
+    with open(os.devnull, 'w') as fw:
+        if CodeWriter is not None:
+            interpreter.evaluate(f, out=CodeWriter(fw))
+        else:
+            fw.write(interpreter.evaluate(f))
+
+
+def measure(args):
+    results = {}
+    for shape in sorted(SHAPES):
+        for step in range(args.steps):
+            depth = args.depth << step
+            source = program(shape, depth)
+            seconds, _ = best_of(lambda: transpile(source), args.repeat)
+            f = io.StringIO(source)
+            f.name = 'bench'
+            results['{} {}'.format(shape, depth)] = {
+                'depth': depth,
+                'seconds': seconds,
+                'levels_per_sec': depth / seconds,
+                'digest': digest([''.join(interpreter.evaluate(f).split())]),
+            }
+    return results
+
+
+if __name__ == '__main__':
+    main('benchmarks.nesting', measure, [
+        ('seconds', 'time', '{:.3f}s'),
+        ('levels_per_sec', 'levels/s', '{:,.0f}'),
+    ], add_arguments)
@@ -0,0 +1,103 @@
+"""
+Optimize benchmark
+------------------
+
+Size of the generated C++ and g++ time of a cold build for a program
+that carries a library of helpers it mostly does not call, constant
+expressions and branches behind constant flags, at every ``-O`` level
+of the transpiler. Revisions without the levels only measure ``-O0``. Class members share
+one scope, so every helper class names its own.
+
+    python -m benchmarks.optimize --helpers 400 --against HEAD~1
+"""
+import hashlib
+import inspect
+import io
+import os
+import shutil
+import tempfile
+
+from falconback import build, interpreter
+from benchmarks.common import best_of, main, run_executable
+
+HELPER = '''
+class Record{i}:
+    let id{i}: i64
+    let name{i}: string
+
+func helper{i}(n: i64, label: string) -> string:
+    let limit: i64 = 24 * 60 * 60 * ({i} + 1)
+    let record = Record{i}(n % limit, label + "-" + "{i}")
+    if 0:
+        println("helper{i} is disabled")
+    return record::name{i}
+'''
+
+MAIN = '''
+func main() -> i32:
+    let total: i64 = 0
+    let i: i64 = 0
+    while i < 1000 * 1000:
+        if 1 == 1:
+            total = total + i % (60 * 60)
+        i = i + 1
+    println(total)
+    println(helper0(total, "x"))
+    return 0
+'''
+
+
+def add_arguments(argparser):
+    argparser.add_argument('--helpers', type=int, default=200, help='helper functions and classes in the program')
+    # every measurement runs g++, keep the default run short
+    argparser.set_defaults(repeat=1)
+
+
+def measure(args):
+    results = {}
+    levels = [0, 1, 2] if 'optimize' in inspect.signature(build.build).parameters else [None]
+    work = tempfile.mkdtemp(prefix='falcon-bench-')
+    old_cache = os.environ.get('FALCON_CACHE_DIR')
+    try:
+        cache = os.path.join(work, 'cache')
+        os.environ['FALCON_CACHE_DIR'] = cache
+        # the runtime is built once per toolchain; keep it out of the timings
+        build.runtime()
+        source = ''.join(HELPER.replace('{i}', str(i)) for i in range(args.helpers)) + MAIN
+        path = os.path.join(work, 'optimize.flc')
+        with open(path, 'w') as f:
+            f.write(source)
+
+        for level in levels:
+            options = {} if level is None else {'optimize': level}
+            f = io.StringIO(source)
+            f.name = path
+            code = interpreter.evaluate(f, **options)
+
+            def cold_build():
+                for name in os.listdir(cache):
+                    if name != 'runtime':
+                        shutil.rmtree(os.path.join(cache, name))
+                return build.build(path, **options)
+
+            seconds, executable = best_of(cold_build, args.repeat)
+            output = run_executable(executable)[2]
+            results['-O{}'.format(0 if level is None else level)] = {
+                'code_bytes': len(code),
+                'seconds': seconds,
+                'digest': hashlib.sha1(output).hexdigest(),
+            }
+    finally:
+        if old_cache is None:
+            os.environ.pop('FALCON_CACHE_DIR', None)
+        else:
+            os.environ['FALCON_CACHE_DIR'] = old_cache
+        shutil.rmtree(work, ignore_errors=True)
+    return results
+
+
+if __name__ == '__main__':
+    main('benchmarks.optimize', measure, [
+        ('code_bytes', 'C++', '{:,} B'),
+        ('seconds', 'build', '{:.3f}s'),
+    ], add_arguments)
@@ -0,0 +1,71 @@
+"""
+Output benchmark
+----------------
+
+Run time of a compiled program that prints the ``tests/stars.flc``
+triangle at scale: many short ``print`` and ``println`` calls. Output goes
+to a pipe, as in a batch job. Run it ``--against`` a revision that writes
+every call to ``std::cout`` to see what the buffered sink saves.
+
+    python -m benchmarks.output --rows 3000 --against HEAD~1
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+
+from falconback import build
+from benchmarks.common import main, run_executable
+
+PROGRAM = '''
+func main() -> i32:
+    for i in 1 .. {rows}:
+        for j in 1 .. i:
+            print("*")
+        println("")
+        println(i)
+    return 0
+'''
+
+
+def add_arguments(argparser):
+    argparser.add_argument('--rows', type=int, default=3000, help='rows of the triangle')
+    argparser.set_defaults(repeat=3)
+
+
+def measure(args):
+    results = {}
+    work = tempfile.mkdtemp(prefix='falcon-bench-')
+    old_cache = os.environ.get('FALCON_CACHE_DIR')
+    try:
+        os.environ['FALCON_CACHE_DIR'] = os.path.join(work, 'cache')
+        path = os.path.join(work, 'stars.flc')
+        with open(path, 'w') as f:
+            f.write(PROGRAM.format(rows=args.rows))
+        executable = build.build(path)
+        best = None
+        for _ in range(args.repeat):
+            measured = run_executable(executable)
+            if best is None or measured[0] < best[0]:
+                best = measured
+        seconds, peak, output = best
+        calls = args.rows * (args.rows + 1) // 2 + 2 * args.rows
+        results['{:,} rows'.format(args.rows)] = {
+            'seconds': seconds,
+            'calls_per_sec': calls / seconds,
+            'digest': hashlib.sha1(output).hexdigest(),
+        }
+    finally:
+        if old_cache is None:
+            os.environ.pop('FALCON_CACHE_DIR', None)
+        else:
+            os.environ['FALCON_CACHE_DIR'] = old_cache
+        shutil.rmtree(work, ignore_errors=True)
+    return results
+
+
+if __name__ == '__main__':
+    main('benchmarks.output', measure, [
+        ('seconds', 'time', '{:.3f}s'),
+        ('calls_per_sec', 'print calls/s', '{:,.0f}'),
+    ], add_arguments)
@@ -0,0 +1,54 @@
+"""
+Parser benchmark
+----------------
+
+AST nodes per second of ``Parser.parse`` on a scaled-up ``tests/*.flc``
+corpus. Tokenizing is done once up front and is not timed.
+
+    python -m benchmarks.parser --lines 50000 --against HEAD~1
+"""
+from falconback.lexer import Lexer, TokenStream
+from falconback.parser import Parser
+from benchmarks.common import best_of, corpus, digest, main
+
+
+def add_arguments(argparser):
+    argparser.add_argument('--lines', type=int, default=50000)
+
+
+def count_nodes(program):
+    count = 0
+    stack = [program]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, tuple):
+            if type(node).__module__ == 'falconback.ast':
+                count += 1
+            stack.extend(node)
+        elif isinstance(node, list):
+            stack.extend(node)
+    return count
+
+
+def measure(args):
+    source = corpus(args.lines)
+    tokens = Lexer('bench').tokenize(source)
+    seconds, program = best_of(lambda: Parser().parse(TokenStream(tokens)), args.repeat)
+    nodes = count_nodes(program)
+    return {
+        'parse': {
+            'lines': source.count('\n'),
+            'nodes': nodes,
+            'seconds': seconds,
+            'nodes_per_sec': nodes / seconds,
+            'digest': digest([program]),
+        },
+    }
+
+
+if __name__ == '__main__':
+    main('benchmarks.parser', measure, [
+        ('nodes', 'nodes', '{}'),
+        ('seconds', 'time', '{:.3f}s'),
+        ('nodes_per_sec', 'nodes/s', '{:,.0f}'),
+    ], add_arguments)
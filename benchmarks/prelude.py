@@ -0,0 +1,104 @@
+"""
+Prelude benchmark
+-----------------
+
+Per-program g++ time for the ``tests/*.flc`` programs. Each program is
+built twice: once as a self-contained translation unit that carries the
+whole prelude, and once against the precompiled ``falcon.h`` and
+``libfalconrt``. The one-time runtime build is reported on its own.
+
+    python -m benchmarks.prelude --repeat 3
+"""
+import glob
+import io
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+
+from falconback import interpreter
+from falconback.coder import falcon_system_code
+from benchmarks.common import ROOT, best_of, main
+
+try:
+    from falconback import build
+    from falconback.coder import falcon_include
+except ImportError:
+    build = None
+
+CXX = os.environ.get('CXX', 'g++')
+CXXFLAGS = ['--std=c++20', '-g']
+PROGRAM_START = "\n//{}Program start{}\n".format("-" * 30, "-" * 30)
+
+
+def add_arguments(argparser):
+    argparser.add_argument('--programs', type=int, default=0, help='only build the first N programs')
+    # every measurement runs g++, keep the default run short
+    argparser.set_defaults(repeat=1)
+
+
+def programs(limit):
+    paths = sorted(glob.glob(os.path.join(ROOT, 'tests', '*.flc')))
+    return paths[:limit] if limit else paths
+
+
+def transpile(path, prelude):
+    with open(path) as f:
+        source = io.StringIO(f.read())
+    source.name = path
+    return prelude + PROGRAM_START + interpreter.evaluate(source)
+
+
+def build_all(units, work, extra_compile=(), extra_link=()):
+    """Compile and link every translation unit in ``units``."""
+    for i, code in enumerate(units):
+        cpp = os.path.join(work, 'p{}.cpp'.format(i))
+        with open(cpp, 'w') as f:
+            f.write(code)
+        subprocess.run([CXX] + CXXFLAGS + list(extra_compile) + ['-c', cpp, '-o', cpp + '.o'], check=True)
+        subprocess.run([CXX] + CXXFLAGS + [cpp + '.o'] + list(extra_link) + ['-o', cpp + '.bin'], check=True)
+
+
+def measure(args):
+    paths = programs(args.programs)
+    results = {}
+    work = tempfile.mkdtemp(prefix='falcon-bench-')
+    old_cache = os.environ.get('FALCON_CACHE_DIR')
+    try:
+        inline = [transpile(path, falcon_system_code) for path in paths]
+        seconds, _ = best_of(lambda: build_all(inline, work), args.repeat)
+        results['inline prelude'] = {
+            'programs': len(paths),
+            'seconds': seconds,
+            'programs_per_sec': len(paths) / seconds,
+        }
+
+        if build is not None:
+            os.environ['FALCON_CACHE_DIR'] = os.path.join(work, 'cache')
+            start = time.perf_counter()
+            rt = build.runtime(CXXFLAGS)
+            results['runtime build (once)'] = {'seconds': time.perf_counter() - start}
+
+            units = [transpile(path, falcon_include) for path in paths]
+            seconds, _ = best_of(lambda: build_all(units, work, ['-Winvalid-pch', '-I', rt], ['-L', rt, '-lfalconrt']), args.repeat)
+            results['precompiled header'] = {
+                'programs': len(paths),
+                'seconds': seconds,
+                'programs_per_sec': len(paths) / seconds,
+            }
+    finally:
+        if old_cache is None:
+            os.environ.pop('FALCON_CACHE_DIR', None)
+        else:
+            os.environ['FALCON_CACHE_DIR'] = old_cache
+        shutil.rmtree(work, ignore_errors=True)
+    return results
+
+
+if __name__ == '__main__':
+    main('benchmarks.prelude', measure, [
+        ('programs', 'programs', '{}'),
+        ('seconds', 'time', '{:.3f}s'),
+        ('programs_per_sec', 'programs/s', '{:,.2f}'),
+    ], add_arguments)
@@ -0,0 +1,74 @@
+"""
+Range loop benchmark
+--------------------
+
+Run time and peak memory of a compiled ``for i in one .. n`` loop at
+growing ``n``. With a lazy range the memory stays flat; ``--against`` a
+revision that builds a vector of the whole range shows the difference.
+Peak memory is that of the child process, which starts from the size of
+the forked Python interpreter.
+
+    python -m benchmarks.range_loop --sizes 1000000,10000000,100000000 --against HEAD~1
+"""
+import os
+import shutil
+import tempfile
+
+from falconback import build
+from benchmarks.common import main, run_executable
+
+PROGRAM = '''
+func main() -> i32:
+    let one: i64 = 1
+    let n: i64 = {}
+    let total: i64 = 0
+    for i in one .. n:
+        total = total + i
+    println(total)
+    return 0
+'''
+
+
+def add_arguments(argparser):
+    argparser.add_argument('--sizes', default='1000000,10000000,100000000')
+    argparser.set_defaults(repeat=3)
+
+
+def measure(args):
+    results = {}
+    work = tempfile.mkdtemp(prefix='falcon-bench-')
+    old_cache = os.environ.get('FALCON_CACHE_DIR')
+    try:
+        os.environ['FALCON_CACHE_DIR'] = os.path.join(work, 'cache')
+        for n in [int(size) for size in args.sizes.split(',')]:
+            path = os.path.join(work, 'loop{}.flc'.format(n))
+            with open(path, 'w') as f:
+                f.write(PROGRAM.format(n))
+            executable = build.build(path)
+            best = None
+            for _ in range(args.repeat):
+                measured = run_executable(executable)
+                if best is None or measured[0] < best[0]:
+                    best = measured
+            seconds, peak, output = best
+            results['n = {:,}'.format(n)] = {
+                'seconds': seconds,
+                'peak_bytes': peak,
+                'iterations_per_sec': n / seconds,
+                'digest': output.decode('utf-8').strip(),
+            }
+    finally:
+        if old_cache is None:
+            os.environ.pop('FALCON_CACHE_DIR', None)
+        else:
+            os.environ['FALCON_CACHE_DIR'] = old_cache
+        shutil.rmtree(work, ignore_errors=True)
+    return results
+
+
+if __name__ == '__main__':
+    main('benchmarks.range_loop', measure, [
+        ('seconds', 'time', '{:.3f}s'),
+        ('peak_bytes', 'peak memory', '{:,} B'),
+        ('iterations_per_sec', 'iterations/s', '{:,.0f}'),
+    ], add_arguments)
@@ -0,0 +1,87 @@
+"""
+Split benchmark
+---------------
+
+Build time of a synthetic program as one translation unit and split into
+one unit per function, from a cold cache and again after editing a single
+function. A split rebuild only compiles the edited unit and links.
+
+    python -m benchmarks.split --functions 60 --jobs 4
+"""
+import os
+import shutil
+import tempfile
+import time
+
+from benchmarks.common import main
+
+try:
+    from falconback import build
+except ImportError:
+    build = None
+
+FUNCTION = '''
+func step{0}(a: i32, b: i32) -> i32:
+    let x: i32 = a + b * {1}
+    if x > 10:
+        x = x - 1
+    while x > 100:
+        x = x / 2
+    for i in 0..10:
+        println(x)
+    return x
+'''
+
+MAIN = '''
+func main() -> i32:
+    println(step0(1, 2))
+    return 0
+'''
+
+
+def add_arguments(argparser):
+    argparser.add_argument('--functions', type=int, default=60)
+    argparser.add_argument('--jobs', type=int, help='parallel g++ jobs (default: one per core)')
+    # every measurement runs g++, keep the default run short
+    argparser.set_defaults(repeat=1)
+
+
+def program(functions, edited=None):
+    return ''.join(FUNCTION.format(i, i + 1 if i == edited else i) for i in range(functions)) + MAIN
+
+
+def measure(args):
+    if build is None or 'split' not in build.build.__code__.co_varnames:
+        return {}
+    results = {}
+    work = tempfile.mkdtemp(prefix='falcon-bench-')
+    old_cache = os.environ.get('FALCON_CACHE_DIR')
+    try:
+        os.environ['FALCON_CACHE_DIR'] = os.path.join(work, 'cache')
+        build.runtime()
+        path = os.path.join(work, 'program.flc')
+        for split in (False, True):
+            mode = 'split' if split else 'single unit'
+            for step, edited in (('cold', None), ('one edit', args.functions // 2)):
+                with open(path, 'w') as f:
+                    f.write(program(args.functions, edited))
+                start = time.perf_counter()
+                build.build(path, split=split, jobs=args.jobs)
+                results['{}, {}'.format(mode, step)] = {
+                    'functions': args.functions,
+                    'seconds': time.perf_counter() - start,
+                }
+    finally:
+        if old_cache is None:
+            os.environ.pop('FALCON_CACHE_DIR', None)
+        else:
+            os.environ['FALCON_CACHE_DIR'] = old_cache
+        shutil.rmtree(work, ignore_errors=True)
+    return results
+
+
+if __name__ == '__main__':
+    main('benchmarks.split', measure, [
+        ('functions', 'functions', '{}'),
+        ('seconds', 'time', '{:.3f}s'),
+    ], add_arguments)
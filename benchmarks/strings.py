@@ -0,0 +1,100 @@
+"""
+Strings benchmark
+-----------------
+
+Run time of compiled programs that build a long string piece by piece:
+the README's ``dup``, which does ``result = result + x`` in a loop, a
+chain of several pieces per iteration, and the same chain on a
+``stringbuilder``. Run it ``--against`` a revision that builds a new
+string for every ``+`` to see the quadratic cost go.
+
+    python -m benchmarks.strings --count 50000 --against HEAD~1
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+
+from falconback import build, interpreter
+from benchmarks.common import main, run_executable
+
+# (builtin needed, program)
+CASES = {
+    'dup': (None, '''
+func dup(x: string, count: i32) -> string:
+    let result: string = ""
+    for i in 1 .. count:
+        result = result + x
+    return result
+
+func main() -> i32:
+    println(len(dup("-", {count})))
+    return 0
+'''),
+    'chain': (None, '''
+func main() -> i32:
+    let result: string = ""
+    let i = 0
+    while i < {count}:
+        result = result + "<" + "item" + ">"
+        i = i + 1
+    println(len(result))
+    return 0
+'''),
+    'stringbuilder': ('tostring', '''
+func main() -> i32:
+    let result: stringbuilder
+    let i = 0
+    while i < {count}:
+        result = result + "<" + "item" + ">"
+        i = i + 1
+    println(len(tostring(result)))
+    return 0
+'''),
+}
+
+
+def add_arguments(argparser):
+    argparser.add_argument('--count', type=int, default=50000, help='pieces appended')
+    argparser.set_defaults(repeat=3)
+
+
+def measure(args):
+    results = {}
+    work = tempfile.mkdtemp(prefix='falcon-bench-')
+    old_cache = os.environ.get('FALCON_CACHE_DIR')
+    try:
+        os.environ['FALCON_CACHE_DIR'] = os.path.join(work, 'cache')
+        builtins = interpreter.create_global_env(exit_on_error=False)
+        for name, (builtin, source) in sorted(CASES.items()):
+            if builtin is not None and builtins.get(builtin) is None:
+                continue
+            path = os.path.join(work, name + '.flc')
+            with open(path, 'w') as f:
+                f.write(source.replace('{count}', str(args.count)))
+            executable = build.build(path)
+            best = None
+            for _ in range(args.repeat):
+                measured = run_executable(executable)
+                if best is None or measured[0] < best[0]:
+                    best = measured
+            seconds, peak, output = best
+            results[name] = {
+                'seconds': seconds,
+                'appends_per_sec': args.count / seconds,
+                'digest': hashlib.sha1(output).hexdigest(),
+            }
+    finally:
+        if old_cache is None:
+            os.environ.pop('FALCON_CACHE_DIR', None)
+        else:
+            os.environ['FALCON_CACHE_DIR'] = old_cache
+        shutil.rmtree(work, ignore_errors=True)
+    return results
+
+
+if __name__ == '__main__':
+    main('benchmarks.strings', measure, [
+        ('seconds', 'time', '{:.3f}s'),
+        ('appends_per_sec', 'appends/s', '{:,.0f}'),
+    ], add_arguments)
@@ -0,0 +1,68 @@
+"""
+Token memory benchmark
+----------------------
+
+Memory held by the tokens of a scaled-up ``tests/*.flc`` corpus, stored as
+a list of ``Token`` namedtuples versus a compact ``TokenBuffer``, and the
+time to parse each.
+
+    python -m benchmarks.token_memory --lines 100000
+"""
+import tracemalloc
+
+from falconback import lexer
+from falconback.lexer import Lexer, TokenStream
+from falconback.parser import Parser
+from benchmarks.common import best_of, corpus, digest, main
+
+
+def add_arguments(argparser):
+    argparser.add_argument('--lines', type=int, default=100000)
+
+
+def retained_memory(func):
+    """Bytes still allocated by the result of ``func`` and the peak while building it."""
+    tracemalloc.start()
+    try:
+        result = func()
+        current, peak = tracemalloc.get_traced_memory()
+        del result
+        return current, peak
+    finally:
+        tracemalloc.stop()
+
+
+def measure(args):
+    source = corpus(args.lines)
+    tokens = Lexer('bench').tokenize(source)
+    results = {}
+
+    def record(name, tokenize, stream_class):
+        retained, peak = retained_memory(lambda: tokenize(source))
+        store = tokenize(source)
+        seconds, _ = best_of(lambda: Parser().parse(stream_class(store)), args.repeat)
+        results[name] = {
+            'tokens': len(store),
+            'retained_bytes': retained,
+            'peak_bytes': peak,
+            'bytes_per_token': retained / len(store),
+            'parse_seconds': seconds,
+            'digest': digest(store[i] for i in range(len(store))),
+        }
+
+    record('namedtuple list', lambda s: Lexer('bench').tokenize(s), TokenStream)
+    if hasattr(lexer, 'TokenBuffer'):
+        record('token buffer', lambda s: Lexer('bench').tokenize_compact(s), lexer.CompactTokenStream)
+        if results['token buffer']['digest'] != digest(tokens):
+            print('\033[91mtoken buffer differs from tokenize\033[0m')
+    return results
+
+
+if __name__ == '__main__':
+    main('benchmarks.token_memory', measure, [
+        ('tokens', 'tokens', '{}'),
+        ('retained_bytes', 'retained', '{:,} B'),
+        ('bytes_per_token', 'per token', '{:.1f} B'),
+        ('peak_bytes', 'peak', '{:,} B'),
+        ('parse_seconds', 'parse', '{:.3f}s'),
+    ], add_arguments)
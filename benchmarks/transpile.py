@@ -0,0 +1,91 @@
+"""
+Transpile benchmark
+-------------------
+
+Time and peak memory of transpiling synthetic programs of growing size to
+``os.devnull``. Both should grow linearly with the number of lines.
+
+    python -m benchmarks.transpile --functions 500 --steps 3 --against HEAD~1
+"""
+import io
+import os
+import tracemalloc
+
+from falconback import interpreter
+from benchmarks.common import best_of, digest, main
+
+try:
+    from falconback.writer import CodeWriter
+except ImportError:
+    CodeWriter = None
+
+FUNCTION = '''
+func f{0}(a: i32, b: i32) -> i32:
+    let x: i32 = a + b * {0}
+    if x > 10:
+        x = x - 1
+    elif x < 0:
+        x = 0
+    else:
+        x = x * 2
+    while x > 100:
+        x = x / 2
+    for i in 0..10:
+        println(x)
+    return x
+'''
+
+
+def add_arguments(argparser):
+    argparser.add_argument('--functions', type=int, default=500, help='functions in the smallest program')
+    argparser.add_argument('--steps', type=int, default=3, help='number of doublings')
+
+
+def program(functions):
+    return ''.join(FUNCTION.format(i) for i in range(functions))
+
+
+def transpile(source):
+    f = io.StringIO(source)
+    f.name = 'bench'
+    with open(os.devnull, 'w') as fw:
+        if CodeWriter is not None:
+            interpreter.evaluate(f, out=CodeWriter(fw))
+        else:
+            fw.write(interpreter.evaluate(f))
+
+
+def peak_memory(func):
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def measure(args):
+    results = {}
+    for step in range(args.steps):
+        functions = args.functions << step
+        source = program(functions)
+        seconds, _ = best_of(lambda: transpile(source), args.repeat)
+        lines = source.count('\n')
+        f = io.StringIO(source)
+        f.name = 'bench'
+        results['{} lines'.format(lines)] = {
+            'lines': lines,
+            'seconds': seconds,
+            'lines_per_sec': lines / seconds,
+            'peak_bytes': peak_memory(lambda: transpile(source)),
+            'digest': digest([''.join(interpreter.evaluate(f).split())]),
+        }
+    return results
+
+
+if __name__ == '__main__':
+    main('benchmarks.transpile', measure, [
+        ('seconds', 'time', '{:.3f}s'),
+        ('lines_per_sec', 'lines/s', '{:,.0f}'),
+        ('peak_bytes', 'peak memory', '{:,} B'),
+    ], add_arguments)
@@ -0,0 +1,80 @@
+"""
+Values benchmark
+----------------
+
+Run time of a compiled program that calls a function in a loop, passing
+it an array of strings and a string it only reads, and walks the array
+in the function. Run it ``--against`` a revision that passes parameters
+and binds loop variables by value to see what the copies cost.
+
+    python -m benchmarks.values --calls 1000000 --against HEAD~1
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+
+from falconback import build
+from benchmarks.common import main, run_executable
+
+# the strings are longer than the small string buffer, so a copy allocates
+PROGRAM = '''
+func measure(words, separator: string) -> i64:
+    let total: i64 = 0
+    for word in words:
+        total = total + len(word) + len(separator)
+    return total
+
+func main() -> i32:
+    let words = ["{word}a", "{word}b", "{word}c", "{word}d", "{word}e", "{word}f", "{word}g", "{word}h"]
+    let separator = "{word}"
+    let total: i64 = 0
+    let i = 0
+    while i < {calls}:
+        total = total + measure(words, separator)
+        i = i + 1
+    println(total)
+    return 0
+'''
+
+
+def add_arguments(argparser):
+    argparser.add_argument('--calls', type=int, default=1000000, help='calls of the function')
+    argparser.set_defaults(repeat=3)
+
+
+def measure(args):
+    results = {}
+    work = tempfile.mkdtemp(prefix='falcon-bench-')
+    old_cache = os.environ.get('FALCON_CACHE_DIR')
+    try:
+        os.environ['FALCON_CACHE_DIR'] = os.path.join(work, 'cache')
+        path = os.path.join(work, 'values.flc')
+        with open(path, 'w') as f:
+            f.write(PROGRAM.replace('{word}', 'x' * 32).replace('{calls}', str(args.calls)))
+        executable = build.build(path)
+        best = None
+        for _ in range(args.repeat):
+            measured = run_executable(executable)
+            if best is None or measured[0] < best[0]:
+                best = measured
+        seconds, peak, output = best
+        results['{:,} calls'.format(args.calls)] = {
+            'seconds': seconds,
+            'calls_per_sec': args.calls / seconds,
+            'digest': hashlib.sha1(output).hexdigest(),
+        }
+    finally:
+        if old_cache is None:
+            os.environ.pop('FALCON_CACHE_DIR', None)
+        else:
+            os.environ['FALCON_CACHE_DIR'] = old_cache
+        shutil.rmtree(work, ignore_errors=True)
+    return results
+
+
+if __name__ == '__main__':
+    main('benchmarks.values', measure, [
+        ('seconds', 'time', '{:.3f}s'),
+        ('calls_per_sec', 'calls/s', '{:,.0f}'),
+    ], add_arguments)
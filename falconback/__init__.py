@@ -29,3 +29,17 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """.format(__version__, '-' * 32)
 
+_exports = {
+    'CompilationContext': 'falconback.interpreter',
+    'compile_many': 'falconback.compiler',
+    'compile_source': 'falconback.compiler',
+    'CompileResult': 'falconback.compiler',
+}
+
+
+def __getattr__(name):
+    # imported on first use so `falcon run` on a cached build stays cheap
+    if name in _exports:
+        import importlib
+        return getattr(importlib.import_module(_exports[name]), name)
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
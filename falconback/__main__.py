@@ -5,10 +5,12 @@ Main
 Command line interface.
 """
 import argparse
-import subprocess
-from falconback import __version__ as version, interpreter, copyright
-from falconback.coder import falcon_system_code
 import os
+import shutil
+import sys
+from falconback import __version__ as version, build, copyright
+from falconback.errors import BuildFailed
+from falconback.optimizer import DEFAULT_LEVEL
 
 try:
     input = raw_input
@@ -16,47 +18,142 @@ except NameError:
     pass
 
 
+def add_frontend_arguments(argparser):
+    argparser.add_argument('-s', '--stream', action='store_true', help='tokenize lazily while parsing')
+    argparser.add_argument('-k', '--compact-tokens', action='store_true', help='keep tokens in a compact array store')
+
+
+def add_optimize_argument(argparser):
+    argparser.add_argument('-O', dest='optimize', type=int, choices=(0, 1, 2), default=DEFAULT_LEVEL,
+                           help='optimization level: 0 none, 1 fold constants and drop dead branches, '
+                                '2 also drop unused functions and classes (default: %(default)s)')
+
+
+def add_split_argument(argparser):
+    argparser.add_argument('--split', action='store_true',
+                           help='compile every function and class as its own translation unit')
+
+
+def add_output_argument(argparser):
+    argparser.add_argument('--line-buffered', action='store_true',
+                           help='write the output of the program after every line, for interactive programs')
+    argparser.add_argument('--async-log', action='store_true',
+                           help='format and write log and logf messages on a background thread')
+    argparser.add_argument('--log-time', action='store_true',
+                           help='put the time in front of every log and logf message')
+
+
 def parse_args():
-    argparser = argparse.ArgumentParser()
+    argparser = argparse.ArgumentParser(epilog='commands: run FILE [ARGS...]  build if needed, then run the program; '
+                                               'build FILE... [-j N]  build programs in parallel')
 
     argparser.add_argument('-c', '--compile', action='store_true')
     argparser.add_argument('-f', '--verbose', action='store_true')
     argparser.add_argument('-t', '--transpile', action='store_true')
+    add_frontend_arguments(argparser)
+    add_optimize_argument(argparser)
+    add_split_argument(argparser)
+    add_output_argument(argparser)
     argparser.add_argument('-v', '--version', action='store_true')
     argparser.add_argument('file', nargs='?')
     return argparser.parse_args()
 
 
-def interpret_file(path, verbose=False, transpile=False, link=False):
-    with open(path) as f:
-        print("\033[92mReading: \033[94m{}\033[0m".format(path))
-        res = "{}\n//{}Program start{}\n{}".format(falcon_system_code, "-" * 30, "-" * 30, interpreter.evaluate(f, verbose=verbose))
+def log_step(step, path):
+    print("\033[92m{}: \033[94m{}\033[0m".format(step, path))
 
-        file = ""
-        objectFile = ""
-        execFile = ""
-
-        path = path.split('.')[0]
-        file = path + ".cpp"
-        objectFile = path + ".o"
-        execFile = path 
-
-        if transpile or link:
-            print("\033[92mWriting: \033[94m{}\033[0m".format(file))
-            with open(file, "w+") as fw:
-                if res != None:
-                    fw.write(res)
-                fw.close()
-
-        if link:
-            print("\033[92mCreating object: \033[94m{}\033[0m".format(objectFile))
-            os.system('g++ --std=c++20 -g -c {} -o {}'.format(file, objectFile))
-
-            print("\033[92mlinking executable: \033[94m{}\033[0m".format(execFile))
-            os.system('g++ --std=c++20 {} -o {}'.format(objectFile, execFile))
-
-            os.system('rm {} {}'.format(file, objectFile))
 
+def build_or_exit(path, **options):
+    try:
+        return build.build(path, **options)
+    except BuildFailed as err:
+        print("\033[91mBuild failed:\033[0m {}".format(err))
+        exit(1)
+
+
+def interpret_file(path, verbose=False, transpile=False, link=False, stream=False, compact=False, split=False,
+                   line_buffered=False, async_log=False, log_time=False, optimize=DEFAULT_LEVEL):
+    log_step("Reading", path)
+
+    file = ""
+    execFile = ""
+
+    base = os.path.splitext(path)[0]
+    file = base + ".cpp"
+    execFile = base 
+
+    if link:
+        executable = build_or_exit(path, flags=build.program_flags(line_buffered, async_log, log_time), verbose=verbose,
+                                   stream=stream, compact=compact, log=log_step, split=split, optimize=optimize)
+        log_step("Writing executable", execFile)
+        shutil.copy2(executable, execFile)
+    elif transpile:
+        log_step("Writing", file)
+        from falconback.coder import falcon_system_code
+        defines = [name for name, enabled in (('FALCON_LINE_BUFFERED', line_buffered), ('FALCON_ASYNC_LOG', async_log),
+                                              ('FALCON_LOG_TIME', log_time)) if enabled]
+        prelude = ''.join('#define {}\n'.format(name) for name in defines) + falcon_system_code
+        build.transpile(path, file, verbose, stream, compact, prelude=prelude, optimize=optimize)
+    else:
+        from falconback import interpreter
+        from falconback.writer import CodeWriter
+        with open(path) as f, open(os.devnull, "w") as fw:
+            interpreter.evaluate(f, verbose=verbose, stream=stream, compact=compact, out=CodeWriter(fw),
+                                 optimize=optimize)
+
+
+def run(argv):
+    """falcon run FILE [ARGS...]: run the cached build of FILE, building it first if it changed."""
+    argparser = argparse.ArgumentParser(prog='falcon run')
+    add_frontend_arguments(argparser)
+    add_optimize_argument(argparser)
+    add_split_argument(argparser)
+    add_output_argument(argparser)
+    argparser.add_argument('file')
+    argparser.add_argument('args', nargs=argparse.REMAINDER)
+    args = argparser.parse_args(argv)
+
+    executable = build_or_exit(args.file, flags=build.program_flags(args.line_buffered, args.async_log, args.log_time),
+                               stream=args.stream, compact=args.compact_tokens, split=args.split, optimize=args.optimize)
+    sys.stdout.flush()
+    os.execv(executable, [os.path.splitext(args.file)[0]] + args.args)
+
+
+def build_files(argv):
+    """falcon build FILE... [-j N]: build every FILE in parallel and write its executable next to it."""
+    argparser = argparse.ArgumentParser(prog='falcon build')
+    argparser.add_argument('-j', '--jobs', type=int, help='jobs to run at once (default: the make jobserver, or one per core)')
+    add_optimize_argument(argparser)
+    add_split_argument(argparser)
+    add_output_argument(argparser)
+    argparser.add_argument('files', nargs='+')
+    args = argparser.parse_args(argv)
+
+    failed = 0
+    results = build.build_many(args.files, jobs=args.jobs, flags=build.program_flags(args.line_buffered, args.async_log, args.log_time),
+                               log=log_step, split=args.split, optimize=args.optimize)
+    for result in results:
+        if result.executable is None:
+            failed += 1
+            print("\033[91mBuild failed:\033[0m {}".format(result.path))
+            for message in result.diagnostics:
+                print(message)
+            continue
+        for message in result.diagnostics:
+            print(message)
+        execFile = os.path.splitext(result.path)[0]
+        log_step("Writing executable", execFile)
+        shutil.copy2(result.executable, execFile)
+
+    if failed:
+        print("\033[91m{} of {} builds failed\033[0m".format(failed, len(args.files)))
+        exit(1)
+
+
+commands = {
+    'run': run,
+    'build': build_files,
+}
 
 
 class FalconFile:
@@ -68,6 +165,7 @@ class FalconFile:
         return self.buffer
 
 def repl():
+    from falconback import interpreter
     print('{}\n\nPress Ctrl+C to exit.'.format(copyright))
     env = interpreter.create_global_env()
     buf = ''
@@ -84,6 +182,9 @@ def repl():
 
 
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] in commands:
+        return commands[sys.argv[1]](sys.argv[2:])
+
     args = parse_args()
 
     if args.version:
@@ -91,7 +192,8 @@ def main():
         return 
 
     if args.file:
-        interpret_file(args.file, args.verbose, args.transpile, args.compile)
+        interpret_file(args.file, args.verbose, args.transpile, args.compile, args.stream, args.compact_tokens, args.split,
+                       args.line_buffered, args.async_log, args.log_time, args.optimize)
     else:
         repl()
 
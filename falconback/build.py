@@ -0,0 +1,424 @@
+"""
+Build
+-----
+
+Content-addressed build cache around the C++ toolchain.
+
+Every build lives in ``<cache>/<key[:2]>/<key>/`` as ``program.cpp``,
+``program.o`` and the ``program`` executable. The key hashes the source
+and its path, which ``log`` prints, the compiler itself, the runtime
+prelude, the C++ compiler and its flags, so a cache entry never needs
+invalidating: anything that would change the binary changes the key.
+
+The runtime is built once per toolchain into ``<cache>/runtime/<key>/``:
+``falcon.h`` with its precompiled ``falcon.h.gch`` and ``libfalconrt.a``.
+Programs include the header and link the library instead of carrying the
+whole prelude, so g++ only parses the program itself.
+
+Split builds compile every function and class as its own translation unit
+against a shared ``program.h`` of declarations. Their objects are kept in
+``<cache>/objects/``, so after an edit only the units that changed are
+compiled again before the link.
+"""
+import hashlib
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from collections import namedtuple
+
+from falconback import __version__
+from falconback.coder import HEADER, RUNTIME_DIR, RUNTIME_SOURCES, falcon_include
+from falconback.errors import BuildFailed
+from falconback.jobs import default_slots, run_jobs
+from falconback.optimizer import DEFAULT_LEVEL
+
+CXX = os.environ.get('CXX', 'g++')
+AR = os.environ.get('AR', 'ar')
+CXXFLAGS = ['--std=c++20', '-g']
+# flushes the output of print and println after every line
+LINE_BUFFERED = ['-DFALCON_LINE_BUFFERED']
+# log and logf through a ring buffer and a background writer thread
+ASYNC_LOG = ['-DFALCON_ASYNC_LOG', '-pthread']
+# puts the time in front of every log and logf message
+LOG_TIME = ['-DFALCON_LOG_TIME']
+# the library sits under every print and read, it is always optimized
+RUNTIME_FLAGS = ['-O2']
+PROGRAM_START = "\n//{}Program start{}\n".format("-" * 30, "-" * 30)
+PROGRAM_HEADER = 'program.h'
+
+BuildResult = namedtuple('BuildResult', ['path', 'executable', 'diagnostics'])
+
+_fingerprint = None
+
+
+def program_flags(line_buffered=False, async_log=False, log_time=False):
+    """The compiler flags of a program build."""
+    flags = CXXFLAGS
+    if line_buffered:
+        flags = flags + LINE_BUFFERED
+    if async_log:
+        flags = flags + ASYNC_LOG
+    if log_time:
+        flags = flags + LOG_TIME
+    return flags
+
+
+def cache_root():
+    root = os.environ.get('FALCON_CACHE_DIR')
+    if not root:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+        root = os.path.join(base, 'falcon')
+    return root
+
+
+def compiler_fingerprint():
+    """Hash of the falconback and runtime sources, so editing the compiler invalidates old builds."""
+    global _fingerprint
+    if _fingerprint is None:
+        h = hashlib.sha256(__version__.encode('utf-8'))
+        package = os.path.dirname(os.path.abspath(__file__))
+        for directory, suffixes in ((package, ('.py',)), (RUNTIME_DIR, ('.h', '.cpp'))):
+            for name in sorted(os.listdir(directory)):
+                if name.endswith(suffixes):
+                    with open(os.path.join(directory, name), 'rb') as f:
+                        h.update(name.encode('utf-8'))
+                        h.update(f.read())
+        _fingerprint = h.hexdigest()
+    return _fingerprint
+
+
+def build_key(source, flags, split=False, optimize=DEFAULT_LEVEL, name=''):
+    # the runtime is covered by the fingerprint
+    h = hashlib.sha256()
+    for part in (compiler_fingerprint(), CXX, '\0'.join(flags), 'split' if split else '', 'O{}'.format(optimize),
+                 name):
+        h.update(part.encode('utf-8'))
+        h.update(b'\0')
+    h.update(source)
+    return h.hexdigest()
+
+
+def transpile(path, cpp_path, verbose=False, stream=False, compact=False, prelude=None, optimize=DEFAULT_LEVEL,
+              name_source=False):
+    """
+    Write the translation unit for the program at ``path``, optimized at
+    level ``optimize``. It starts with ``prelude``, by default the whole
+    self-contained runtime. With ``name_source`` every statement names
+    its line in ``path``, see interpreter.write_line.
+    """
+    # imported here so cache hits never load the compiler
+    from falconback import interpreter
+    from falconback.coder import falcon_system_code
+    from falconback.writer import CodeWriter
+
+    try:
+        with open(path) as f, open(cpp_path, 'w') as fw:
+            out = CodeWriter(fw)
+            out.write((falcon_system_code if prelude is None else prelude) + PROGRAM_START)
+            interpreter.evaluate(f, verbose=verbose, stream=stream, compact=compact, out=out, optimize=optimize,
+                                 name_source=name_source)
+    except BaseException:
+        # do not leave a half written translation unit behind
+        if os.path.exists(cpp_path):
+            os.remove(cpp_path)
+        raise
+
+
+def run_command(command):
+    status = subprocess.call(command)
+    if status != 0:
+        raise BuildFailed('{} exited with status {}'.format(command[0], status))
+
+
+def object_command(cpp, obj, flags, rt):
+    return [CXX] + flags + ['-Winvalid-pch', '-I', rt, '-c', cpp, '-o', obj]
+
+
+def link_command(objects, executable, flags, rt):
+    return [CXX] + flags + objects + ['-L', rt, '-lfalconrt', '-o', executable]
+
+
+def cache_entry(key):
+    return os.path.join(cache_root(), key[:2], key)
+
+
+def install(work, entry):
+    """Move the finished build in ``work`` to ``entry``."""
+    try:
+        os.rename(work, entry)
+    except OSError:
+        # built concurrently by another process; keep theirs
+        pass
+
+
+def runtime(flags=None, log=None):
+    """
+    Return the directory holding ``falcon.h``, its precompiled header and
+    ``libfalconrt.a`` built with ``flags``, building them on first use.
+    A precompiled header is only valid for the exact compiler and flags it
+    was built with, so both are part of the key.
+    """
+    flags = CXXFLAGS if flags is None else flags
+    version = subprocess.run([CXX, '--version'], stdout=subprocess.PIPE, check=True).stdout
+    h = hashlib.sha256()
+    for part in (compiler_fingerprint(), CXX, AR, '\0'.join(flags)):
+        h.update(part.encode('utf-8'))
+        h.update(b'\0')
+    h.update(version)
+    key = h.hexdigest()
+    parent = os.path.join(cache_root(), 'runtime')
+    entry = os.path.join(parent, key)
+    if os.path.exists(os.path.join(entry, 'libfalconrt.a')):
+        return entry
+
+    os.makedirs(parent, exist_ok=True)
+    work = tempfile.mkdtemp(prefix=key + '.', dir=parent)
+    try:
+        header = os.path.join(work, HEADER)
+        shutil.copy(os.path.join(RUNTIME_DIR, HEADER), header)
+        if log:
+            log('Precompiling header', header + '.gch')
+        run_command([CXX] + flags + ['-x', 'c++-header', header, '-o', header + '.gch'])
+        objects = []
+        for name in RUNTIME_SOURCES:
+            obj = os.path.join(work, os.path.splitext(name)[0] + '.o')
+            run_command([CXX] + flags + RUNTIME_FLAGS + ['-I', work, '-c', os.path.join(RUNTIME_DIR, name), '-o', obj])
+            objects.append(obj)
+        library = os.path.join(work, 'libfalconrt.a')
+        if log:
+            log('Creating library', library)
+        run_command([AR, 'rcs', library] + objects)
+        for obj in objects:
+            os.remove(obj)
+        install(work, entry)
+    finally:
+        if os.path.exists(work):
+            shutil.rmtree(work, ignore_errors=True)
+    return entry
+
+
+# A program build: compile ``units`` in parallel, then run ``link`` in
+# ``work`` and install it as the cache ``entry``. Each unit is a
+# (command, log path, object, cached object) tuple; objects with a cached
+# path are kept in the object cache once compiled.
+Plan = namedtuple('Plan', ['entry', 'work', 'units', 'link'])
+
+
+def plan_program(entry, work, flags, rt):
+    """Plan the build of the single translation unit ``work``/program.cpp."""
+    cpp = os.path.join(work, 'program.cpp')
+    obj = os.path.join(work, 'program.o')
+    unit = (object_command(cpp, obj, flags, rt), obj + '.log', obj, None)
+    return Plan(entry, work, [unit], link_command([obj], os.path.join(work, 'program'), flags, rt))
+
+
+def plan_split_program(entry, work, header, units, flags, rt):
+    """
+    Plan the build of a program split into ``header`` and ``units``. Units
+    are compiled into ``<cache>/objects/``, keyed by their code and the
+    header, so a unit that did not change is not compiled again.
+    """
+    header = '#pragma once\n' + falcon_include + header
+    with open(os.path.join(work, PROGRAM_HEADER), 'w') as f:
+        f.write(header)
+    planned = []
+    objects = []
+    for i, unit in enumerate(units):
+        code = falcon_include + '#include "{}"\n'.format(PROGRAM_HEADER) + unit
+        key = build_key((header + '\0' + code).encode('utf-8'), flags)
+        cached = os.path.join(cache_root(), 'objects', key[:2], key + '.o')
+        objects.append(cached)
+        if os.path.exists(cached):
+            continue
+        cpp = os.path.join(work, 'unit{}.cpp'.format(i))
+        obj = os.path.join(work, 'unit{}.o'.format(i))
+        with open(cpp, 'w') as f:
+            f.write(code)
+        planned.append((object_command(cpp, obj, flags, rt), obj + '.log', obj, cached))
+    return Plan(entry, work, planned, link_command(objects, os.path.join(work, 'program'), flags, rt))
+
+
+def read_log(path):
+    if not os.path.exists(path):
+        return ''
+    with open(path, errors='replace') as f:
+        return f.read().strip()
+
+
+def run_plans(plans, slots, log=None):
+    """
+    Compile the units of all ``plans`` in parallel within ``slots``, then
+    link the programs that compiled and install them in the cache. Returns
+    the exit status and the compiler output of each plan.
+    """
+    status = run_jobs([([command], log_path) for plan in plans for command, log_path, _, _ in plan.units], slots)
+    results = []
+    linking = []
+    i = 0
+    for plan in plans:
+        failed = 0
+        for _, _, obj, cached in plan.units:
+            if status[i]:
+                failed = failed or status[i]
+            elif cached is not None:
+                os.makedirs(os.path.dirname(cached), exist_ok=True)
+                os.replace(obj, cached)
+            i += 1
+        results.append(failed)
+        if not failed:
+            if log:
+                log('linking executable', os.path.join(plan.entry, 'program'))
+            linking.append(plan)
+
+    link_status = iter(run_jobs([([plan.link], os.path.join(plan.work, 'link.log')) for plan in linking], slots))
+    outputs = []
+    for plan, failed in zip(plans, results):
+        output = [read_log(log_path) for _, log_path, _, _ in plan.units]
+        if not failed:
+            failed = next(link_status)
+            output.append(read_log(os.path.join(plan.work, 'link.log')))
+            if not failed:
+                install(plan.work, plan.entry)
+        output = '\n'.join(line for line in output if line)
+        if failed and not output:
+            output = '{} exited with status {}'.format(CXX, failed)
+        outputs.append((failed, output))
+    return outputs
+
+
+def build(path, flags=None, verbose=False, stream=False, compact=False, log=None, split=False, jobs=None,
+          optimize=DEFAULT_LEVEL):
+    """
+    Return the path of the cached executable for the program at ``path``,
+    transpiling and compiling it first if this exact build is not cached.
+    ``log`` is called with a message before each build step. With
+    ``split`` every function and class is compiled separately, up to
+    ``jobs`` at once. ``optimize`` is the level of the syntax tree
+    optimizations, see optimizer.
+    """
+    flags = CXXFLAGS if flags is None else flags
+    with open(path, 'rb') as f:
+        source = f.read()
+    key = build_key(source, flags, split, optimize, path)
+    entry = cache_entry(key)
+    executable = os.path.join(entry, 'program')
+    if os.path.exists(executable):
+        if log:
+            log('Using cached build', executable)
+        return executable
+
+    os.makedirs(os.path.dirname(entry), exist_ok=True)
+    work = tempfile.mkdtemp(prefix=key + '.', dir=os.path.dirname(entry))
+    try:
+        if split:
+            from falconback import interpreter
+            if log:
+                log('Writing', os.path.join(work, PROGRAM_HEADER))
+            with open(path) as f:
+                header, units = interpreter.evaluate_split(f, verbose=verbose, stream=stream, compact=compact,
+                                                           optimize=optimize, name_source=True)
+            rt = runtime(flags, log)
+            plan = plan_split_program(entry, work, header, units, flags, rt)
+        else:
+            cpp = os.path.join(work, 'program.cpp')
+            if log:
+                log('Writing', cpp)
+            transpile(path, cpp, verbose, stream, compact, prelude=falcon_include, optimize=optimize, name_source=True)
+            rt = runtime(flags, log)
+            plan = plan_program(entry, work, flags, rt)
+        if log:
+            for _, _, obj, _ in plan.units:
+                log('Creating object', obj)
+        status, output = run_plans([plan], default_slots(jobs), log)[0]
+        if status:
+            raise BuildFailed(output)
+        if output:
+            print(output, file=sys.stderr)
+    finally:
+        if os.path.exists(work):
+            shutil.rmtree(work, ignore_errors=True)
+    return executable
+
+
+def build_many(paths, jobs=None, flags=None, log=None, split=False, optimize=DEFAULT_LEVEL):
+    """
+    Build every program in ``paths`` through the cache and return their
+    BuildResults in the same order. ``executable`` is None when a build
+    failed and ``diagnostics`` holds the compiler messages.
+
+    Transpiling runs on a process pool and g++ runs in parallel, both
+    within ``jobs`` at once, or the slots of the make jobserver we were
+    started under, or one per core.
+    """
+    from falconback.compiler import compile_many
+
+    flags = CXXFLAGS if flags is None else flags
+    slots = default_slots(jobs)
+    results = [None] * len(paths)
+    # cache entry -> indices of the paths it builds, sources of the entries
+    builds = {}
+    sources = []
+    for i, path in enumerate(paths):
+        try:
+            with open(path, 'rb') as f:
+                source = f.read()
+        except OSError as err:
+            results[i] = BuildResult(path, None, [str(err)])
+            continue
+        entry = cache_entry(build_key(source, flags, split, optimize, path))
+        executable = os.path.join(entry, 'program')
+        if os.path.exists(executable):
+            if log:
+                log('Using cached build', executable)
+            results[i] = BuildResult(path, executable, [])
+        elif entry in builds:
+            builds[entry].append(i)
+        else:
+            builds[entry] = [i]
+            sources.append((path, source.decode('utf-8')))
+    if not builds:
+        return results
+
+    rt = runtime(flags, log)
+    workers = 0
+    while workers < len(sources) and slots.acquire():
+        workers += 1
+    try:
+        compiled = compile_many(sources, workers=max(1, workers), prelude=falcon_include, split=split,
+                                optimize=optimize, name_source=True)
+    finally:
+        for _ in range(workers):
+            slots.release()
+
+    plans = []
+    try:
+        for entry, compiled_result in zip(builds, compiled):
+            if compiled_result.code is None:
+                for i in builds[entry]:
+                    results[i] = BuildResult(paths[i], None, compiled_result.diagnostics)
+                continue
+            os.makedirs(os.path.dirname(entry), exist_ok=True)
+            work = tempfile.mkdtemp(prefix=os.path.basename(entry) + '.', dir=os.path.dirname(entry))
+            if split:
+                plan = plan_split_program(entry, work, compiled_result.code, compiled_result.units, flags, rt)
+                if log:
+                    log('Compiling', '{} ({} of {} units)'.format(compiled_result.name, len(plan.units), len(compiled_result.units)))
+            else:
+                with open(os.path.join(work, 'program.cpp'), 'w') as f:
+                    f.write(compiled_result.code)
+                plan = plan_program(entry, work, flags, rt)
+                if log:
+                    log('Compiling', compiled_result.name)
+            plans.append(plan)
+
+        for plan, (status, output) in zip(plans, run_plans(plans, slots)):
+            executable = None if status else os.path.join(plan.entry, 'program')
+            for i in builds[plan.entry]:
+                results[i] = BuildResult(paths[i], executable, [output] if output else [])
+    finally:
+        for plan in plans:
+            if os.path.exists(plan.work):
+                shutil.rmtree(plan.work, ignore_errors=True)
+    return results
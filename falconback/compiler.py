@@ -0,0 +1,75 @@
+"""
+Compiler
+--------
+
+Transpiling many programs at once.
+"""
+import functools
+import io
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from falconback import interpreter
+from falconback.coder import falcon_system_code
+from falconback.errors import CompilationFailed
+from falconback.optimizer import DEFAULT_LEVEL
+
+CompileResult = namedtuple('CompileResult', ['name', 'code', 'diagnostics', 'units'], defaults=[None])
+
+
+def compile_source(source, prelude=None, split=False, optimize=DEFAULT_LEVEL, name_source=False):
+    """
+    Transpile one source in its own CompilationContext. ``source`` is a
+    path or a ``(name, text)`` pair. ``code`` is the C++ translation unit,
+    or None when ``diagnostics`` holds an error. It starts with
+    ``prelude``, by default the whole self-contained runtime. The program
+    is optimized at level ``optimize``.
+
+    With ``split``, ``code`` is the declarations header instead and
+    ``units`` the translation units that include it, without a prelude.
+    With ``name_source`` every statement names its line in the source,
+    see interpreter.write_line.
+    """
+    if isinstance(source, str):
+        with open(source) as f:
+            name, text = source, f.read()
+    else:
+        name, text = source
+
+    f = io.StringIO(text)
+    f.name = name
+    context = interpreter.create_global_env(exit_on_error=False)
+    try:
+        if split:
+            header, units = interpreter.evaluate_split_env(f, context, optimize=optimize, name_source=name_source)
+            return CompileResult(name, header, context.diagnostics, units)
+        if prelude is None:
+            prelude = falcon_system_code
+        code = "{}\n//{}Program start{}\n{}".format(prelude, "-" * 30, "-" * 30,
+                                                     interpreter.evaluate_env(f, context, optimize=optimize,
+                                                                              name_source=name_source))
+    except CompilationFailed:
+        code = None
+    return CompileResult(name, code, context.diagnostics)
+
+
+def compile_many(sources, workers=None, processes=True, prelude=None, split=False, optimize=DEFAULT_LEVEL,
+                 name_source=False):
+    """
+    Transpile ``sources`` in parallel and return their CompileResults in
+    the same order. Code generation is pure Python, so the default process
+    pool is what scales; ``processes=False`` uses threads instead.
+    """
+    sources = list(sources)
+    workers = workers or os.cpu_count() or 1
+    compile_one = functools.partial(compile_source, prelude=prelude, split=split, optimize=optimize,
+                                    name_source=name_source)
+    if workers == 1 or len(sources) < 2:
+        return [compile_one(source) for source in sources]
+
+    if processes:
+        with ProcessPoolExecutor(workers) as pool:
+            chunksize = max(1, len(sources) // (4 * workers))
+            return list(pool.map(compile_one, sources, chunksize=chunksize))
+    with ThreadPoolExecutor(workers) as pool:
+        return list(pool.map(compile_one, sources))
@@ -35,11 +35,28 @@ class AbrvalgInternalError(Exception):
         self.type = "\033[91mInternal Error\033[0m"
 
 
-def report_syntax_error(lexer, error, size = 1):
+class CompilationFailed(Exception):
+
+    def __init__(self, diagnostics):
+        super(CompilationFailed, self).__init__('\n'.join(diagnostics))
+        self.diagnostics = diagnostics
+
+
+class BuildFailed(Exception):
+    pass
+
+
+def format_syntax_error(lexer, error, size = 1):
     line = error.line
     column = error.column
     source_line = lexer.source_lines[line -1]
-    print('{}: {}: {} at line {}, column {}'.format(lexer.filename, error.type, error.message, line, column))
-    print('{} | {}'.format(line, source_line))
-    print('{} | {}\033[91m{}\033[0m'.format(' ' * len(str(line)), '~' * (column-1), '^' * size) + '~' * (len(source_line) - ((column-1) + size)))
+    return '\n'.join([
+        '{}: {}: {} at line {}, column {}'.format(lexer.filename, error.type, error.message, line, column),
+        '{} | {}'.format(line, source_line),
+        '{} | {}\033[91m{}\033[0m'.format(' ' * len(str(line)), '~' * (column-1), '^' * size) + '~' * (len(source_line) - ((column-1) + size)),
+    ])
+
+
+def report_syntax_error(lexer, error, size = 1):
+    print(format_syntax_error(lexer, error, size))
     exit(4)
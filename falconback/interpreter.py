@@ -5,18 +5,22 @@ Interpreter
 AST-walking interpreter.
 """
 from __future__ import print_function
-from cgitb import reset
-import operator
 from collections import namedtuple
-from pydoc import classname
+import io
 import re
-from textwrap import indent
 from falconback import ast
-from falconback.lexer import Lexer, TokenStream
+from falconback.lexer import Lexer, Token, TokenStream, LazyTokenStream, CompactTokenStream
 from falconback.parser import Parser
-from falconback.errors import AbrvalgSyntaxError, report_syntax_error, AbrvalgCompileTimeError, AbrvalgInternalError
-from falconback.utils import print_ast, print_tokens, print_env
-from falconback.ops import add, sub, div, mul, mod,gt,ge,lt,le,eq,ne
+from falconback.errors import AbrvalgSyntaxError, CompilationFailed, AbrvalgCompileTimeError, AbrvalgInternalError, format_syntax_error
+from falconback.utils import print_ast, print_tokens, print_env, print_hoisted, print_removed, print_types
+from falconback.resolver import resolve
+from falconback.usage import SCALAR_TYPES, Usage, analyze
+from falconback.invariants import invariant_calls
+from falconback.optimizer import DEFAULT_LEVEL, Optimizer
+from falconback.typecheck import Types, first_token, infer
+from falconback.coder import line_directive
+from falconback.writer import CodeWriter
+from falconback.ops import binary_operators, unary_operators
 
 
 
@@ -40,7 +44,6 @@ class Environment(object):
     def __init__(self, parent=None, args=None):
         self._parent = parent
         self._values = {}
-        self.lexer = None
         if args is not None:
             self._from_dict(args)
 
@@ -64,7 +67,140 @@ class Environment(object):
     def __repr__(self):
         return 'Environment({})'.format(str(self._values))
 
-class_table = Environment()
+class CompilationContext(Environment):
+    """
+    Global environment of one compilation together with everything else
+    code generation keeps per program: the class table, the lexer of the
+    source, the resolver bindings and the diagnostics reported so far.
+    Contexts share no state, so programs can be compiled side by side in
+    one process.
+
+    With ``exit_on_error`` an error is printed and ends the process, as
+    the command line expects; otherwise it raises CompilationFailed.
+    """
+
+    def __init__(self, exit_on_error=True):
+        super(CompilationContext, self).__init__()
+        # class name -> {member name: TypedName or Function}
+        self.class_table = {}
+        self.lexer = None
+        self.bindings = {}
+        self.diagnostics = []
+        self.exit_on_error = exit_on_error
+        # declared return type of the function being generated
+        self.return_type = None
+        # whether stdout is also written with C stdio, see uses_c_stdio
+        self.c_stdio = True
+        # parameters bound by const& and reads that move, see usage.analyze
+        self.usage = Usage(set(), set())
+        # inferred types of untyped parameters and returns, see typecheck.infer
+        self.types = Types({}, {})
+        # names add_builtins declared, which the program may overload
+        self.builtins = frozenset()
+        # id of a hoisted call -> the temporary holding its value
+        self.hoisted = {}
+        # (line, call, temporary) for the verbose report
+        self.hoists = []
+        # the program path every statement names its line in, see write_line
+        self.source_name = None
+
+    def report(self, error, size=1):
+        message = format_syntax_error(self.lexer, error, size)
+        self.diagnostics.append(message)
+        if self.exit_on_error:
+            print(message)
+            exit(4)
+        raise CompilationFailed(self.diagnostics)
+
+
+def lookup(env, token):
+    """The Binding the resolver gave ``token``, or None if its name was not visible."""
+    return env.bindings.get(id(token))
+
+
+# types whose values point into another string or array
+VIEW_TYPES = ('strview',)
+
+# types that append to themselves in place with +=
+APPENDABLE_TYPES = ('string', 'stringbuilder')
+
+
+def is_view(node, env, seen=()):
+    """
+    Whether ``node`` evaluates to a view: a slice, or a variable or call
+    declared to hold or return one.
+    """
+    while type(node) == ast.GroupExpression:
+        node = node.left
+    if type(node) == ast.Call:
+        binding = lookup(env, node.left.value)
+        if binding is None or not isinstance(binding.value, ast.Function):
+            return False
+        fx = binding.value
+        if fx.name == ast.Identifier('slice'):
+            return True
+        # builtins name their return type with a plain string
+        ret = fx.ret.value if isinstance(fx.ret, Token) else fx.ret
+        return ret in VIEW_TYPES
+    if type(node) == ast.Identifier:
+        binding = lookup(env, node.value)
+        var = binding.value if binding is not None else None
+        if id(var) in seen:
+            return False
+        if type(var) == ast.ForLoop:
+            # lines() yields views into its buffer
+            return is_builtin_call(var.collection, env, 'lines')
+        if type(var) == ast.TypedName:
+            return var.type.value in VIEW_TYPES
+        if type(var) == ast.InferedName:
+            return is_view(var.value, env, seen + (id(var),))
+    return False
+
+
+def is_dict(node, env):
+    """Whether ``node`` is a variable or parameter that holds a dict."""
+    while type(node) == ast.GroupExpression:
+        node = node.left
+    if type(node) != ast.Identifier:
+        return False
+    binding = lookup(env, node.value)
+    var = binding.value if binding is not None else None
+    if type(var) == ast.TypedName:
+        return var.type.value.startswith('dict<')
+    if type(var) == ast.TypedParam:
+        return var.data_type.value.startswith('dict<')
+    if type(var) == ast.InferedName:
+        return type(var.value) == ast.Dictionary
+    return False
+
+
+def is_builtin_call(node, env, name):
+    if type(node) != ast.Call:
+        return False
+    binding = lookup(env, node.left.value)
+    return binding is not None and isinstance(binding.value, ast.Function) and binding.value.name == ast.Identifier(name)
+
+
+def uses_c_stdio(statements, env):
+    """
+    Whether the program may write to stdout through C stdio or std::cout
+    as well as through the runtime: with inline C++ or included headers.
+    """
+    work = list(statements)
+    while work:
+        node = work.pop()
+        if type(node) in (ast.Cpp, ast.UsingNode):
+            return True
+        if isinstance(node, (tuple, list)) and not isinstance(node, Token):
+            work.extend(node)
+    return False
+
+
+def own(code):
+    """Wrap the code of a view in a copy that owns its elements."""
+    if code.endswith(';'):
+        return 'copy(' + code[:-1] + ');'
+    return 'copy(' + code + ')'
 
 
 def eval_type(eval, tps):
@@ -73,40 +209,183 @@ def eval_type(eval, tps):
         if type(eval) == tp:
             return tp(eval)
     
-def eval_binary_operator(node, env):
-    simple_operations = {
-        '+': add,
-        '-': sub,
-        '*': mul,
-        '/': div,
-        '%': mod,
-        '>': gt,
-        '>=': ge,
-        '<': lt,
-        '<=': le,
-        '==': eq,
-        '!=': ne,
-        '..': lambda start, end: ast.BinaryOperator('..', start, end),
-        '...': lambda start, end: range(start, end + 1),
-    }
-    lazy_operations = {
-        '&&': lambda lnode, lenv: eval_expression(lnode.left, lenv) + " && "+  eval_expression(lnode.right, lenv),
-        '||': lambda lnode, lenv: eval_expression(lnode.left, lenv) + " || "+  eval_expression(lnode.right, lenv)
-    }
-    if node.operator in simple_operations:
-        return simple_operations[node.operator](eval_expression(node.left, env), eval_expression(node.right, env))
-    elif node.operator in lazy_operations:
-        return lazy_operations[node.operator](node, env)
-    else:
+def eval_range(node, env):
+    # both operators include the end; the runtime picks the direction
+    start = eval_expression(node.left, env)
+    end = eval_expression(node.right, env)
+    return ast.BinaryOperator(node.operator, start, end)
+
+
+def is_range(node):
+    return type(node) == ast.BinaryOperator and node.operator in ('..', '...')
+
+
+# The emitters below push the pieces of a node onto the work list in
+# reverse order: code fragments as strings, operands as nodes. Code that
+# comes before all of its operands can go straight to the parts.
+def emit_binary_operator(node, env, work, parts):
+    code = binary_operators.get(node.operator)
+    if code is None:
         raise Exception('Invalid operator {}'.format(node.operator))
+    work += (node.right, code, node.left)
 
 
-def eval_unary_operator(node, env):
-    operations = {
-        '-': operator.neg,
-        '!': operator.not_,
-    }
-    return operations[node.operator](eval_expression(node.right, env))
+def emit_unary_operator(node, env, work, parts):
+    code = unary_operators[node.operator]
+    if code == '-' and parts and parts[-1].endswith('-'):
+        # `- -x` must not turn into a decrement
+        code = ' -'
+    work += (node.right, code)
+
+
+def emit_group(node, env, work, parts):
+    work += (')', node.left, '(')
+
+
+def emit_getitem(node, env, work, parts):
+    work += (']', node.key, '[', node.left)
+
+
+def emit_array(node, env, work, parts):
+    work.append('}')
+    for index in range(len(node.items) - 1, -1, -1):
+        work.append(node.items[index])
+        if index:
+            work.append(',')
+    work.append('std::vector {')
+
+
+def emit_call(node, env, work, parts):
+    end = ");" if node.tagged == None else ") "
+    hoisted = env.hoisted.get(id(node))
+    if hoisted is not None:
+        parts.append(hoisted + end[1:])
+        return
+
+    function_token = node.left.value
+    function_name = function_token.value
+    function_line = function_token.line
+    function_column = function_token.column
+
+    binding = lookup(env, function_token)
+    if binding is None:
+        err = AbrvalgCompileTimeError("Attempt to call an undefined function or procedure", function_line, function_column)
+        env.report(err, len(function_name))
+
+    fx = binding.value
+    if not isinstance(fx, ast.Function):
+        if not isinstance(fx, ast.Call):
+            err = AbrvalgCompileTimeError("Attempt to call a symbol without a function signature", function_line, function_column) 
+            env.report(err, len(function_name))
+
+
+    n_actual_args = len(node.arguments)
+    if isinstance(fx, ast.Call):
+        expected_args = len(fx.arguments)
+    else:
+        expected_args = len(fx.params)
+
+
+    if n_actual_args != expected_args:
+        message = "Call to function expected {} parameters but received {} parameteres".format(expected_args, n_actual_args)
+        err = AbrvalgCompileTimeError(message, function_line, function_column)
+        env.report(err, len(function_name))
+
+    parts.append(function_name + " (")
+    work.append(end)
+    for i in range(n_actual_args - 1, -1, -1):
+        param = node.arguments[i]
+
+        if isinstance(fx, ast.Call):
+            param_type = fx.arguments[i][1].value
+        elif type(fx.params[i]) == ast.TypedParam:
+            param_type = fx.params[i].data_type.value
+        else:
+            param_type = env.types.params.get(id(fx.params[i]))
+        owned = param_type is not None and param_type not in VIEW_TYPES and is_view(param, env)
+
+        if owned:
+            work.append(')')
+        if type(param) == ast.ClassAccess:
+            work += (')', param, '(')
+        else:
+            work.append(param)
+        if owned:
+            work.append('copy(')
+        if i:
+            work.append(' , ')
+
+
+def emit_classaccess(node, env, work, parts):
+    class_token = node.left.value
+    name = class_token.value
+    line = class_token.line
+    column = class_token.column 
+
+    if lookup(env, class_token) is None:
+        if env.class_table.get(name) == None:
+            err = AbrvalgCompileTimeError('Attempt to access a member of a non existing class', line, column)
+            env.report(err, len(name))
+
+    parts.append(name + '.')
+    if type(node.right) in (ast.Call, ast.Identifier, ast.BinaryOperator):
+        #TODO: fix codegen for obj:: on a BinaryOperator
+        work.append(node.right)
+
+
+def emit_dict(node, env, work, parts):
+    # the key and value types are deduced from the entries, as for arrays
+    if not node.items:
+        parts.append('{}')
+        return
+    work.append('}')
+    for index in range(len(node.items) - 1, -1, -1):
+        key, value = node.items[index]
+        work += ('}', value, ', ', key, 'std::pair {')
+        if index:
+            work.append(', ')
+    parts.append('dict {')
+
+
+expression_emitters = {
+    ast.BinaryOperator: emit_binary_operator,
+    ast.UnaryOperator: emit_unary_operator,
+    ast.GroupExpression: emit_group,
+    ast.SubscriptOperator: emit_getitem,
+    ast.Array: emit_array,
+    ast.Call: emit_call,
+    ast.ClassAccess: emit_classaccess,
+    ast.Dictionary: emit_dict,
+}
+
+
+def eval_expression(node, env):
+    """
+    Operators, groups, subscripts, calls, member accesses and array and
+    dict literals only glue the code of their operands together. They are
+    expanded from an explicit work list into a single list of fragments,
+    so long operator chains and deep nesting neither recurse nor copy
+    partial code. Other nodes, and ranges, which do not evaluate to code,
+    go through eval_node.
+    """
+    if is_range(node):
+        return eval_range(node, env)
+    if type(node) not in expression_emitters:
+        return eval_node(node, env)
+
+    parts = []
+    work = [node]
+    while work:
+        item = work.pop()
+        if type(item) == str:
+            parts.append(item)
+            continue
+        emit = expression_emitters.get(type(item))
+        if emit is None or is_range(item):
+            parts.append(str(eval_node(item, env)))
+        else:
+            emit(item, env, work, parts)
+    return ''.join(parts)
 
 
 def eval_assignment(node, env):
@@ -128,124 +407,197 @@ def eval_assignment(node, env):
         ret = eval_expression(node.right, env)
 
         found = False
-        var = env.get(name)
+        binding = lookup(env, name_token)
 
-        if var != None:
+        if binding is not None:
+            var = binding.value
             if isinstance(var, ast.Call):
                 err = AbrvalgInternalError('Static method and member access is not ready yet! sorry :)', access_line, access_column)
-                report_syntax_error(env.lexer, err, len(access_name))
+                env.report(err, len(access_name))
 
             var_type = var.type.value
             var_type_line = var.type.line
             var_type_column = var.type.column
 
-            if var_type in class_table.asdict():
-                class_members = class_table.get(var_type)
-                for member in class_members:
-                    if isinstance(member, ast.TypedName):
-                            member_name = member.name.value
-                            if member_name == access_name:
-                                return "{}.{} = {};".format(name, access_name, eval_expression(node.right, env))
+            if var_type in env.class_table:
+                member = env.class_table[var_type].get(access_name)
+                if isinstance(member, ast.TypedName):
+                    if is_view(node.right, env) and member.type.value not in VIEW_TYPES:
+                        ret = own(ret)
+                    return "{}.{} = {};".format(name, access_name, ret)
                 
                 err = AbrvalgCompileTimeError('Attempt to access an invalid class method or field', access_line, access_column)
-                report_syntax_error(env.lexer, err, len(access_name))
+                env.report(err, len(access_name))
     
     else:
+        terms = appended_terms(node, env)
+        if terms is not None:
+            return eval_append(node.left.value.value, terms, env)
+
         val = str(eval_expression(node.right, env))
         name_token = node.left.value
         var_name = name_token.value
         line = name_token.line
         column = name_token.column
 
-        if env.get(var_name) == None:
+        binding = lookup(env, name_token)
+        if binding is None:
             err = AbrvalgCompileTimeError('Variable is not defined', line, column)
-            report_syntax_error(env.lexer, err, len(var_name))
+            env.report(err, len(var_name))
+        if is_view(node.right, env) and not is_view(node.left, env):
+            val = own(val)
         return "{} = {};".format(var_name, val)
 
 
-def eval_condition(node, env):
+def appended_terms(node, env):
+    """
+    The terms ``e1, e2, ...`` of an assignment ``x = x + e1 + e2 ...`` to
+    a variable, or None. ``x = x + e`` is the same as ``x += e`` for any
+    type. A longer chain only appends term by term when ``x`` is known to
+    hold a string or a string builder, where the order of the additions
+    makes no difference, and no term reads ``x``.
+    """
+    if type(node.left) != ast.Identifier or lookup(env, node.left.value) is None:
+        return None
+    name = node.left.value.value
+    terms = []
+    right = node.right
+    while type(right) == ast.BinaryOperator and right.operator == '+':
+        terms.append(right.right)
+        right = right.left
+    if not terms or type(right) != ast.Identifier or right.value.value != name:
+        return None
+    if len(terms) > 1 and (not is_appendable(node.left, env) or any(reads_name(term, name) for term in terms)):
+        return None
+    return terms[::-1]
+
+
+def is_appendable(node, env):
+    """Whether the variable ``node`` holds a string or a string builder."""
+    binding = lookup(env, node.value)
+    var = binding.value if binding is not None else None
+    if type(var) == ast.TypedName:
+        return var.type.value in APPENDABLE_TYPES
+    if type(var) == ast.TypedParam:
+        return var.data_type.value in APPENDABLE_TYPES
+    if type(var) == ast.InferedName:
+        return type(var.value) == ast.String
+    return False
+
+
+def reads_name(node, name):
+    work = [node]
+    while work:
+        node = work.pop()
+        if type(node) == ast.Identifier:
+            if node.value.value == name:
+                return True
+        elif isinstance(node, tuple) and not isinstance(node, Token):
+            work.extend(node)
+        elif isinstance(node, list):
+            work.extend(node)
+    return False
+
+
+def eval_append(name, terms, env):
+    code = []
+    for term in terms:
+        # a literal is appended without building a string first
+        value = '"' + term.value + '"' if type(term) == ast.String else eval_expression(term, env)
+        code.append("{} += {};".format(name, value))
+    return " ".join(code)
+
+
+def eval_condition(node, env, out):
     cond  = eval_expression(node.test, env)
 
-    ret_str = " if (" + cond + ") {"
-    _if_body = eval_statements(node.if_body, env) 
-    ret_str += _if_body + "\n}"
+    out.write(" if (" + cond + ") {")
+    eval_block(node.if_body, env, out)
+    out.write("\n}")
 
     for cond in node.elifs:
         cnd = eval_expression(cond.test, env)
-        ret_str += " else if (" + cnd + ") {"
-        else_if_body = eval_statements(cond.body, env)
-        ret_str += else_if_body + "\n}"
+        out.write(" else if (" + cnd + ") {")
+        eval_block(cond.body, env, out)
+        out.write("\n}")
 
     if node.else_body is not None:
-        ret_str += " else {"
-        val = eval_statements(node.else_body, env)
-        ret_str += val + "\n}"
-
-    return ret_str
+        out.write(" else {")
+        eval_block(node.else_body, env, out)
+        out.write("\n}")
 
 
-def eval_match(node, env):
+def eval_match(node, env, out):
     test = eval_expression(node.test, env)
-    ret_str = "switch (" + test + ") {\n"
+    out.write("switch (" + test + ") {")
     for pattern in node.patterns:
-        #if eval_expression(pattern.pattern, env) == test:
-        #    return eval_statements(pattern.body, env)
-        body = eval_statements(pattern.body, env)
         match = eval_expression(pattern.pattern, env)
-        ret_str += "case " + match + ":\n{" + body + "\nbreak;\n}\n"
+        out.write("\ncase " + match + ": {")
+        out.indent()
+        eval_statements(pattern.body, env, out)
+        out.write("\nbreak;")
+        out.dedent()
+        out.write("\n}")
     if node.else_body is not None:
-        default = eval_statements(node.else_body, env)
-        ret_str += " default:\n{" + default + "\n}\n"
-    ret_str += "}\n"
-
-    return ret_str
-
-
-def eval_while_loop(node, env):
+        out.write("\ndefault: {")
+        eval_block(node.else_body, env, out)
+        out.write("\n}")
+    out.write("\n}\n")
+
+
+def eval_hoisted(node, env, out):
+    """
+    Write the calls in the loop ``node`` that give the same value on every
+    iteration into temporaries before it, see invariants.invariant_calls.
+    """
+    names = {}
+    for call in invariant_calls(node, env.bindings, env.hoisted):
+        code = eval_expression(call, env).rstrip("; ")
+        name = names.get(code)
+        if name is None:
+            name = "_hoisted_{}_{}".format(call.left.value.value, len(env.hoists))
+            out.write("const auto {} = {};\n".format(name, code))
+            names[code] = name
+        env.hoisted[id(call)] = name
+        env.hoists.append((call.left.value.line, code, name))
+
+
+def eval_while_loop(node, env, out):
+    eval_hoisted(node, env, out)
     cond = eval_expression(node.test, env)
-    body = eval_statements(node.body, env)
 
-    ret_str = 'while (' + cond + ') {'
-    ret_str += body + '\n}\n'
-    return ret_str
+    out.write('while (' + cond + ') {')
+    eval_block(node.body, env, out)
+    out.write('\n}\n')
 
 
-def eval_for_loop(node, env):
+def eval_for_loop(node, env, out):
     var_name = node.var_name
-    env.set(var_name,0)
     collection = eval_expression(node.collection, env)
 
-    ret_str = 'for '
+    eval_hoisted(node, env, out)
+    out.write('for ')
 
     if isinstance(collection, ast.BinaryOperator):
-        if collection.operator == '..':
-            left= collection.left, 
-            right = collection.right
-            left = str(left[0])
-            right = str(right)
-
-            ret_str += '( auto ' + var_name + ': range::range(' + left + "," + right + ')) {' #+ " + 1"
-            #ret_str += '; ' + var_name 
-            body = eval_statements(node.body, env) 
-            ret_str += body + "\n}"
-        else:
-            print("Syntax error: Invalid loop operator "+ collection.operator)
-            exit()
+        # a lazy view: the bounds are evaluated once and nothing is allocated
+        out.write('( auto ' + var_name + ': range::view(' + collection.left + "," + collection.right + ')) {')
+        eval_block(node.body, env, out)
+        out.write("\n}")
     elif isinstance(collection, str):
-        ret_str += "(auto {}: {}) ".format(var_name, collection) + "{"
-        ret_str += eval_statements(node.body, env) + "\n}"
-
-    return ret_str
+        # elements the body does not modify are not copied
+        binding = "const auto&" if id(node) in env.usage.references else "auto"
+        out.write("({} {}: {}) ".format(binding, var_name, collection) + "{")
+        eval_block(node.body, env, out)
+        out.write("\n}")
 
 
-def eval_function_declaration(node, env):
+def eval_function_signature(node, env):
+    """Return the return type and the parameter list of the function ``node``."""
     name_token = node.name
     func_name = name_token.value
     func_line = name_token.line
     func_column = name_token.column 
 
-    env.set(func_name, node)
-
     if node.ret != None:
         func = node.ret[1]
     else:
@@ -261,13 +613,10 @@ def eval_function_declaration(node, env):
         if node.ret != None:
             func = node.ret[1]
         else:
-            func = "auto"
+            func = env.types.returns.get(id(node), "auto")
         params = node.params
 
-    func = func + " " + func_name + "(" 
-    call_env = Environment(env, None)
-    call_env.lexer = env.lexer 
-
+    signature = []
     for i in range(0, len(params)):
         param = params[i]
         if type(param) == ast.TypedParam:
@@ -281,42 +630,72 @@ def eval_function_declaration(node, env):
             param_type = param_type_token.value
             param_type_colum = param_type_token.column 
 
-            func = func + param_type + " " + param_name  
+            if id(param) in env.usage.references:
+                param_type = "const " + param_type + "&"
+            signature.append(param_type + " " + param_name)
 
-            if call_env.get(param_name) != None:
+            if lookup(env, param_name_token) is not None:
                 err = AbrvalgCompileTimeError('Redefinition of parameter not allowed', param_line, param_name_colum)
-                report_syntax_error(env.lexer, err, len(param_name))
+                env.report(err, len(param_name))
 
-            call_env.set(param_name, 0)
         else:
             name = param.value
             line = param.line 
             column = param.column 
 
-            if call_env.get(name) != None:
+            if lookup(env, param) is not None:
                 err = AbrvalgCompileTimeError('Redefinition of parameter not allowed', line, column)
-                report_syntax_error(env.lexer, err, len(name))
-            call_env.set(name, 0)
-            func = func + "auto " + name 
+                env.report(err, len(name))
+            # a type every call agrees on makes a function instead of a template
+            param_type = env.types.params.get(id(param), "auto")
+            if id(param) in env.usage.references and param_type not in SCALAR_TYPES:
+                signature.append("const " + param_type + "& " + name)
+            else:
+                signature.append(param_type + " " + name)
 
 
         if i != len(params) -1:
-            func = func + ", "
-
-    func = func + ") {"
-    res = None
-    try:
-        res = eval_statements(node.body, call_env)
-        func = func + str(res) + "\n}\n" 
-    except Return as ret:
-        return ret.value
-
-    env.set(func_name, node)   
-    return func
+            signature.append(", ")
+
+    return func, "".join(signature)
+
+
+def eval_function_declaration(node, env, out, owner=None, prototype=None):
+    """
+    Write the function ``node`` to ``out``, as a member of the class
+    ``owner`` if given. When ``prototype`` is given, the declaration is
+    written there as well, for a definition in another translation unit.
+    """
+    func, params = eval_function_signature(node, env)
+    if prototype is not None:
+        prototype.write(func + " " + node.name.value + "(" + params + ");")
+    name = node.name.value if owner is None else owner + "::" + node.name.value
+    out.write(func + " " + name + "(" + params + ") {")
+    if owner is None and node.name.value == "main":
+        out.indent()
+        if env.c_stdio:
+            # keep the order of everything written to stdout
+            out.write("\nfalcon::unbuffered_output();")
+        else:
+            out.write("\nstd::ios_base::sync_with_stdio(false);")
+        out.dedent()
+    return_type = env.return_type
+    env.return_type = func
+    eval_block(node.body, env, out)
+    env.return_type = return_type
+    out.write("\n}\n")
+
+
+def is_separable(node, env):
+    """
+    Whether the function ``node`` can be defined in another translation
+    unit than its callers: ``auto`` return types and parameters need the
+    definition in sight.
+    """
+    if node.ret is None and id(node) not in env.types.returns:
+        return False
+    return all(type(param) == ast.TypedParam or id(param) in env.types.params for param in node.params)
 
-def eval_group(node, env):
-    ret = "(" + eval_expression(node.left, env) + ")"
-    return ret
 
 def eval_auto_var(node, env):
     name_token = node.name 
@@ -324,22 +703,18 @@ def eval_auto_var(node, env):
     line = name_token.line
     column = name_token.column 
 
-    if env.get(name) != None:
+    if lookup(env, name_token) is not None:
         err = AbrvalgCompileTimeError('Variable is already defined', line, column)
-        report_syntax_error(env.lexer, err, len(name))
+        env.report(err, len(name))
 
-    env.set(name, node)
     value = eval_expression(node.value, env)
     return "auto {} = {};".format(name, value)
 
-def eval_cpp(node, env):
-    ret = ""
+def eval_cpp(node, env, out):
     for statemts in node.statements:
-        ret += "{}\n".format(statemts.value)
-    
-    return ret
+        out.write("{}\n".format(statemts.value))
 
-def eval_enum(node, env):
+def eval_enum(node, env, out):
     name_obj = node.name
     name = name_obj.value
     line = name_obj.line
@@ -347,65 +722,31 @@ def eval_enum(node, env):
 
     items = node.items
 
-    str = 'enum %s\n{\n' % (name)
+    out.write('enum %s\n{\n' % (name))
+    out.indent()
     for item in items:
         n = item.value
-        str = str + n  + ',\n'
-        env.set(n, item)
-    str = str + "};\n"
-
-    return str
-    
-
-def eval_classaccess(node, env):
-    ret_str = ""
-    class_token = node.left.value
-    name = class_token.value
-    line = class_token.line
-    column = class_token.column 
-
-    is_obj = False
-    is_class = False
-    if env.get(name) == None:
-        if class_table.get(name) == None:
-            err = AbrvalgCompileTimeError('Attempt to access a member of a non existing class', line, column)
-            report_syntax_error(env.lexer, err, len(name))
-        else:
-            is_class = True
-    else:
-        is_obj = True
-
-    res = ""
-    if type(node.right) == ast.Call:
-        res = eval_call(node.right, env)
-    elif type(node.right) == ast.Identifier :
-        res = eval_expression(node.right, env)
-    elif type(node.right) == ast.BinaryOperator:
-        res = eval_expression(node.right, env)
-        #TODO: fix codegen for obj::
-        
-    if is_class != None:
-        ret_str += name +'.'
-    else:
-        ret_str += name +'().'
-
-    ret_str += res
-
-    return ret_str
-
-
-def eval_classdef(node, env):
+        out.write(n  + ',\n')
+    out.dedent()
+    out.write("};\n")
+
+def eval_classdef(node, env, out, methods=None):
+    """
+    Write the class ``node`` to ``out``. When ``methods`` is given, the
+    methods that allow it are only declared in the class and defined
+    there instead.
+    """
     class_name_token = node.name
     name = class_name_token.value
     line = class_name_token.line
     column = class_name_token.column
-    ret_str = 'class ' + name
+    header = 'class ' + name
 
-    if class_table.get(name) != None:
+    if env.class_table.get(name) != None:
         err = AbrvalgCompileTimeError('Class is already defined', line, column)
-        report_syntax_error(env.lexer, err, len(name))
+        env.report(err, len(name))
 
-    ret_str += ": public FalconBase"
+    header += ": public FalconBase"
 
     for i in range(0,len(node.parents)):
         parent_token = node.parents[i] 
@@ -413,19 +754,19 @@ def eval_classdef(node, env):
         parent_line = parent_token.line 
         parent_column = parent_token.column
 
-        if class_table.get(parent_name) == None:
+        if env.class_table.get(parent_name) == None:
             err = AbrvalgCompileTimeError('Attempt to inherit a non-existing class', parent_line, parent_column)
-            report_syntax_error(env.lexer, err, len(parent_name))
+            env.report(err, len(parent_name))
 
         elif i < len(node.parents) - 1:
-            ret_str += ", public " + parent_name
+            header += ", public " + parent_name
         else:
-            ret_str += parent_name 
+            header += parent_name 
 
-    ret_str += " {\npublic:\n"
-    body = ""
+    out.write(header + " {\npublic:\n")
+    out.indent()
     params = []
-    methods = []
+    members = {}
     for stmt in node.body:
         if isinstance(stmt, ast.TypedName):
             name_token = stmt.name
@@ -437,10 +778,10 @@ def eval_classdef(node, env):
             
             if stmt.value != None:
                 err = AbrvalgCompileTimeError('Variable assignment is not permitted outside of methods', line, column)
-                report_syntax_error(env.lexer, err, len(var_name))
-            methods.append(stmt)
-            pr = eval_typed_var(stmt, env)
-            ret_str += pr + "\n"
+                env.report(err, len(var_name))
+            if not isinstance(members.get(var_name), ast.TypedName):
+                members[var_name] = stmt
+            out.write(eval_typed_var(stmt, env) + "\n")
             params.append((name_token, type_token))
 
         elif isinstance(stmt, ast.Assignment):
@@ -449,42 +790,40 @@ def eval_classdef(node, env):
             line = token.line
             column = token.column 
             err = AbrvalgCompileTimeError('Type inferance is not permitted outside class methods', line, column)
-            report_syntax_error(env.lexer, err, len(var_name))
+            env.report(err, len(var_name))
 
         elif isinstance(stmt, ast.Function):
-            methods.append(stmt)
-            pr = eval_statement(stmt, env)
-            ret_str += pr
+            members.setdefault(stmt.name.value, stmt)
+            if methods is not None and is_separable(stmt, env):
+                out.write("\n")
+                eval_function_declaration(stmt, env, methods, owner=name, prototype=out)
+                out.write("\n")
+            else:
+                eval_statement(stmt, env, out)
 
         else:
-            pr = eval_statement(stmt, env)
-            ret_str += pr
-
-    cons = ""
-    stmt = ""
-    __class__ = "\"{}(\" + ".format(name)
-    for index in range(0, len(params)):
-        name_token, type_token = params[index]
-
-        stmt = stmt + "\nthis->" + name_token.value + " = " + name_token.value + ";"
-        
-        if index < len(params) - 1:
-            __class__ += "this->{} + \",\" + ".format(name_token.value)
-            cons = cons + " " + type_token.value + " " + name_token.value + ","
+            eval_statement(stmt, env, out)
+
+    cons = []
+    for name_token, type_token in params:
+        cons.append(" " + type_token.value + " " + name_token.value)
+
+    out.write("{}({})".format(name, ",".join(cons)) + "{\n")
+    out.indent()
+    for name_token, type_token in params:
+        if type_token.value in SCALAR_TYPES:
+            out.write("\nthis->" + name_token.value + " = " + name_token.value + ";")
         else:
-            cons = cons + " " + type_token.value + " " + name_token.value
-            __class__ += "this->{} + \")\"".format(name_token.value)
-        
+            out.write("\nthis->" + name_token.value + " = std::move(" + name_token.value + ");")
+    out.dedent()
+    out.write("\n}\n")
+    out.write("{}()".format(name) + "{}\n")
+    out.write("~" +name + "() {}\n")
+    out.dedent()
 
-    
-    ret_str += "{}({})".format(name, cons) + "{\n" + "{}\n\n ".format(stmt) + "}\n"
-    ret_str += "{}()".format(name) + "{}\n"
-    ret_str += "~" +name + "() {}\n"
+    out.write("\n};\n")
+    env.class_table[name] = members
 
-    ret_str += body + "\n};\n"
-    class_table.set(name, methods)
-    env.set(name, ast.Call(name, params, None))
-    return ret_str
 
 def eval_include(node, env):
     module = node.module
@@ -505,151 +844,84 @@ def eval_typed_var(node, env):
 
     ret_str = var_type + " " + var_name
     
-    if env.get(var_name) != None:
+    if lookup(env, var_name_token) is not None:
         err = AbrvalgCompileTimeError("Variable is already defined", var_line, var_column)
-        report_syntax_error(env.lexer, err, len(var_name))
-    else:
-        env.set(var_name, node)
+        env.report(err, len(var_name))
     val = ""
     if node.value != None:
-        val = " = " + str(eval_expression(node.value, env))
+        val = str(eval_expression(node.value, env))
+        if var_type not in VIEW_TYPES and is_view(node.value, env):
+            val = own(val)
+        val = " = " + val
     ret_str += val + ";"
     return ret_str
 
-def eval_call(node, env):
-    function_token = node.left.value
-    function_name = function_token.value
-    function_line = function_token.line
-    function_column = function_token.column
-
-    if env.get(function_name) == None:
-        err = AbrvalgCompileTimeError("Attempt to call an undefined function or procedure", function_line, function_column)
-        report_syntax_error(env.lexer, err, len(function_name))
-
-    if not isinstance(env.get(function_name), ast.Function):
-        if not isinstance(env.get(function_name), ast.Call):
-            print(env.get(function_name))
-            err = AbrvalgCompileTimeError("Attempt to call a symbol without a function signature", function_line, function_column) 
-            report_syntax_error(env.lexer, err, len(function_name))
-
-    fx = env.get(function_name)
-    ret_str = function_name + " ("
-
-    n_actual_args = len(node.arguments)
-    if isinstance(fx, ast.Call):
-        expected_args = len(fx.arguments)
-    else:
-        expected_args = len(fx.params)
-
-
-    if n_actual_args != expected_args:
-        message = "Call to function expected {} parameters but received {} parameteres".format(expected_args, n_actual_args)
-        err = AbrvalgCompileTimeError(message, function_line, function_column)
-        report_syntax_error(env.lexer, err, len(function_name))
-
-
-    for i in range(0, n_actual_args):
-        param = node.arguments[i]
-
-        val = ""
-        
-        if type(param) == ast.BinaryOperator:
-            val = str(eval_expression(param, env))
-        elif type(param) == ast.ClassAccess:
-            val = "(" + str(eval_classaccess(param, env)) + ")"
-        elif type(param) == ast.String:
-            val = 'string("' + param.value + '")'
-        elif type(param) == ast.Call:
-            val = eval_call(param, env)
-        elif type(param) == ast.SubscriptOperator:
-            val = str(eval_expression(param, env))
-        else:
-            val = eval_expression(param, env)
-
-        if i != n_actual_args -1:
-            ret_str += val + " , "
-        else:
-            ret_str += val 
-        
-    if node.tagged == None:
-        return ret_str + ");"
-    else:
-        return ret_str + ") "
-
 def eval_identifier(node, env):
     token = node.value
     name = token.value
     line = token.line
     column = token.column
 
-    val = env.get(name)
-    if val is None:
+    if lookup(env, token) is None:
         err = AbrvalgCompileTimeError("Variable is not defined", line, column)
-        report_syntax_error(env.lexer, err, len(name))
+        env.report(err, len(name))
+    if id(token) in env.usage.moves:
+        # the last read of the variable
+        return "std::move(" + name + ")"
     return name
 
 
-def eval_getitem(node, env):
-    #print(node)
-    collection = eval_expression(node.left, env)
-    key = eval_expression(node.key, env)
-    return collection + '[' + key + ']'
-
-
 def eval_setitem(node, env):
     collection = eval_expression(node.left.left, env)
     key = eval_expression(node.left.key, env)
     val = eval_expression(node.right, env)
 
+    # a dict inserts missing keys, an array checks its bounds
+    if is_dict(node.left.left, env):
+        return collection + '[' + key + '] = ' + val + ';'
     return collection + '.at(' + key + ') = ' + val + ';'
 
 
-def eval_array(node, env):
-    ret_str = "std::vector {"
-    for i  in range(0, len(node.items)):
-        item = node.items[i]
-        val = eval_expression(item, env) 
-        if i < len(node.items) -1:
-            ret_str += val + ","
-        else:
-            ret_str += val 
-
-    return ret_str + '}'
-
-
-def eval_dict(node, env):
-    return {eval_expression(key, env): eval_expression(value, env) for key, value in node.items}
-
-
 def eval_return(node, env):
-    return "return " + str(eval_expression(node.value, env)) + ";" if node.value is not None else "return ;"
+    if node.value is None:
+        return "return ;"
+    value = str(eval_expression(node.value, env))
+    # a view of a local would dangle
+    if env.return_type not in VIEW_TYPES and is_view(node.value, env):
+        value = own(value)
+    return "return " + value + ";"
 
 
 evaluators = {
     ast.Number: lambda node, env: str(node.value),
     ast.String: lambda node, env: 'string("' + str(node.value) + '")',
-    ast.Array: eval_array,
-    ast.Dictionary: eval_dict,
+    ast.Array: eval_expression,
+    ast.Dictionary: eval_expression,
     ast.Identifier: eval_identifier,
-    ast.BinaryOperator: eval_binary_operator,
-    ast.UnaryOperator: eval_unary_operator,
-    ast.SubscriptOperator: eval_getitem,
+    ast.BinaryOperator: eval_expression,
+    ast.UnaryOperator: eval_expression,
+    ast.SubscriptOperator: eval_expression,
     ast.Assignment: eval_assignment,
+    ast.Call: eval_expression,
+    ast.Return: eval_return,
+    ast.TypedName: eval_typed_var, 
+    ast.UsingNode: eval_include, 
+    ast.ClassAccess: eval_expression, 
+    ast.GroupExpression: eval_expression, 
+    ast.InferedName: eval_auto_var
+}
+
+# Statements that contain blocks write their code to a CodeWriter instead
+# of returning it.
+statement_evaluators = {
     ast.Condition: eval_condition,
     ast.Match: eval_match,
     ast.WhileLoop: eval_while_loop,
     ast.ForLoop: eval_for_loop,
     ast.Function: eval_function_declaration,
-    ast.Call: eval_call,
-    ast.Return: eval_return,
-    ast.TypedName: eval_typed_var, 
-    ast.UsingNode: eval_include, 
     ast.ClassDefinition: eval_classdef,
-    ast.ClassAccess: eval_classaccess, 
-    ast.GroupExpression: eval_group, 
-    ast.Enum: eval_enum, 
-    ast.Cpp: eval_cpp, 
-    ast.InferedName: eval_auto_var
+    ast.Enum: eval_enum,
+    ast.Cpp: eval_cpp,
 }
 
 
@@ -661,30 +933,44 @@ def eval_node(node, env):
         raise Exception('Unknown node {} {}'.format(tp.__name__, node))
 
 
-def eval_expression(node, env):
-    return eval_node(node, env)
+def eval_statement(node, env, out):
+    tp = type(node)
+    if tp in statement_evaluators:
+        statement_evaluators[tp](node, env, out)
+    else:
+        out.write(str(eval_node(node, env)))
 
 
-def eval_statement(node, env):
-    return eval_node(node, env)
+def write_line(statement, env, out):
+    """
+    Name the source line of ``statement`` for the code written after it,
+    when the program is compiled with its ``source_name``. A statement
+    of literals only, like ``return 0``, has no token and keeps the line
+    before it.
+    """
+    if env.source_name is None:
+        return
+    token = first_token(statement)
+    if token is not None and token.line > 0:
+        out.write(line_directive(env.source_name, token.line))
 
 
-def eval_statements(statements, env):
-    ret = None
-    str_res = ""
+def eval_statements(statements, env, out):
     for statement in statements:
         if isinstance(statement, ast.Break):
-            str_res += '\nbreak;'
-            continue
+            out.write('\nbreak;')
         elif isinstance(statement, ast.Continue):
-            str_res += '\ncontinue;'
-            continue
+            out.write('\ncontinue;')
         else:
-            ret = eval_statement(statement, env)
-            str_res += "\n" + str(ret) 
+            out.write("\n")
+            write_line(statement, env, out)
+            eval_statement(statement, env, out)
 
 
-    return str_res
+def eval_block(statements, env, out):
+    out.indent()
+    eval_statements(statements, env, out)
+    out.dedent()
 
 
 def add_builtins(env):
@@ -704,63 +990,184 @@ def add_builtins(env):
         'len': ast.Function(ast.Identifier('len'), ['array'], [], 'size'),
         'open': ast.Function(ast.Identifier('open'), ['filename', 'mode'], [], 'file'),
         'readfile': ast.Function(ast.Identifier('readfile'), ['filePtr'], [], 'string'), 
+        'mapfile': ast.Function(ast.Identifier('mapfile'), ['filename'], [], 'strview'),
+        'unmapfile': ast.Function(ast.Identifier('unmapfile'), ['view'], [], 'i32'),
         'closefile': ast.Function(ast.Identifier('closefile'), ['filePtr'], [], 'i32'), 
         'readline': ast.Function(ast.Identifier('readline'), [], [], 'string'),
-        'string': ast.Function(ast.Identifier('string'), ['convert'], [], 'string')
+        'flush': ast.Function(ast.Identifier('flush'), [], [], 'i32'),
+        'read_i64': ast.Function(ast.Identifier('read_i64'), [], [], 'i64'),
+        'read_f64': ast.Function(ast.Identifier('read_f64'), [], [], 'f64'),
+        'lines': ast.Function(ast.Identifier('lines'), ['filePtr'], [], 'lines'),
+        'string': ast.Function(ast.Identifier('string'), ['convert'], [], 'string'),
+        'copy': ast.Function(ast.Identifier('copy'), ['view'], [], 'owned'),
+        'contains': ast.Function(ast.Identifier('contains'), ['dict', 'key'], [], 'bool'),
+        'erase': ast.Function(ast.Identifier('erase'), ['dict', 'key'], [], 'i32'),
+        'append': ast.Function(ast.Identifier('append'), ['builder', 'value'], [], 'i32'),
+        'reserve': ast.Function(ast.Identifier('reserve'), ['builder', 'size'], [], 'i32'),
+        'tostring': ast.Function(ast.Identifier('tostring'), ['builder'], [], 'string')
     }
 
     for key in builtins.keys():
         env.set(key, builtins[key])
+    env.builtins = frozenset(builtins)
 
 
-def create_global_env():
-    env = Environment()
+def create_global_env(exit_on_error=True):
+    env = CompilationContext(exit_on_error)
     add_builtins(env)
     return env
 
 
-def evaluate_env(s, env, verbose=False, file=False):
+def parse_env(s, env, verbose=False, stream=False, compact=False, optimize=DEFAULT_LEVEL):
+    """
+    Parse the program read from ``s``, optimize it at level ``optimize``
+    and resolve its names into ``env.bindings``. Errors are reported
+    through the CompilationContext ``env``.
+    """
     lexer = Lexer(s.name)
-    try:
-        tokens = lexer.tokenize(s.read())
-    except AbrvalgSyntaxError as err:
-        report_syntax_error(lexer, err)
-        if verbose:
-            raise
-        else:
-            return
+    env.lexer = lexer
+    if stream and not verbose:
+        # tokens are produced while parsing, lexer errors surface from Parser.parse
+        token_stream = LazyTokenStream(lexer.iter_tokens(s))
+    else:
+        try:
+            if compact:
+                tokens = lexer.tokenize_compact(s.read())
+            else:
+                tokens = lexer.tokenize(s.read())
+        except AbrvalgSyntaxError as err:
+            env.report(err)
 
-    if verbose:
-        print('Tokens')
-        print_tokens(tokens)
-        print()
+        if verbose:
+            print('Tokens')
+            print_tokens(tokens)
+            print()
 
-    token_stream = TokenStream(tokens)
+        token_stream = CompactTokenStream(tokens) if compact else TokenStream(tokens)
 
     try:
         program = Parser().parse(token_stream)
     except AbrvalgSyntaxError as err:
-        report_syntax_error(lexer, err)
-        if verbose:
-            raise
-        else:
-            return
+        env.report(err)
+
+    optimizer = Optimizer(optimize)
+    program = optimizer.optimize(program)
 
     if verbose:
         print('AST')
         print_ast(program.body)
         print()
+        print('Removed')
+        print_removed(optimizer.removed)
+        print()
 
-    env.lexer = lexer
-    ret = eval_statements(program.body, env)
+    env.bindings = resolve(program, env)
+    env.usage = analyze(program, env)
+    env.types = infer(program, env)
+    env.c_stdio = uses_c_stdio(program.body, env)
+    return program
+
+
+def evaluate_env(s, env, verbose=False, file=False, stream=False, compact=False, out=None, optimize=DEFAULT_LEVEL,
+                 name_source=False):
+    """
+    Transpile the program read from ``s``. The code is written to the
+    CodeWriter ``out`` when one is given, otherwise it is returned.
+    Errors are reported through the CompilationContext ``env``. With
+    ``name_source`` every statement names its line in ``s.name``.
+    """
+    program = parse_env(s, env, verbose, stream, compact, optimize)
+    env.source_name = s.name if name_source else None
+    buffer = None
+    if out is None:
+        buffer = io.StringIO()
+        out = CodeWriter(buffer)
+    eval_statements(program.body, env, out)
+    out.flush()
 
     if verbose:
+        print('Types')
+        print_types(program.body, env.types)
+        print()
+        print('Hoisted')
+        print_hoisted(env.hoists)
+        print()
         print('Environment')
         print_env(env)
         print()
 
-    return "{}".format(ret)
+    if buffer is not None:
+        return buffer.getvalue()
+
+
+def eval_split_statements(statements, env, header):
+    """
+    Write the top level ``statements`` as a header of declarations, and
+    return one translation unit per function or class that has code to
+    move out of the header. The header keeps everything that must be
+    seen by every unit: types, globals as inline variables, and the
+    functions that cannot be defined separately as inline functions.
+    """
+    units = []
+    for statement in statements:
+        header.write("\n")
+        write_line(statement, env, header)
+        tp = type(statement)
+        if tp == ast.Function or tp == ast.ClassDefinition:
+            buffer = io.StringIO()
+            unit = CodeWriter(buffer)
+            if tp == ast.ClassDefinition:
+                eval_classdef(statement, env, header, methods=unit)
+            elif is_separable(statement, env):
+                write_line(statement, env, unit)
+                eval_function_declaration(statement, env, unit, prototype=header)
+            else:
+                header.write("inline ")
+                eval_function_declaration(statement, env, header)
+            unit.flush()
+            if buffer.getvalue():
+                units.append(buffer.getvalue())
+        elif tp == ast.TypedName or tp == ast.InferedName:
+            header.write("inline ")
+            eval_statement(statement, env, header)
+        elif isinstance(statement, ast.Break):
+            header.write('break;')
+        elif isinstance(statement, ast.Continue):
+            header.write('continue;')
+        else:
+            eval_statement(statement, env, header)
+    return units
+
+
+def evaluate_split_env(s, env, verbose=False, stream=False, compact=False, optimize=DEFAULT_LEVEL, name_source=False):
+    """
+    Transpile the program read from ``s`` into separately compiled
+    pieces. Returns the declarations header and the list of translation
+    units, each of which has to include the header. ``name_source`` is
+    as for evaluate_env.
+    """
+    program = parse_env(s, env, verbose, stream, compact, optimize)
+    env.source_name = s.name if name_source else None
+    buffer = io.StringIO()
+    header = CodeWriter(buffer)
+    units = eval_split_statements(program.body, env, header)
+    header.flush()
+
+    if verbose:
+        print('Types')
+        print_types(program.body, env.types)
+        print()
+        print('Hoisted')
+        print_hoisted(env.hoists)
+        print()
+    return buffer.getvalue(), units
+
+
+def evaluate(s, verbose=False, stream=False, compact=False, out=None, optimize=DEFAULT_LEVEL, name_source=False):
+    return evaluate_env(s, create_global_env(), verbose, stream=stream, compact=compact, out=out, optimize=optimize,
+                        name_source=name_source)
 
 
-def evaluate(s, verbose=False):
-    return evaluate_env(s, create_global_env(), verbose)
+def evaluate_split(s, verbose=False, stream=False, compact=False, optimize=DEFAULT_LEVEL, name_source=False):
+    return evaluate_split_env(s, create_global_env(), verbose, stream=stream, compact=compact, optimize=optimize,
+                              name_source=name_source)
@@ -0,0 +1,122 @@
+"""
+Invariants
+----------
+
+Calls in a loop that give the same result on every iteration, found for
+code generation to evaluate them once before the loop.
+"""
+from falconback import ast
+from falconback.lexer import Token
+from falconback.usage import FunctionUsage
+
+# builtins without side effects that cannot fail and return a number:
+# with arguments a loop does not modify, a call returns the same value on
+# every iteration, and evaluating it before the loop, even if the loop
+# would not have reached it, changes nothing
+PURE_BUILTINS = ('len', 'contains')
+
+# builtins whose values read a file as they are walked, so counting them
+# twice does not give the same number
+STREAM_RETURNS = ('lines',)
+
+
+def builtin_name(node, bindings):
+    """The name of the builtin ``node`` calls, or None if it is not a call of a builtin."""
+    if type(node) != ast.Call:
+        return None
+    binding = bindings.get(id(node.left.value))
+    fx = binding.value if binding is not None else None
+    if isinstance(fx, ast.Function) and type(fx.name) == ast.Identifier:
+        return fx.name.value
+    return None
+
+
+def is_pure_call(node, bindings):
+    return builtin_name(node, bindings) in PURE_BUILTINS
+
+
+def is_stream(decl, bindings):
+    if type(decl) == ast.InferedName:
+        binding = bindings.get(id(decl.value.left.value)) if type(decl.value) == ast.Call else None
+        fx = binding.value if binding is not None else None
+        return isinstance(fx, ast.Function) and fx.ret in STREAM_RETURNS
+    return False
+
+
+class LoopInvariants(object):
+    """
+    The names a loop may change are the ones FunctionUsage finds modified
+    in its test and body, the ones it declares, its for loop variable, and
+    everything when it holds inline C++. Globals and class members may
+    change in any function the loop calls, so only the names of the
+    enclosing function count as unchanged.
+    """
+
+    def __init__(self, loop, bindings):
+        self.bindings = bindings
+        self.usage = FunctionUsage([], [loop], bindings)
+
+    def is_invariant(self, node):
+        tp = type(node)
+        if tp in (ast.Number, ast.String):
+            return True
+        if tp == ast.Identifier:
+            binding = self.bindings.get(id(node.value))
+            if binding is None or binding.depth == 0:
+                return False
+            decl = id(binding.value)
+            if decl in self.usage.modified or decl in self.usage.decls:
+                return False
+            return not is_stream(binding.value, self.bindings)
+        if tp == ast.BinaryOperator:
+            return self.is_invariant(node.left) and self.is_invariant(node.right)
+        if tp == ast.UnaryOperator:
+            return self.is_invariant(node.right)
+        if tp == ast.GroupExpression:
+            return self.is_invariant(node.left)
+        if is_pure_call(node, self.bindings):
+            return all(self.is_invariant(argument) for argument in node.arguments)
+        return False
+
+    def calls(self, loop, skip):
+        """
+        The outermost invariant calls of pure builtins in ``loop``, in
+        source order, leaving out the ids in ``skip``. Calls that are
+        statements of their own are left where they are.
+        """
+        if self.usage.opaque:
+            return []
+        found = []
+        # a for loop evaluates its collection once already
+        work = [loop.body] if type(loop) == ast.ForLoop else [loop.body, loop.test]
+        while work:
+            node = work.pop()
+            tp = type(node)
+            if id(node) in skip:
+                continue
+            if tp == ast.Call and is_pure_call(node, self.bindings) and self.is_invariant(node):
+                found.append(node)
+                continue
+            if tp in (ast.Function, ast.ClassDefinition, ast.Cpp) or isinstance(node, Token):
+                continue
+            if tp == ast.ClassAccess:
+                # the right side names a member, only call arguments are expressions
+                children = [node.left] + (list(node.right.arguments) if type(node.right) == ast.Call else [])
+            elif tp == ast.Call:
+                children = node.arguments
+            elif isinstance(node, (tuple, list)):
+                children = node
+            else:
+                continue
+            for child in reversed(children):
+                if type(child) == ast.Call and isinstance(node, list):
+                    # an expression statement, there is nothing to save
+                    work.extend(reversed(child.arguments))
+                else:
+                    work.append(child)
+        return found
+
+
+def invariant_calls(loop, bindings, skip=()):
+    """The calls of pure builtins in ``loop`` to evaluate once before it, see LoopInvariants.calls."""
+    return LoopInvariants(loop, bindings).calls(loop, skip)
@@ -0,0 +1,157 @@
+"""
+Jobs
+----
+
+Running external commands in parallel, within a job limit or the slots
+handed out by a GNU make jobserver.
+"""
+import os
+import select
+import stat
+import subprocess
+import time
+from collections import deque
+
+
+class JobServer(object):
+    """
+    Client of the GNU make jobserver named in ``MAKEFLAGS``. Every job but
+    the first needs a token read from the jobserver, which must be written
+    back when the job finishes.
+    """
+
+    def __init__(self, read_fd, write_fd):
+        self.read_fd = read_fd
+        self.write_fd = write_fd
+
+    @classmethod
+    def from_environ(cls, environ=os.environ):
+        """Return the jobserver we were started under, or None."""
+        auth = None
+        for word in environ.get('MAKEFLAGS', '').split():
+            if word.startswith(('--jobserver-auth=', '--jobserver-fds=')):
+                auth = word.split('=', 1)[1]
+        if not auth:
+            return None
+        try:
+            if auth.startswith('fifo:'):
+                fd = os.open(auth[len('fifo:'):], os.O_RDWR | os.O_NONBLOCK)
+                return cls(fd, fd)
+            read_fd, write_fd = (int(fd) for fd in auth.split(','))
+            if not (stat.S_ISFIFO(os.fstat(read_fd).st_mode) and stat.S_ISFIFO(os.fstat(write_fd).st_mode)):
+                return None
+            # reopen the pipe so it can be made non-blocking without
+            # changing the descriptor make and its other children share
+            fd = os.open('/proc/self/fd/{}'.format(read_fd), os.O_RDONLY | os.O_NONBLOCK)
+            return cls(fd, write_fd)
+        except (OSError, ValueError):
+            # make did not pass the descriptors on (a recipe without `+`)
+            return None
+
+    def try_acquire(self):
+        """Return a token, or None if no job slot is free right now."""
+        try:
+            return os.read(self.read_fd, 1) or None
+        except BlockingIOError:
+            return None
+
+    def release(self, token):
+        os.write(self.write_fd, token)
+
+    def wait(self, timeout):
+        select.select([self.read_fd], [], [], timeout)
+
+
+class JobSlots(object):
+    """
+    Bounds how many jobs run at once: at most ``limit`` (None for no
+    limit), and under a ``jobserver`` one job plus one per token held.
+    """
+
+    def __init__(self, limit=None, jobserver=None):
+        self.limit = limit
+        self.jobserver = jobserver
+        self.used = 0
+        self._tokens = []
+
+    def acquire(self):
+        if self.limit is not None and self.used >= self.limit:
+            return False
+        if self.used and self.jobserver is not None:
+            token = self.jobserver.try_acquire()
+            if token is None:
+                return False
+            self._tokens.append(token)
+        self.used += 1
+        return True
+
+    def release(self):
+        self.used -= 1
+        if self._tokens:
+            self.jobserver.release(self._tokens.pop())
+
+    def wait(self, timeout):
+        """Sleep until a job may have finished or a token may be free."""
+        if self.jobserver is not None and (self.limit is None or self.used < self.limit):
+            self.jobserver.wait(timeout)
+        else:
+            time.sleep(timeout)
+
+
+def default_slots(jobs=None):
+    """``-j jobs`` if given, else the make jobserver, else one job per core."""
+    if jobs:
+        return JobSlots(jobs)
+    jobserver = JobServer.from_environ()
+    if jobserver is not None:
+        return JobSlots(None, jobserver)
+    if '--jobserver-' in os.environ.get('MAKEFLAGS', ''):
+        # run by make -j without being handed the jobserver: stay serial
+        return JobSlots(1)
+    return JobSlots(os.cpu_count() or 1)
+
+
+def run_jobs(jobs, slots, poll_interval=0.01):
+    """
+    Run ``jobs``, each a ``(commands, log_path)`` pair whose commands run
+    one after another with their output in ``log_path``, as many at once
+    as ``slots`` allows. Return the exit status of each job: that of its
+    first failing command, or 0.
+    """
+    status = [0] * len(jobs)
+    pending = deque(range(len(jobs)))
+    # job -> (process, index of its command, log file)
+    running = {}
+
+    def start(job, step, log):
+        return subprocess.Popen(jobs[job][0][step], stdout=log, stderr=subprocess.STDOUT), step, log
+
+    try:
+        while pending or running:
+            while pending and slots.acquire():
+                job = pending.popleft()
+                running[job] = start(job, 0, open(jobs[job][1], 'ab'))
+
+            finished = False
+            for job, (process, step, log) in list(running.items()):
+                code = process.poll()
+                if code is None:
+                    continue
+                finished = True
+                if code == 0 and step + 1 < len(jobs[job][0]):
+                    # the next command of a job reuses its slot
+                    running[job] = start(job, step + 1, log)
+                    continue
+                status[job] = code
+                log.close()
+                del running[job]
+                slots.release()
+            if not finished:
+                slots.wait(poll_interval)
+    finally:
+        for process, _, log in running.values():
+            process.kill()
+            process.wait()
+            log.close()
+            slots.release()
+    return status
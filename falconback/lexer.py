@@ -4,8 +4,10 @@ Lexer
 
 Regular expression based lexer.
 """
+import bisect
 import re
-from collections import namedtuple, OrderedDict
+from array import array
+from collections import deque, namedtuple, OrderedDict
 from falconback.errors import AbrvalgSyntaxError as LexerError
 from falconback.ttt import iteritems
 
@@ -16,24 +18,26 @@ class Token(namedtuple('Token', ['name', 'value', 'line', 'column'])):
         return str(tuple(self))
 
 
-def decode_str(s):
-    regex = re.compile(r'\\(r|n|t|\\|\'|")')
-    chars = {
-        'r': '\r',
-        'n': '\n',
-        't': '\t',
-        '\\': '\\',
-        '"': '"',
-        "'": "'",
-    }
+_escape_regex = re.compile(r'\\(r|n|t|\\|\'|")')
+_escape_chars = {
+    'r': '\r',
+    'n': '\n',
+    't': '\t',
+    '\\': '\\',
+    '"': '"',
+    "'": "'",
+}
+
 
-    def replace(matches):
-        char = matches.group(1)[0]
-        if char not in chars:
-            raise Exception('Unknown escape character {}'.format(char))
-        return chars[char]
+def _replace_escape(matches):
+    char = matches.group(1)[0]
+    if char not in _escape_chars:
+        raise Exception('Unknown escape character {}'.format(char))
+    return _escape_chars[char]
 
-    return regex.sub(replace, s[1:-1])
+
+def decode_str(s):
+    return _escape_regex.sub(_replace_escape, s[1:-1])
 
 
 def decode_num(s):
@@ -102,41 +106,43 @@ class Lexer(object):
         'NUMBER': decode_num,
     }
 
+    # Line breaks as recognised by str.splitlines()
+    line_break = r'\r\n|[\n\r\v\f\x1c\x1d\x1e\x85\u2028\u2029]'
+
+    # Characters read from a stream per chunk, rounded up to a whole line
+    chunk_size = 1 << 20
+
     def __init__(self, filename):
         self.source_lines = []
-        self._regex = self._compile_rules(self.rules)
+        self.indent_symbol = None
+        self.indent_line = 0
+        self._regex = self._compile_rules()
         self.filename = filename
-        
-    def _convert_rules(self, rules):
+
+    @classmethod
+    def _convert_rules(cls, rules):
         grouped_rules = OrderedDict()
         for name, pattern in rules:
             grouped_rules.setdefault(name, [])
             grouped_rules[name].append(pattern)
 
         for name, patterns in iteritems(grouped_rules):
-            joined_patterns = '|'.join(['({})'.format(p) for p in patterns])
+            joined_patterns = '|'.join(['(?:{})'.format(p) for p in patterns])
             yield '(?P<{}>{})'.format(name, joined_patterns)
 
-    def _compile_rules(self, rules):
-        return re.compile('|'.join(self._convert_rules(rules)))
-
-    def _tokenize_line(self, line, line_num):
-        pos = 0
-        while pos < len(line):
-            matches = self._regex.match(line, pos)
-            if matches is not None:
-                name = matches.lastgroup
-                pos = matches.end(name)
-                if name not in self.ignore_tokens:
-                    value = matches.group(name)
-                    if name in self.decoders:
-                        value = self.decoders[name](value)
-                    elif name == 'NAME' and value in self.keywords:
-                        name = self.keywords[value]
-                        value = None
-                    yield Token(name, value, line_num, matches.start() + 1)
-            else:
-                raise LexerError('Unexpected character {}'.format(line[pos]), line_num, pos + 2)
+    @classmethod
+    def _compile_rules(cls):
+        # Compiled once per class and shared by every instance. The regex
+        # scans a whole source at once: whitespace is skipped in front of
+        # every lexeme, line breaks are matched ahead of every rule and
+        # anything no rule accepts ends up in _MISMATCH.
+        compiled = cls.__dict__.get('_compiled_rules')
+        if compiled is None:
+            whitespace = '|'.join(p for name, p in cls.rules if name == 'WHITESPACE')
+            compiled = re.compile('(?:{})?(?:(?P<_EOL>{})|{}|(?P<_MISMATCH>.))'.format(
+                whitespace, cls.line_break, '|'.join(cls._convert_rules(cls.rules))))
+            cls._compiled_rules = compiled
+        return compiled
 
     def _count_leading_characters(self, line, char):
         count = 0
@@ -146,50 +152,315 @@ class Lexer(object):
             count += 1
         return count
 
-    def _detect_indent(self, line):
-        if line[0] in (' ', '\t'):
-            return line[0] * self._count_leading_characters(line, line[0])
+    def _scan(self, chunks):
+        """
+        Tokenize ``(cookie, text)`` chunks with one finditer pass per chunk.
+
+        Every chunk holds whole lines; lines are never split out of it. The
+        scanner keeps the offset of the current line, where its indentation
+        ends and where the line ends, and derives INDENT/DEDENT, NEWLINE and
+        the token columns from those offsets. Columns are relative to the
+        de-indented line, exactly as if the line had been stripped and
+        tokenized on its own.
+
+        Source lines are collected when ``source_lines`` is a list. Otherwise
+        only the stream position (``cookie``) of every chunk is recorded so
+        that lines can be read back when an error is reported.
+        """
+        regex = self._regex
+        find_line_break = re.compile(self.line_break).search
+        new_token = tuple.__new__
+        skip_tokens = frozenset(self.ignore_tokens) | {'_MISMATCH'}
+        decoders = self.decoders
+        keywords = self.keywords
+        source_lines = self.source_lines
+        keep_lines = isinstance(source_lines, list)
 
-    def tokenize(self, s):
         indent_symbol = None
-        tokens = []
+        indent_width = 0
         last_indent_level = 0
-        line_num = 0
-        for line_num, line in enumerate(s.splitlines(), 1):
-            line = line.rstrip()
-
-            if not line:
-                self.source_lines.append('')
-                continue
+        indent_level = 0
+        line_num = 1
+
+        for cookie, s in chunks:
+            if not keep_lines:
+                source_lines.add_chunk(line_num, cookie)
+
+            size = len(s)
+            line_start = 0
+            content_start = -1
+            has_tokens = False
+
+            # A lexeme may only run past the end of its line if a rule
+            # matches line breaks (a string with a stray quote, for instance).
+            # The rest of such a line is rescanned with the buffer truncated
+            # at the line end and the full scan resumes at the line break.
+            pos = 0
+            endpos = size
+            resume = size
+
+            match = find_line_break(s)
+            line_end = match.start() if match else size
+
+            while True:
+                for matches in regex.finditer(s, pos, endpos):
+                    name = matches.lastgroup
+
+                    if name == '_EOL':
+                        if content_start >= 0:
+                            stripped_end = line_end
+                            if s[line_end - 1].isspace():
+                                stripped_end = line_start + len(s[line_start:line_end].rstrip())
+                            if keep_lines:
+                                source_lines.append(s[content_start:stripped_end])
+                            if has_tokens:
+                                yield new_token(Token, ('NEWLINE', None, line_num, stripped_end - content_start + 1))
+                        elif keep_lines:
+                            source_lines.append('')
+                        line_num += 1
+                        line_start = matches.end()
+                        content_start = -1
+                        has_tokens = False
+                        match = find_line_break(s, line_start)
+                        line_end = match.start() if match else size
+                        continue
+
+                    start, end = matches.span(name)
+                    if end > line_end:
+                        pos = start
+                        endpos = resume = line_end
+                        break
+
+                    if content_start < 0:
+                        if name == '_MISMATCH' and s[start:line_end].isspace():
+                            continue
+                        if indent_symbol is None and start > line_start:
+                            indent_symbol = s[line_start] * self._count_leading_characters(s[line_start:start], s[line_start])
+                            indent_width = len(indent_symbol)
+                            self.indent_symbol = indent_symbol
+                            self.indent_line = line_num
+                        if indent_symbol is None:
+                            indent_level = 0
+                            content_start = line_start
+                        else:
+                            indent_level = s.count(indent_symbol, line_start, start)
+                            if s.find(indent_symbol, start, line_end) >= 0:
+                                # The indentation is counted over the whole
+                                # stripped line, not only its leading whitespace.
+                                stripped_end = line_start + len(s[line_start:line_end].rstrip())
+                                indent_level = s.count(indent_symbol, line_start, stripped_end)
+                            content_start = line_start + indent_level * indent_width
+                            if content_start > start:
+                                # The stripped indentation cuts into this
+                                # line's text, so tokenize whatever is left.
+                                pos = content_start
+                                endpos = max(content_start, stripped_end)
+                                resume = line_end
+                                break
+
+                    if name in skip_tokens:
+                        if name == '_MISMATCH' and not s[start:line_end].isspace():
+                            if keep_lines:
+                                # the offending line is needed to report the error
+                                source_lines.append(s[content_start:line_start + len(s[line_start:line_end].rstrip())])
+                            raise LexerError('Unexpected character {}'.format(s[start]), line_num, start - content_start + 2)
+                        continue
 
-            if indent_symbol is None:
-                indent_symbol = self._detect_indent(line)
-
-            if indent_symbol is not None:
-                indent_level = line.count(indent_symbol)
-                line = line[indent_level*len(indent_symbol):]
-            else:
-                indent_level = 0
-
-            self.source_lines.append(line)
-
-            line_tokens = list(self._tokenize_line(line, line_num))
-            if line_tokens:
-                if indent_level != last_indent_level:
-                    if indent_level > last_indent_level:
-                        tokens.extend([Token('INDENT', None, line_num, 0)] * (indent_level - last_indent_level))
-                    elif indent_level < last_indent_level:
-                        tokens.extend([Token('DEDENT', None, line_num, 0)] * (last_indent_level - indent_level))
-                    last_indent_level = indent_level
+                    value = matches.group(name)
+                    if name in decoders:
+                        value = decoders[name](value)
+                    elif name == 'NAME' and value in keywords:
+                        name = keywords[value]
+                        value = None
 
-                tokens.extend(line_tokens)
-                tokens.append(Token('NEWLINE', None, line_num, len(line) + 1))
+                    if not has_tokens:
+                        has_tokens = True
+                        if indent_level != last_indent_level:
+                            if indent_level > last_indent_level:
+                                token = new_token(Token, ('INDENT', None, line_num, 0))
+                                for _ in range(indent_level - last_indent_level):
+                                    yield token
+                            else:
+                                token = new_token(Token, ('DEDENT', None, line_num, 0))
+                                for _ in range(last_indent_level - indent_level):
+                                    yield token
+                            last_indent_level = indent_level
+
+                    yield new_token(Token, (name, value, line_num, start - content_start + 1))
+                else:
+                    if endpos == size:
+                        break
+                    pos = resume
+                    endpos = resume = size
+
+            if line_start < size:
+                # the last line has no line break of its own
+                if content_start >= 0:
+                    stripped_end = line_start + len(s[line_start:size].rstrip())
+                    if keep_lines:
+                        source_lines.append(s[content_start:stripped_end])
+                    if has_tokens:
+                        yield new_token(Token, ('NEWLINE', None, line_num, stripped_end - content_start + 1))
+                elif keep_lines:
+                    source_lines.append('')
+                line_num += 1
 
         if last_indent_level > 0:
-            tokens.extend([Token('DEDENT', None, line_num, 0)] * last_indent_level)
+            token = new_token(Token, ('DEDENT', None, line_num - 1, 0))
+            for _ in range(last_indent_level):
+                yield token
+
+    def _read_chunks(self, stream):
+        while True:
+            cookie = stream.tell()
+            chunk = stream.read(self.chunk_size)
+            if not chunk:
+                return
+            yield cookie, chunk + stream.readline()
+
+    @classmethod
+    def token_kinds(cls):
+        """Every token name this lexer can produce, in a stable order."""
+        kinds = OrderedDict()
+        for name, _ in cls.rules:
+            kinds[name] = None
+        for name in cls.keywords.values():
+            kinds[name] = None
+        for name in ('INDENT', 'DEDENT', 'NEWLINE'):
+            kinds[name] = None
+        return tuple(kinds)
+
+    def tokenize(self, s):
+        return list(self._scan([(None, s)]))
 
+    def tokenize_compact(self, s):
+        tokens = TokenBuffer(self.token_kinds())
+        tokens.extend(self._scan([(None, s)]))
         return tokens
 
+    def iter_tokens(self, stream):
+        """
+        Tokenize a readable stream lazily.
+
+        A seekable file is read in chunks of whole lines and its source lines
+        are only read back when an error has to be reported, so tokenizing
+        runs in roughly constant memory. Other streams are read at once.
+        """
+        seekable = getattr(stream, 'seekable', None)
+        if seekable is not None and seekable() and isinstance(getattr(stream, 'name', None), str):
+            self.source_lines = SourceLines(self, stream.name, getattr(stream, 'encoding', None))
+            return self._scan(self._read_chunks(stream))
+        return self._scan([(None, stream.read())])
+
+
+class SourceLines(object):
+    """
+    Source lines of a streamed file, read back on demand.
+
+    Only the stream position and first line number of every chunk are kept.
+    A line is re-read from its chunk and stripped the way the lexer strips
+    the lines it keeps in memory.
+    """
+
+    def __init__(self, lexer, path, encoding=None):
+        self._lexer = lexer
+        self._path = path
+        self._encoding = encoding
+        self._first_lines = []
+        self._cookies = []
+
+    def add_chunk(self, first_line, cookie):
+        self._first_lines.append(first_line)
+        self._cookies.append(cookie)
+
+    def _read_line(self, line_num):
+        index = bisect.bisect_right(self._first_lines, line_num) - 1
+        if index < 0:
+            return ''
+        with open(self._path, encoding=self._encoding) as stream:
+            stream.seek(self._cookies[index])
+            chunk = stream.read(self._lexer.chunk_size) + stream.readline()
+        lines = chunk.splitlines()
+        offset = line_num - self._first_lines[index]
+        return lines[offset] if offset < len(lines) else ''
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        line = self._read_line(index + 1).rstrip()
+        indent_symbol = self._lexer.indent_symbol
+        if line and indent_symbol is not None and index + 1 >= self._lexer.indent_line:
+            line = line[line.count(indent_symbol) * len(indent_symbol):]
+        return line
+
+    def __len__(self):
+        if not self._cookies:
+            return 0
+        with open(self._path, encoding=self._encoding) as stream:
+            stream.seek(self._cookies[-1])
+            return self._first_lines[-1] - 1 + len(stream.read().splitlines())
+
+
+class TokenBuffer(object):
+    """
+    Struct-of-arrays token store.
+
+    Token names are kept as small integer codes, lines and columns as
+    unsigned ints and values as indexes into a table of interned values, so
+    no object is allocated per token. ``Token`` tuples are only built when a
+    token is indexed.
+    """
+
+    def __init__(self, kinds):
+        self.kinds = tuple(kinds)
+        self._kind_codes = dict((name, code) for code, name in enumerate(self.kinds))
+        self.codes = array('B')
+        self.lines = array('I')
+        self.columns = array('I')
+        self.values = array('I')
+        self.value_table = [None]
+        self._value_codes = {}
+
+    def _value_code(self, value):
+        if value is None:
+            return 0
+        # 1 and 1.0 are equal but must stay apart
+        key = (type(value), value)
+        code = self._value_codes.get(key)
+        if code is None:
+            code = self._value_codes[key] = len(self.value_table)
+            self.value_table.append(value)
+        return code
+
+    def append(self, name, value, line, column):
+        self.codes.append(self._kind_codes[name])
+        self.lines.append(line)
+        self.columns.append(column)
+        self.values.append(self._value_code(value))
+
+    def extend(self, tokens):
+        kind_codes = self._kind_codes
+        value_code = self._value_code
+        codes, lines, columns, values = self.codes, self.lines, self.columns, self.values
+        for name, value, line, column in tokens:
+            codes.append(kind_codes[name])
+            lines.append(line)
+            columns.append(column)
+            values.append(0 if value is None else value_code(value))
+
+    def name(self, index):
+        return self.kinds[self.codes[index]]
+
+    def value(self, index):
+        return self.value_table[self.values[index]]
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, index):
+        return Token(self.kinds[self.codes[index]], self.value_table[self.values[index]],
+                     self.lines[index], self.columns[index])
+
 
 class TokenStream(object):
 
@@ -205,11 +476,20 @@ class TokenStream(object):
                 raise LexerError('Expected {}, got {}'.format(expected_name, token.name), token.line, token.column)
         return token
 
+    def skip_expected(self, *args):
+        self.consume_expected(*args)
+
     def consume(self):
         token = self.current()
         self._pos += 1
         return token
 
+    def current_name(self):
+        return self.current().name
+
+    def current_value(self):
+        return self.current().value
+
     def current(self):
         try:
             return self._tokens[self._pos]
@@ -224,3 +504,95 @@ class TokenStream(object):
 
     def is_end(self):
         return self._pos == len(self._tokens)
+
+
+class LazyTokenStream(TokenStream):
+    """
+    TokenStream pulling tokens on demand from an iterator.
+
+    Only a few upcoming tokens are buffered, so parsing can start before the
+    whole source has been tokenized and consumed tokens can be collected.
+    """
+
+    def __init__(self, tokens, lookahead=4):
+        self._tokens = iter(tokens)
+        self._buffer = deque()
+        self._lookahead = lookahead
+        self._last_token = None
+
+    def _fill(self, count):
+        buffer = self._buffer
+        while len(buffer) < count:
+            token = next(self._tokens, None)
+            if token is None:
+                return False
+            buffer.append(token)
+        return True
+
+    def peek(self, offset=0):
+        if offset >= self._lookahead:
+            raise ValueError('Lookahead is limited to {} tokens'.format(self._lookahead))
+        if self._fill(offset + 1):
+            return self._buffer[offset]
+
+    def consume(self):
+        token = self.current()
+        self._last_token = self._buffer.popleft()
+        return token
+
+    def current(self):
+        if self._buffer or self._fill(1):
+            return self._buffer[0]
+        last_token = self._last_token
+        if last_token is None:
+            raise LexerError('Unexpected end of input', 0, 0)
+        raise LexerError('Unexpected end of input', last_token.line, last_token.column)
+
+    def is_end(self):
+        return not self._buffer and not self._fill(1)
+
+
+class CompactTokenStream(TokenStream):
+    """
+    TokenStream over a TokenBuffer.
+
+    Names and values are read straight from the buffer's arrays. A ``Token``
+    is only built when ``current``, ``consume`` or ``consume_expected``
+    hands one out.
+    """
+
+    def __init__(self, tokens):
+        super(CompactTokenStream, self).__init__(tokens)
+        self._kinds = tokens.kinds
+        self._codes = tokens.codes
+
+    def _end_of_input(self):
+        tokens = self._tokens
+        if not len(tokens):
+            raise LexerError('Unexpected end of input', 0, 0)
+        raise LexerError('Unexpected end of input', tokens.lines[-1], tokens.columns[-1])
+
+    def skip_expected(self, *args):
+        tokens = self._tokens
+        kinds = self._kinds
+        codes = self._codes
+        for expected_name in args:
+            pos = self._pos
+            if pos >= len(codes):
+                self._end_of_input()
+            self._pos = pos + 1
+            name = kinds[codes[pos]]
+            if name != expected_name:
+                raise LexerError('Expected {}, got {}'.format(expected_name, name), tokens.lines[pos], tokens.columns[pos])
+
+    def current_name(self):
+        try:
+            return self._kinds[self._codes[self._pos]]
+        except IndexError:
+            self._end_of_input()
+
+    def current_value(self):
+        try:
+            return self._tokens.value(self._pos)
+        except IndexError:
+            self._end_of_input()
@@ -1,33 +1,53 @@
-
-
-def add(l, r):
-    return  str(l) + " + " + str(r) 
-
-def sub(l, r):
-    return  str(l) + " - " + str(r) 
-
-def mul(l, r):
-    return  str(l) + " * " + str(r) 
-
-def div(l, r):
-    return  str(l) + " / " + str(r) 
-
-def mod(l, r):
-    return  str(l) + " % " + str(r) 
-
-def gt(l, r):
-    return  str(l) + " > " + str(r) 
-
-def lt(l, r):
-    return  str(l) + " < " + str(r) 
-def ge(l, r):
-    return  str(l) + " >= " + str(r) 
-
-def le(l, r):
-    return  str(l) + " <= " + str(r) 
-
-def eq(l, r):
-    return  str(l) + " == " + str(r) 
-
-def ne(l, r):
-    return  str(l) + " != " + str(r)
\ No newline at end of file
+# C++ spelling of the operators, used by the expression emitter
+binary_operators = {
+    '+': ' + ',
+    '-': ' - ',
+    '*': ' * ',
+    '/': ' / ',
+    '%': ' % ',
+    '>': ' > ',
+    '>=': ' >= ',
+    '<': ' < ',
+    '<=': ' <= ',
+    '==': ' == ',
+    '!=': ' != ',
+    '&&': ' && ',
+    '||': ' || ',
+}
+
+unary_operators = {
+    '-': '-',
+    '!': '!',
+}
+
+
+def truncate_div(l, r):
+    # C++ integer division rounds towards zero
+    q = abs(l) // abs(r)
+    return q if (l < 0) == (r < 0) else -q
+
+
+def truncate_mod(l, r):
+    return l - r * truncate_div(l, r)
+
+
+# What the operators compute on constants, as C++ evaluates them; used
+# by constant folding. Integer division and remainder are only looked up
+# for two integers.
+constant_operators = {
+    '+': lambda l, r: l + r,
+    '-': lambda l, r: l - r,
+    '*': lambda l, r: l * r,
+    '/': lambda l, r: l / r,
+    '%': truncate_mod,
+    '>': lambda l, r: l > r,
+    '>=': lambda l, r: l >= r,
+    '<': lambda l, r: l < r,
+    '<=': lambda l, r: l <= r,
+    '==': lambda l, r: l == r,
+    '!=': lambda l, r: l != r,
+    '&&': lambda l, r: bool(l) and bool(r),
+    '||': lambda l, r: bool(l) or bool(r),
+}
+
+integer_operators = dict(constant_operators, **{'/': truncate_div})
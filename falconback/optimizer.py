@@ -0,0 +1,375 @@
+"""
+Optimizer
+---------
+
+Rewrites of the syntax tree between parsing and name resolution, so that
+code generation and g++ have less to do. Level 1 folds constant
+expressions, prunes branches whose test is constant and drops statements
+after a ``return``, ``break`` or ``continue``. Level 2 also drops the
+functions and classes that nothing reachable from ``main`` names.
+"""
+import math
+import re
+from falconback import ast
+from falconback.lexer import Token
+from falconback.ops import constant_operators, integer_operators
+
+DEFAULT_LEVEL = 1
+
+ARITHMETIC = ('+', '-', '*', '/', '%')
+COMPARISONS = ('>', '>=', '<', '<=', '==', '!=')
+LOGICAL = ('&&', '||')
+NUMERIC = ('int', 'long', 'double')
+
+INT_MAX = 2 ** 31 - 1
+LONG_MAX = 2 ** 63 - 1
+
+_word_regex = re.compile(r'[A-Za-z_]\w*')
+
+
+def integer_kind(value):
+    """
+    The C++ type of the literal ``value``: a negative literal is the
+    negation of a positive one, so only the magnitude counts.
+    """
+    if abs(value) <= INT_MAX:
+        return 'int'
+    if abs(value) <= LONG_MAX:
+        return 'long'
+    return None
+
+
+def constant(node):
+    """The (kind, value) of a literal number, string or boolean, or None."""
+    while type(node) == ast.GroupExpression:
+        node = node.left
+    tp = type(node)
+    if tp == ast.Number:
+        if type(node.value) == int:
+            kind = integer_kind(node.value)
+            return (kind, node.value) if kind is not None else None
+        if type(node.value) == float:
+            return 'double', node.value
+    elif tp == ast.String:
+        return 'string', node.value
+    elif tp == ast.Identifier and node.value.value in ('true', 'false'):
+        return 'bool', node.value.value == 'true'
+    return None
+
+
+def literal(kind, value):
+    if kind == 'bool':
+        return ast.Identifier(Token('NAME', 'true' if value else 'false', 0, 0))
+    if kind == 'string':
+        return ast.String(value)
+    return ast.Number(value)
+
+
+def fold_binary(node):
+    left = constant(node.left)
+    right = constant(node.right)
+    if left is None or right is None:
+        return node
+    (lkind, l), (rkind, r) = left, right
+    op = node.operator
+    if lkind in NUMERIC and rkind in NUMERIC:
+        if op in ARITHMETIC:
+            if op in ('/', '%') and r == 0:
+                return node
+            if 'double' in (lkind, rkind):
+                if op == '%':
+                    return node
+                value = constant_operators[op](float(l), float(r))
+                return ast.Number(value) if math.isfinite(value) else node
+            # the result has to keep the type of the operation, or overflow
+            # and later arithmetic would change
+            value = integer_operators[op](l, r)
+            promoted = 'long' if 'long' in (lkind, rkind) else 'int'
+            return ast.Number(value) if integer_kind(value) == promoted else node
+        if op in COMPARISONS:
+            if 'double' in (lkind, rkind) and 'long' in (lkind, rkind):
+                # not every long is a double
+                return node
+            return literal('bool', constant_operators[op](l, r))
+    if op in LOGICAL and lkind in NUMERIC + ('bool',) and rkind in NUMERIC + ('bool',):
+        return literal('bool', constant_operators[op](l, r))
+    if lkind == rkind and lkind in ('string', 'bool') and op in ('==', '!='):
+        return literal('bool', constant_operators[op](l, r))
+    if lkind == rkind == 'string' and op == '+':
+        return ast.String(l + r)
+    return node
+
+
+def fold_unary(node):
+    right = constant(node.right)
+    if right is None:
+        return node
+    kind, value = right
+    if node.operator == '-' and kind in NUMERIC:
+        return ast.Number(-value)
+    if node.operator == '!' and kind in NUMERIC + ('bool',):
+        return literal('bool', not value)
+    return node
+
+
+def fold_group(node):
+    if type(node.left) == ast.GroupExpression:
+        # the inner group is folded and kept, around a negative literal or
+        # something not constant: its parentheses are enough. Not looking
+        # further down keeps deep nesting linear.
+        inner = node.left.left
+        if type(inner) != ast.GroupExpression and constant(inner) is not None:
+            return node.left
+        return node
+    value = constant(node.left)
+    # (-1) keeps its parentheses in front of a member or subscript
+    if value is None or (value[0] in NUMERIC and value[1] < 0):
+        return node
+    return node.left
+
+
+def call_children(node):
+    return node.arguments
+
+
+def call_rebuild(node, children):
+    return node._replace(arguments=children)
+
+
+def access_children(node):
+    # the right side names a member, only call arguments are expressions
+    return [node.left] + (list(node.right.arguments) if type(node.right) == ast.Call else [])
+
+
+def access_rebuild(node, children):
+    right = node.right
+    if type(right) == ast.Call:
+        right = right._replace(arguments=children[1:])
+    return node._replace(left=children[0], right=right)
+
+
+# type -> (operands, rebuild from folded operands, fold)
+expression_folders = {
+    ast.BinaryOperator: (lambda node: [node.left, node.right],
+                         lambda node, children: node._replace(left=children[0], right=children[1]), fold_binary),
+    ast.UnaryOperator: (lambda node: [node.right],
+                        lambda node, children: node._replace(right=children[0]), fold_unary),
+    ast.GroupExpression: (lambda node: [node.left],
+                          lambda node, children: node._replace(left=children[0]), fold_group),
+    ast.SubscriptOperator: (lambda node: [node.left, node.key],
+                            lambda node, children: node._replace(left=children[0], key=children[1]), None),
+    ast.Call: (call_children, call_rebuild, None),
+    ast.ClassAccess: (access_children, access_rebuild, None),
+    ast.Array: (lambda node: node.items, lambda node, children: node._replace(items=children), None),
+    ast.Dictionary: (lambda node: [item for pair in node.items for item in pair],
+                     lambda node, children: node._replace(items=list(zip(children[::2], children[1::2]))), None),
+}
+
+
+def fold(node):
+    """
+    Fold the constant operations in the expression ``node``. Operands are
+    folded before the operation on them, from a work list, so long
+    operator chains do not recurse. Nodes nothing changed are kept.
+    """
+    # (node, operands already folded)
+    work = [(node, False)]
+    values = []
+    while work:
+        node, ready = work.pop()
+        folder = expression_folders.get(type(node))
+        if folder is None:
+            values.append(node)
+            continue
+        operands, rebuild, fold_node = folder
+        children = list(operands(node))
+        if not ready:
+            work.append((node, True))
+            work.extend((child, False) for child in reversed(children))
+            continue
+        folded = values[len(values) - len(children):]
+        del values[len(values) - len(children):]
+        if any(new is not old for new, old in zip(folded, children)):
+            node = rebuild(node, folded)
+        values.append(fold_node(node) if fold_node is not None else node)
+    return values[0]
+
+
+def test_value(node):
+    """Whether the constant test ``node`` holds, or None if it is not constant."""
+    value = constant(node)
+    if value is None or value[0] not in NUMERIC + ('bool',):
+        return None
+    return bool(value[1])
+
+
+def declares(statements):
+    return any(type(statement) in (ast.TypedName, ast.InferedName) for statement in statements)
+
+
+def breaks_out(statements):
+    """Whether a ``break`` in ``statements`` belongs to the statement around them."""
+    work = list(statements)
+    while work:
+        node = work.pop()
+        tp = type(node)
+        if tp == ast.Break:
+            return True
+        if tp == ast.Condition:
+            work.extend(node.if_body)
+            for cond in node.elifs:
+                work.extend(cond.body)
+            work.extend(node.else_body or [])
+    return False
+
+
+def names_in(node, names):
+    """Add every name mentioned in ``node``, in code, types and inline C++, to ``names``."""
+    work = [node]
+    while work:
+        node = work.pop()
+        if isinstance(node, Token):
+            if isinstance(node.value, str):
+                names.update(_word_regex.findall(node.value))
+        elif type(node) == ast.Cpp:
+            for statement in node.statements:
+                names.update(_word_regex.findall(statement.value))
+        elif isinstance(node, (tuple, list)):
+            work.extend(node)
+
+
+class Optimizer(object):
+    """
+    Optimizes a program at ``level``, see the module. ``removed`` lists
+    the functions and classes level 2 dropped.
+    """
+
+    def __init__(self, level=DEFAULT_LEVEL):
+        self.level = level
+        self.removed = []
+
+    def optimize(self, program):
+        if self.level < 1:
+            return program
+        body = self.statements(program.body)
+        if self.level >= 2:
+            body = self.reachable(body)
+        return program._replace(body=body)
+
+    def statements(self, statements):
+        result = []
+        for statement in statements:
+            result.extend(self.statement(statement))
+            if result and type(result[-1]) in (ast.Return, ast.Break, ast.Continue):
+                # nothing after it runs
+                break
+        return result
+
+    def block(self, statements):
+        """
+        The statements of a branch that always runs, in place of the
+        branch. Its declarations would leak into the enclosing C++ block,
+        so a branch with any stays a block of its own.
+        """
+        if declares(statements):
+            return [ast.Condition(literal('bool', True), statements, [], None)]
+        return statements
+
+    def statement(self, node):
+        """The statements that replace ``node``."""
+        tp = type(node)
+        if tp in (ast.TypedName, ast.InferedName):
+            return [node._replace(value=fold(node.value)) if node.value is not None else node]
+        if tp == ast.Assignment:
+            return [node._replace(left=fold(node.left), right=fold(node.right))]
+        if tp == ast.Return:
+            return [node._replace(value=fold(node.value)) if node.value is not None else node]
+        if tp == ast.Condition:
+            return self.condition(node)
+        if tp == ast.Match:
+            return self.match(node)
+        if tp == ast.WhileLoop:
+            test = fold(node.test)
+            if test_value(test) is False:
+                return []
+            return [node._replace(test=test, body=self.statements(node.body))]
+        if tp == ast.ForLoop:
+            return [node._replace(collection=fold(node.collection), body=self.statements(node.body))]
+        if tp == ast.Function:
+            return [node._replace(body=self.statements(node.body))]
+        if tp == ast.ClassDefinition:
+            return [node._replace(body=self.statements(node.body))]
+        if tp in (ast.Enum, ast.UsingNode, ast.Cpp, ast.Break, ast.Continue):
+            return [node]
+        return [fold(node)]
+
+    def condition(self, node):
+        branches = [(node.test, node.if_body)] + [(cond.test, cond.body) for cond in node.elifs]
+        kept = []
+        else_body = node.else_body
+        for test, body in branches:
+            test = fold(test)
+            value = test_value(test)
+            if value is False:
+                continue
+            if value is True:
+                # this branch runs whenever the ones before it do not
+                else_body = body
+                break
+            kept.append((test, self.statements(body)))
+        if else_body is not None:
+            else_body = self.statements(else_body)
+        if not kept:
+            return self.block(else_body) if else_body is not None else []
+        (test, body), rest = kept[0], kept[1:]
+        return [ast.Condition(test, body, [ast.ConditionElif(t, b) for t, b in rest], else_body)]
+
+    def match(self, node):
+        test = fold(node.test)
+        patterns = [pattern._replace(pattern=fold(pattern.pattern), body=self.statements(pattern.body))
+                    for pattern in node.patterns]
+        else_body = self.statements(node.else_body) if node.else_body is not None else None
+        value = constant(test)
+        values = [constant(pattern.pattern) for pattern in patterns]
+        if value is not None and value[0] in ('int', 'long') and all(v is not None and v[0] in ('int', 'long') for v in values):
+            chosen = else_body
+            for pattern, v in zip(patterns, values):
+                if v[1] == value[1]:
+                    chosen = pattern.body
+                    break
+            if chosen is None:
+                return []
+            # a break in a case leaves the switch, not an enclosing loop
+            if not breaks_out(chosen):
+                return self.block(chosen)
+        return [node._replace(test=test, patterns=patterns, else_body=else_body)]
+
+    def reachable(self, body):
+        """
+        ``body`` without the top level functions and classes whose names
+        are not mentioned by ``main``, the other top level statements or
+        anything they reach. Names count wherever they appear, so a
+        shadowing local or a method of the same name keeps a function.
+        """
+        candidates = [statement for statement in body if type(statement) in (ast.Function, ast.ClassDefinition)]
+        mains = [statement for statement in candidates if type(statement) == ast.Function and statement.name.value == 'main']
+        if not mains:
+            # a library or a REPL line, anything may be used
+            return body
+        kept = set(id(statement) for statement in mains)
+        declarations = set(id(statement) for statement in candidates)
+        pending = mains + [statement for statement in body if id(statement) not in declarations]
+        names = set()
+        while pending:
+            names_in(pending.pop(), names)
+            for statement in candidates:
+                if id(statement) not in kept and statement.name.value in names:
+                    kept.add(id(statement))
+                    pending.append(statement)
+        result = []
+        for statement in body:
+            if type(statement) in (ast.Function, ast.ClassDefinition) and id(statement) not in kept:
+                self.removed.append(statement.name.value)
+            else:
+                result.append(statement)
+        return result
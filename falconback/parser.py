@@ -8,6 +8,7 @@ Top-down recursive descent parser.
 from ast import Sub
 from falconback import ast
 from falconback.errors import AbrvalgSyntaxError
+from falconback.lexer import Token
 
 
 class ParserError(AbrvalgSyntaxError):
@@ -58,24 +59,30 @@ class Subparser(object):
         '...': 1,
     }
 
-    def get_subparser(self, token, subparsers, default=None):
-        cls = subparsers.get(token.name, default)
-        if cls is not None:
-            return cls()
+    def get_subparser(self, name, subparsers, default=None):
+        return subparsers.get(name, default)
 
 
 class PrefixSubparser(Subparser):
 
+    # Nested subparsers are generators: they ``yield`` the precedence of each
+    # sub-expression they need, are sent the parsed expression back, and
+    # ``return`` their node. Expression.parse drives them from an explicit
+    # stack, so nesting depth does not grow the Python stack.
+    NESTED = False
+
     def parse(self, parser, tokens):
         raise NotImplementedError()
 
 
 class InfixSubparser(Subparser):
 
+    NESTED = True
+
     def parse(self, parser, tokens, left):
         raise NotImplementedError()
 
-    def get_precedence(self, token):
+    def get_precedence(self, operator):
         raise NotImplementedError()
 
 
@@ -106,66 +113,73 @@ class NameExpression(PrefixSubparser):
 # prefix_expr: OPERATOR expr
 class UnaryOperatorExpression(PrefixSubparser):
 
+    NESTED = True
     SUPPORTED_OPERATORS = ['-', '!']
 
     def parse(self, parser, tokens):
         token = tokens.consume_expected('OPERATOR')
         if token.value not in self.SUPPORTED_OPERATORS:
             raise ParserError('Unary operator {} is not supported'.format(token.value), token)
-        right = Expression().parse(parser, tokens, self.get_precedence(token))
+        right = yield self.get_precedence(token.value)
         if right is None:
             raise ParserError('Expected expression'.format(token.value), tokens.consume())
         return ast.UnaryOperator(token.value, right)
 
-    def get_precedence(self, token):
+    def get_precedence(self, operator):
         return self.PRECEDENCE['unary']
 
 
 # group_expr: LPAREN expr RPAREN
 class GroupExpression(PrefixSubparser):
 
+    NESTED = True
+
     def parse(self, parser, tokens):
-        tokens.consume_expected('LPAREN')
-        right = Expression().parse(parser, tokens)
-        tokens.consume_expected('RPAREN')
+        tokens.skip_expected('LPAREN')
+        right = yield 0
+        tokens.skip_expected('RPAREN')
         return ast.GroupExpression(right)
 
 
 # array_expr: LBRACK list_of_expr? RBRACK
 class ArrayExpression(PrefixSubparser):
 
+    NESTED = True
+
     def parse(self, parser, tokens):
-        tokens.consume_expected('LBRACK')
-        items = ListOfExpressions().parse(parser, tokens)
-        tokens.consume_expected('RBRACK')
+        tokens.skip_expected('LBRACK')
+        items = yield from LIST_OF_EXPRESSIONS.parse(parser, tokens)
+        tokens.skip_expected('RBRACK')
         return ast.Array(items)
 
 
 # dict_expr: LCBRACK (expr COLON expr COMMA)* RCBRACK
 class DictionaryExpression(PrefixSubparser):
 
+    NESTED = True
+
     def _parse_keyvals(self, parser, tokens):
         items = []
         while not tokens.is_end():
-            key = Expression().parse(parser, tokens)
+            key = yield 0
             if key is not None:
-                tokens.consume_expected('COLON')
-                value = Expression().parse(parser, tokens)
+                tokens.skip_expected('COLON')
+                value = yield 0
                 if value is None:
                     raise ParserError('Dictionary value expected', tokens.consume())
                 items.append((key, value))
             else:
                 break
-            if tokens.current().name == 'COMMA':
-                tokens.consume_expected('COMMA')
+            if tokens.current_name() == 'COMMA':
+                tokens.skip_expected('COMMA')
             else:
                 break
         return items
 
     def parse(self, parser, tokens):
-        tokens.consume_expected('LCBRACK')
-        items = self._parse_keyvals(parser, tokens)
-        tokens.consume_expected('RCBRACK')
+        tokens.skip_expected('LCBRACK')
+        items = yield from self._parse_keyvals(parser, tokens)
+        tokens.skip_expected('RCBRACK')
         return ast.Dictionary(items)
 
 
@@ -174,26 +188,25 @@ class BinaryOperatorExpression(InfixSubparser):
 
     def parse(self, parser, tokens, left):
         token = tokens.consume_expected('OPERATOR')
-        right = Expression().parse(parser, tokens, self.get_precedence(token))
+        right = yield self.get_precedence(token.value)
         if right is None:
             raise ParserError('Expected expression'.format(token.value), tokens.consume())
         return ast.BinaryOperator(token.value, left, right)
 
-    def get_precedence(self, token):
-        return self.PRECEDENCE[token.value]
+    def get_precedence(self, operator):
+        return self.PRECEDENCE[operator]
 
 
 class ClassResolution(InfixSubparser):
     def parse(self, parser, tokens, left):
-        tokens.consume_expected('SCOPE')
+        tokens.skip_expected('SCOPE')
 
-        current = tokens.current()
-        ret = Expression().parse(parser, tokens)
+        ret = yield 0
 
         return ast.ClassAccess(left, ret)
 
 
-    def get_precedence(self, token):
+    def get_precedence(self, operator):
         return self.PRECEDENCE['scope']
 
 
@@ -201,16 +214,16 @@ class ClassResolution(InfixSubparser):
 class CallExpression(InfixSubparser):
 
     def parse(self, parser, tokens, left):
-        tokens.consume_expected('LPAREN')
-        arguments = ListOfExpressions().parse(parser, tokens)
-        tokens.consume_expected('RPAREN')
-        current = tokens.current()[0] 
+        tokens.skip_expected('LPAREN')
+        arguments = yield from LIST_OF_EXPRESSIONS.parse(parser, tokens)
+        tokens.skip_expected('RPAREN')
+        current = tokens.current_name() 
         tag = None
         if current != 'NEWLINE':
             tag = 1
         return ast.Call(left, arguments, tag)
 
-    def get_precedence(self, token):
+    def get_precedence(self, operator):
         return self.PRECEDENCE['call']
 
 
@@ -218,14 +231,14 @@ class CallExpression(InfixSubparser):
 class SubscriptOperatorExpression(InfixSubparser):
 
     def parse(self, parser, tokens, left):
-        tokens.consume_expected('LBRACK')
-        key = Expression().parse(parser, tokens)
+        tokens.skip_expected('LBRACK')
+        key = yield 0
         if key is None:
             raise ParserError('Subscript operator key is required', tokens.current())
-        tokens.consume_expected('RBRACK')
+        tokens.skip_expected('RBRACK')
         return ast.SubscriptOperator(left, key)
 
-    def get_precedence(self, token):
+    def get_precedence(self, operator):
         return self.PRECEDENCE['subscript']
 
 
@@ -233,43 +246,54 @@ class SubscriptOperatorExpression(InfixSubparser):
 #     | subscript_expr
 class Expression(Subparser):
 
-    def get_prefix_subparser(self, token):
-        return self.get_subparser(token, {
-            'NUMBER': NumberExpression,
-            'STRING': StringExpression,
-            'NAME': NameExpression,
-            'LPAREN': GroupExpression,
-            'LBRACK': ArrayExpression,
-            'LCBRACK': DictionaryExpression,
-            'OPERATOR': UnaryOperatorExpression,
-        })
-
-    def get_infix_subparser(self, token):
-        return self.get_subparser(token, {
-            'OPERATOR': BinaryOperatorExpression,
-            'LPAREN': CallExpression,
-            'LBRACK': SubscriptOperatorExpression, 
-            'SCOPE' : ClassResolution,
-        })
+    def get_prefix_subparser(self, name):
+        return self.get_subparser(name, PREFIX_SUBPARSERS)
+
+    def get_infix_subparser(self, name):
+        return self.get_subparser(name, INFIX_SUBPARSERS)
 
     def get_next_precedence(self, tokens):
         if not tokens.is_end():
-            token = tokens.current()
-            parser = self.get_infix_subparser(token)
+            parser = INFIX_SUBPARSERS.get(tokens.current_name())
             if parser is not None:
-                return parser.get_precedence(token)
+                return parser.get_precedence(tokens.current_value())
         return 0
 
     def parse(self, parser, tokens, precedence=0):
-        subparser = self.get_prefix_subparser(tokens.current())
-        if subparser is not None:
-            left = subparser.parse(parser, tokens)
-            if left is not None:
-                while precedence < self.get_next_precedence(tokens):
-                    op = self.get_infix_subparser(tokens.current()).parse(parser, tokens, left)
-                    if op is not None:
-                        left = op
-                return left
+        # Precedence climbing with an explicit stack of suspended nested
+        # subparsers, each paired with the precedence of the expression that
+        # started it.
+        stack = []
+        while True:
+            step = None
+            subparser = PREFIX_SUBPARSERS.get(tokens.current_name())
+            if subparser is None:
+                left = None
+            elif subparser.NESTED:
+                step = subparser.parse(parser, tokens)
+                sent = None
+            else:
+                left = subparser.parse(parser, tokens)
+
+            while True:
+                if step is not None:
+                    try:
+                        inner = step.send(sent)
+                    except StopIteration as done:
+                        left = done.value
+                        step = None
+                    else:
+                        stack.append((step, precedence))
+                        precedence = inner
+                        break
+                elif left is not None and precedence < self.get_next_precedence(tokens):
+                    step = INFIX_SUBPARSERS[tokens.current_name()].parse(parser, tokens, left)
+                    sent = None
+                elif stack:
+                    step, precedence = stack.pop()
+                    sent = left
+                else:
+                    return left
 
 
 # list_of_expr: (expr COMMA)*
@@ -278,13 +302,13 @@ class ListOfExpressions(Subparser):
     def parse(self, parser, tokens):
         items = []
         while not tokens.is_end():
-            exp = Expression().parse(parser, tokens)
+            exp = yield 0
             if exp is not None:
                 items.append(exp)
             else:
                 break
-            if tokens.current().name == 'COMMA':
-                tokens.consume_expected('COMMA')
+            if tokens.current_name() == 'COMMA':
+                tokens.skip_expected('COMMA')
             else:
                 break
         return items
@@ -294,30 +318,51 @@ class ListOfExpressions(Subparser):
 class Block(Subparser):
 
     def parse(self, parser, tokens):
-        tokens.consume_expected('NEWLINE', 'INDENT')
-        statements = Statements().parse(parser, tokens)
-        tokens.consume_expected('DEDENT')
+        tokens.skip_expected('NEWLINE', 'INDENT')
+        statements = STATEMENTS.parse(parser, tokens)
+        tokens.skip_expected('DEDENT')
         return statements
 
 
+# type: NAME (LBRACK type (COMMA type)* RBRACK)?
+class TypeName(Subparser):
+
+    def parse(self, parser, tokens):
+        """
+        Generic types take their arguments in brackets. The result is a
+        single NAME token spelling the C++ type, at the position of the
+        type name: ``dict[string, i32]`` becomes ``dict<string, i32>``.
+        """
+        token = tokens.consume_expected('NAME')
+        if tokens.current_name() != 'LBRACK':
+            return token
+        tokens.skip_expected('LBRACK')
+        arguments = [self.parse(parser, tokens).value]
+        while tokens.current_name() == 'COMMA':
+            tokens.skip_expected('COMMA')
+            arguments.append(self.parse(parser, tokens).value)
+        tokens.skip_expected('RBRACK')
+        return Token(token.name, '{}<{}>'.format(token.value, ', '.join(arguments)), token.line, token.column)
+
+
 # func_stmnt: FUNCTION NAME LPAREN func_params? RPAREN COLON block
 class FunctionStatement(Subparser):
 
     # func_params: (NAME COMMA)*
-    def _parse_params(self, tokens):
+    def _parse_params(self, parser, tokens):
         params = []
-        if tokens.current().name == 'NAME':
+        if tokens.current_name() == 'NAME':
             while not tokens.is_end():
                 id_token = tokens.consume_expected('NAME')
-                if tokens.current().name == 'COMMA':
+                if tokens.current_name() == 'COMMA':
                     params.append(id_token)
-                    tokens.consume_expected('COMMA')
-                elif tokens.current().name == 'COLON':
-                    tokens.consume_expected('COLON')
-                    type_name = tokens.consume_expected('NAME')
+                    tokens.skip_expected('COMMA')
+                elif tokens.current_name() == 'COLON':
+                    tokens.skip_expected('COLON')
+                    type_name = TYPE_NAME.parse(parser, tokens)
                     params.append(ast.TypedParam(id_token, type_name))
-                    if tokens.current().name == "COMMA":
-                        tokens.consume_expected('COMMA')
+                    if tokens.current_name() == "COMMA":
+                        tokens.skip_expected('COMMA')
                     else:
                         break
                 else:
@@ -328,111 +373,111 @@ class FunctionStatement(Subparser):
         return params
 
     def parse(self, parser, tokens):
-        tokens.consume_expected('FUNCTION')
+        tokens.skip_expected('FUNCTION')
         id_token = tokens.consume_expected('NAME')
-        tokens.consume_expected('LPAREN')
-        arguments = self._parse_params(tokens)
-        tokens.consume_expected('RPAREN')
+        tokens.skip_expected('LPAREN')
+        arguments = self._parse_params(parser, tokens)
+        tokens.skip_expected('RPAREN')
         data_type = None 
-        if tokens.current()[0] == 'ARROW':
-            tokens.consume_expected('ARROW')
-            data_type = tokens.consume_expected('NAME')
-        tokens.consume_expected('COLON')
+        if tokens.current_name() == 'ARROW':
+            tokens.skip_expected('ARROW')
+            data_type = TYPE_NAME.parse(parser, tokens)
+        tokens.skip_expected('COLON')
         with enter_scope(parser, 'function'):
-            block = Block().parse(parser, tokens)
+            block = BLOCK.parse(parser, tokens)
         if block is None:
             raise ParserError('Expected function body', tokens.current())
         return ast.Function(id_token, arguments, block, data_type)
 
 class CPPStatement(Subparser):
     def parse(self, parser, tokens):
-        tokens.consume_expected('CPP', 'COLON', 'NEWLINE', 'INDENT')
+        tokens.skip_expected('CPP', 'COLON', 'NEWLINE', 'INDENT')
         cpp_statemnts = []
-        while tokens.current().name == 'STRING':
-            cpp_statemnts.append(StringExpression().parse(parser, tokens))
-            tokens.consume_expected('NEWLINE')
+        while tokens.current_name() == 'STRING':
+            # the token keeps the line, for the #line of the block
+            cpp_statemnts.append(tokens.consume_expected('STRING'))
+            tokens.skip_expected('NEWLINE')
 
-        tokens.consume_expected('DEDENT')
+        tokens.skip_expected('DEDENT')
         return ast.Cpp(cpp_statemnts)
 
 class EnumStatement(Subparser):
     def parse(self, parser, tokens):
-        tokens.consume_expected('ENUM')
+        tokens.skip_expected('ENUM')
         name = tokens.consume_expected('NAME')
-        tokens.consume_expected('COLON', 'NEWLINE', 'INDENT')
+        tokens.skip_expected('COLON', 'NEWLINE', 'INDENT')
 
         items = []
-        while tokens.current().name == 'NAME':
+        while tokens.current_name() == 'NAME':
             item = tokens.consume_expected('NAME')
-            tokens.consume_expected('COMMA', 'NEWLINE')
+            tokens.skip_expected('COMMA', 'NEWLINE')
             items.append(item)
-        tokens.consume_expected('DEDENT')
+        tokens.skip_expected('DEDENT')
 
         return ast.Enum(name, items)
         
 
 class ClassDataStament(Subparser):
     def parse(self, parser, tokens):
-        tokens.consume_expected('CLASS')
+        tokens.skip_expected('CLASS')
         className = tokens.consume_expected('NAME')
-        current = tokens.current()
+        current = tokens.current_name()
         parents = []
         
-        if current.name == 'ARROW':
-            tokens.consume_expected('ARROW')
-
-            current = tokens.current()
-
-            while current.name == 'NAME':
-                parents.append(current)
-                tokens.consume_expected('NAME')
-                isComma = tokens.current()
-
-                if isComma.name == 'COMMA':
-                    tokens.consume_expected('COMMA')
-                    current = tokens.current()
-                elif isComma.name == 'COLON':
-                    tokens.consume_expected('COLON')
-                    current = tokens.current()
+        if current == 'ARROW':
+            tokens.skip_expected('ARROW')
+
+            current = tokens.current_name()
+
+            while current == 'NAME':
+                parents.append(tokens.consume_expected('NAME'))
+                isComma = tokens.current_name()
+
+                if isComma == 'COMMA':
+                    tokens.skip_expected('COMMA')
+                    current = tokens.current_name()
+                elif isComma == 'COLON':
+                    tokens.skip_expected('COLON')
+                    current = tokens.current_name()
                 else:
-                    current = tokens.current()
+                    current = tokens.current_name()
                 
         
-        elif current.name == 'COLON':
-            tokens.consume_expected('COLON')
+        elif current == 'COLON':
+            tokens.skip_expected('COLON')
 
-        body = Block().parse(parser, tokens)
+        body = BLOCK.parse(parser, tokens)
         return ast.ClassDefinition(className, parents, body)
 
 
 class UsingMod(Subparser):
 
     def parse(self, parser, tokens):
-        tokens.consume_expected('USING')
+        tokens.skip_expected('USING')
         mod = tokens.consume_expected('NAME')[1]
-        tokens.consume_expected('NEWLINE')
+        tokens.skip_expected('NEWLINE')
         return ast.UsingNode(mod)
  
 class TypedVarDeclStatement(Subparser):
 
     def parse(self, parser, tokens):
-        tokens.consume_expected('LET')
+        tokens.skip_expected('LET')
         var_name = tokens.consume_expected('NAME')
-        if tokens.current().name == 'COLON':
-            tokens.consume_expected('COLON')
-            var_type = tokens.consume_expected('NAME')
-            if tokens.current().name == 'NEWLINE':
-                tokens.consume_expected('NEWLINE')
+        if tokens.current_name() == 'COLON':
+            tokens.skip_expected('COLON')
+            var_type = TYPE_NAME.parse(parser, tokens)
+            if tokens.current_name() == 'NEWLINE':
+                tokens.skip_expected('NEWLINE')
                 return ast.TypedName(var_name, var_type, None)
 
-            tokens.consume_expected('ASSIGN')
-            val = Expression().parse(parser, tokens)
-            tokens.consume_expected('NEWLINE')
+            tokens.skip_expected('ASSIGN')
+            val = EXPRESSION.parse(parser, tokens)
+            tokens.skip_expected('NEWLINE')
             return ast.TypedName(var_name, var_type, val)
         
-        tokens.consume_expected('ASSIGN')
-        val = Expression().parse(parser, tokens)
-        tokens.consume_expected('NEWLINE')
+        tokens.skip_expected('ASSIGN')
+        val = EXPRESSION.parse(parser, tokens)
+        tokens.skip_expected('NEWLINE')
         return ast.InferedName(var_name, val)
 
 
@@ -442,13 +487,13 @@ class ConditionalStatement(Subparser):
 
     def _parse_elif_conditions(self, parser, tokens):
         conditions = []
-        while not tokens.is_end() and tokens.current().name == 'ELIF':
-            tokens.consume_expected('ELIF')
-            test = Expression().parse(parser, tokens)
+        while not tokens.is_end() and tokens.current_name() == 'ELIF':
+            tokens.skip_expected('ELIF')
+            test = EXPRESSION.parse(parser, tokens)
             if test is None:
                 raise ParserError('Expected `elif` condition', tokens.current())
-            tokens.consume_expected('COLON')
-            block = Block().parse(parser, tokens)
+            tokens.skip_expected('COLON')
+            block = BLOCK.parse(parser, tokens)
             if block is None:
                 raise ParserError('Expected `elif` body', tokens.current())
             conditions.append(ast.ConditionElif(test, block))
@@ -456,20 +501,20 @@ class ConditionalStatement(Subparser):
 
     def _parse_else(self, parser, tokens):
         else_block = None
-        if not tokens.is_end() and tokens.current().name == 'ELSE':
-            tokens.consume_expected('ELSE', 'COLON')
-            else_block = Block().parse(parser, tokens)
+        if not tokens.is_end() and tokens.current_name() == 'ELSE':
+            tokens.skip_expected('ELSE', 'COLON')
+            else_block = BLOCK.parse(parser, tokens)
             if else_block is None:
                 raise ParserError('Expected `else` body', tokens.current())
         return else_block
 
     def parse(self, parser, tokens):
-        tokens.consume_expected('IF')
-        test = Expression().parse(parser, tokens)
+        tokens.skip_expected('IF')
+        test = EXPRESSION.parse(parser, tokens)
         if test is None:
             raise ParserError('Expected `if` condition', tokens.current())
-        tokens.consume_expected('COLON')
-        if_block = Block().parse(parser, tokens)
+        tokens.skip_expected('COLON')
+        if_block = BLOCK.parse(parser, tokens)
         if if_block is None:
             raise ParserError('Expected if body', tokens.current())
         elif_conditions = self._parse_elif_conditions(parser, tokens)
@@ -482,30 +527,30 @@ class MatchStatement(Subparser):
 
     # match_when: WHEN expr COLON block
     def _parse_when(self, parser, tokens):
-        tokens.consume_expected('WHEN')
-        pattern = Expression().parse(parser, tokens)
+        tokens.skip_expected('WHEN')
+        pattern = EXPRESSION.parse(parser, tokens)
         if pattern is None:
             raise ParserError('Pattern expression expected', tokens.current())
-        tokens.consume_expected('COLON')
-        block = Block().parse(parser, tokens)
+        tokens.skip_expected('COLON')
+        block = BLOCK.parse(parser, tokens)
         return ast.MatchPattern(pattern, block)
 
     def parse(self, parser, tokens):
-        tokens.consume_expected('MATCH')
-        test = Expression().parse(parser, tokens)
-        tokens.consume_expected('COLON', 'NEWLINE', 'INDENT')
+        tokens.skip_expected('MATCH')
+        test = EXPRESSION.parse(parser, tokens)
+        tokens.skip_expected('COLON', 'NEWLINE', 'INDENT')
         patterns = []
-        while not tokens.is_end() and tokens.current().name == 'WHEN':
+        while not tokens.is_end() and tokens.current_name() == 'WHEN':
             patterns.append(self._parse_when(parser, tokens))
         if not patterns:
             raise ParserError('One or more `when` pattern excepted', tokens.current())
         else_block = None
-        if not tokens.is_end() and tokens.current().name == 'ELSE':
-            tokens.consume_expected('ELSE', 'COLON')
-            else_block = Block().parse(parser, tokens)
+        if not tokens.is_end() and tokens.current_name() == 'ELSE':
+            tokens.skip_expected('ELSE', 'COLON')
+            else_block = BLOCK.parse(parser, tokens)
             if else_block is None:
                 raise ParserError('Expected `else` body', tokens.current())
-        tokens.consume_expected('DEDENT')
+        tokens.skip_expected('DEDENT')
         return ast.Match(test, patterns, else_block)
 
 
@@ -513,13 +558,13 @@ class MatchStatement(Subparser):
 class WhileLoopStatement(Subparser):
 
     def parse(self, parser, tokens):
-        tokens.consume_expected('WHILE')
-        test = Expression().parse(parser, tokens)
+        tokens.skip_expected('WHILE')
+        test = EXPRESSION.parse(parser, tokens)
         if test is None:
             raise ParserError('While condition expected', tokens.current())
-        tokens.consume_expected('COLON')
+        tokens.skip_expected('COLON')
         with enter_scope(parser, 'loop'):
-            block = Block().parse(parser, tokens)
+            block = BLOCK.parse(parser, tokens)
         if block is None:
             raise ParserError('Expected loop body', tokens.current())
         return ast.WhileLoop(test, block)
@@ -529,13 +574,13 @@ class WhileLoopStatement(Subparser):
 class ForLoopStatement(Subparser):
 
     def parse(self, parser, tokens):
-        tokens.consume_expected('FOR')
+        tokens.skip_expected('FOR')
         id_token = tokens.consume_expected('NAME')
-        tokens.consume_expected('IN')
-        collection = Expression().parse(parser, tokens)
-        tokens.consume_expected('COLON')
+        tokens.skip_expected('IN')
+        collection = EXPRESSION.parse(parser, tokens)
+        tokens.skip_expected('COLON')
         with enter_scope(parser, 'loop'):
-            block = Block().parse(parser, tokens)
+            block = BLOCK.parse(parser, tokens)
         if block is None:
             raise ParserError('Expected loop body', tokens.current())
         return ast.ForLoop(id_token.value, collection, block)
@@ -547,9 +592,9 @@ class ReturnStatement(Subparser):
     def parse(self, parser, tokens):
         if not parser.scope or 'function' not in parser.scope:
             raise ParserError('Return outside of function', tokens.current())
-        tokens.consume_expected('RETURN')
-        value = Expression().parse(parser, tokens)
-        tokens.consume_expected('NEWLINE')
+        tokens.skip_expected('RETURN')
+        value = EXPRESSION.parse(parser, tokens)
+        tokens.skip_expected('NEWLINE')
         return ast.Return(value)
 
 
@@ -559,7 +604,7 @@ class BreakStatement(Subparser):
     def parse(self, parser, tokens):
         if not parser.scope or parser.scope[-1] != 'loop':
             raise ParserError('Break outside of loop', tokens.current())
-        tokens.consume_expected('BREAK', 'NEWLINE')
+        tokens.skip_expected('BREAK', 'NEWLINE')
         return ast.Break()
 
 
@@ -569,7 +614,7 @@ class ContinueStatement(Subparser):
     def parse(self, parser, tokens):
         if not parser.scope or parser.scope[-1] != 'loop':
             raise ParserError('Continue outside of loop', tokens.current())
-        tokens.consume_expected('CONTINUE', 'NEWLINE')
+        tokens.skip_expected('CONTINUE', 'NEWLINE')
         return ast.Continue()
 
 
@@ -577,9 +622,9 @@ class ContinueStatement(Subparser):
 class AssignmentStatement(Subparser):
 
     def parse(self, parser, tokens, left):
-        tokens.consume_expected('ASSIGN')
-        right = Expression().parse(parser, tokens)
-        tokens.consume_expected('NEWLINE')
+        tokens.skip_expected('ASSIGN')
+        right = EXPRESSION.parse(parser, tokens)
+        tokens.skip_expected('NEWLINE')
         return ast.Assignment(left, right)
 
 
@@ -588,39 +633,25 @@ class AssignmentStatement(Subparser):
 class ExpressionStatement(Subparser):
 
     def parse(self, parser, tokens):
-        exp = Expression().parse(parser, tokens)
+        exp = EXPRESSION.parse(parser, tokens)
         if exp is not None:
-            if tokens.current().name == 'ASSIGN':
-                return AssignmentStatement().parse(parser, tokens, exp)
+            if tokens.current_name() == 'ASSIGN':
+                return ASSIGNMENT_STATEMENT.parse(parser, tokens, exp)
             else:
-                tokens.consume_expected('NEWLINE')
+                tokens.skip_expected('NEWLINE')
                 return exp
 
 
 # stmnts: stmnt*
 class Statements(Subparser):
 
-    def get_statement_subparser(self, token):
-        return self.get_subparser(token, {
-            'FUNCTION': FunctionStatement,
-            'IF': ConditionalStatement,
-            'MATCH': MatchStatement,
-            'WHILE': WhileLoopStatement,
-            'FOR': ForLoopStatement,
-            'RETURN': ReturnStatement,
-            'BREAK': BreakStatement,
-            'CONTINUE': ContinueStatement,
-            'LET': TypedVarDeclStatement, 
-            'USING': UsingMod, 
-            'CLASS': ClassDataStament, 
-            'ENUM': EnumStatement, 
-            'CPP': CPPStatement
-        }, ExpressionStatement)
+    def get_statement_subparser(self, name):
+        return self.get_subparser(name, STATEMENT_SUBPARSERS, EXPRESSION_STATEMENT)
 
     def parse(self, parser, tokens):
         statements = []
         while not tokens.is_end():
-            statement = self.get_statement_subparser(tokens.current()).parse(parser, tokens)
+            statement = STATEMENT_SUBPARSERS.get(tokens.current_name(), EXPRESSION_STATEMENT).parse(parser, tokens)
             if statement is not None:
                 statements.append(statement)
             else:
@@ -632,11 +663,57 @@ class Statements(Subparser):
 class Program(Subparser):
 
     def parse(self, parser, tokens):
-        statements = Statements().parse(parser, tokens)
+        statements = STATEMENTS.parse(parser, tokens)
         tokens.expect_end()
         return ast.Program(statements)
 
 
+# Subparsers keep no state between calls, so a single instance of each is
+# shared by every parse and dispatch is a plain lookup on the token kind.
+EXPRESSION = Expression()
+LIST_OF_EXPRESSIONS = ListOfExpressions()
+STRING_EXPRESSION = StringExpression()
+TYPE_NAME = TypeName()
+BLOCK = Block()
+STATEMENTS = Statements()
+ASSIGNMENT_STATEMENT = AssignmentStatement()
+EXPRESSION_STATEMENT = ExpressionStatement()
+PROGRAM = Program()
+
+PREFIX_SUBPARSERS = {
+    'NUMBER': NumberExpression(),
+    'STRING': STRING_EXPRESSION,
+    'NAME': NameExpression(),
+    'LPAREN': GroupExpression(),
+    'LBRACK': ArrayExpression(),
+    'LCBRACK': DictionaryExpression(),
+    'OPERATOR': UnaryOperatorExpression(),
+}
+
+INFIX_SUBPARSERS = {
+    'OPERATOR': BinaryOperatorExpression(),
+    'LPAREN': CallExpression(),
+    'LBRACK': SubscriptOperatorExpression(),
+    'SCOPE': ClassResolution(),
+}
+
+STATEMENT_SUBPARSERS = {
+    'FUNCTION': FunctionStatement(),
+    'IF': ConditionalStatement(),
+    'MATCH': MatchStatement(),
+    'WHILE': WhileLoopStatement(),
+    'FOR': ForLoopStatement(),
+    'RETURN': ReturnStatement(),
+    'BREAK': BreakStatement(),
+    'CONTINUE': ContinueStatement(),
+    'LET': TypedVarDeclStatement(),
+    'USING': UsingMod(),
+    'CLASS': ClassDataStament(),
+    'ENUM': EnumStatement(),
+    'CPP': CPPStatement(),
+}
+
+
 class Parser(object):
 
     def __init__(self):
@@ -644,4 +721,4 @@ class Parser(object):
 
     def parse(self, tokens):
         self.scope = []
-        return Program().parse(self, tokens)
+        return PROGRAM.parse(self, tokens)
@@ -0,0 +1,188 @@
+"""
+Resolver
+--------
+
+Name resolution pass run before code generation.
+"""
+from collections import namedtuple
+from falconback import ast
+
+Binding = namedtuple('Binding', ['depth', 'slot', 'value'])
+
+
+class Resolver(object):
+    """
+    Walks the program in code generation order and binds every name token
+    to the declaration visible at that point: the scope depth, the slot in
+    that scope and the declared value. Code generation then finds a name
+    with one dict lookup on the token instead of walking Environment
+    parents.
+
+    Declaring tokens (variables and parameters) are bound to whatever they
+    would shadow, so redefinition checks are the same lookup.
+    """
+
+    def __init__(self, env):
+        self.env = env
+        self.bindings = {}
+        # name -> stack of (depth, slot), innermost declaration last
+        self._visible = {}
+        # per depth: (name -> slot, slot values)
+        self._scopes = []
+        self.enter_scope()
+        for name, value in env.asdict().items():
+            self.declare(name, value)
+
+    def enter_scope(self):
+        self._scopes.append(({}, []))
+
+    def exit_scope(self):
+        names, _ = self._scopes.pop()
+        for name in names:
+            self._visible[name].pop()
+
+    def declare(self, name, value):
+        depth = len(self._scopes) - 1
+        names, values = self._scopes[depth]
+        slot = names.get(name)
+        if slot is None:
+            slot = len(values)
+            names[name] = slot
+            values.append(value)
+            self._visible.setdefault(name, []).append((depth, slot))
+        else:
+            values[slot] = value
+        if depth == 0:
+            # globals outlive this pass, e.g. between REPL inputs
+            self.env.set(name, value)
+
+    def lookup(self, name):
+        visible = self._visible.get(name)
+        if visible:
+            depth, slot = visible[-1]
+            return Binding(depth, slot, self._scopes[depth][1][slot])
+
+    def bind(self, token):
+        binding = self.lookup(token.value)
+        if binding is not None:
+            self.bindings[id(token)] = binding
+
+    def resolve_expression(self, node):
+        # expressions declare nothing, so their names can be bound in any
+        # order; a work list keeps very deep expressions off the stack
+        work = [node]
+        while work:
+            node = work.pop()
+            tp = type(node)
+            if tp == ast.Identifier:
+                self.bind(node.value)
+            elif tp in expression_children:
+                work.extend(expression_children[tp](node))
+
+    def resolve_statements(self, statements):
+        for statement in statements:
+            self.resolve_statement(statement)
+
+    def resolve_statement(self, node):
+        resolver = statement_resolvers.get(type(node))
+        if resolver is not None:
+            resolver(self, node)
+        else:
+            self.resolve_expression(node)
+
+    def resolve(self, program):
+        self.resolve_statements(program.body)
+        return self.bindings
+
+
+expression_children = {
+    ast.BinaryOperator: lambda node: (node.left, node.right),
+    ast.UnaryOperator: lambda node: (node.right,),
+    ast.GroupExpression: lambda node: (node.left,),
+    ast.SubscriptOperator: lambda node: (node.left, node.key),
+    ast.Call: lambda node: [node.left] + node.arguments,
+    ast.Array: lambda node: node.items,
+    ast.Dictionary: lambda node: [item for pair in node.items for item in pair],
+    ast.ClassAccess: lambda node: (node.left, node.right),
+    ast.Assignment: lambda node: (node.left, node.right),
+    ast.Return: lambda node: (node.value,),
+}
+
+
+def resolve_function(resolver, node):
+    resolver.declare(node.name.value, node)
+    resolver.enter_scope()
+    for param in node.params:
+        token = param.name if type(param) == ast.TypedParam else param
+        resolver.bind(token)
+        resolver.declare(token.value, param)
+    resolver.resolve_statements(node.body)
+    resolver.exit_scope()
+
+
+def resolve_variable(resolver, node):
+    resolver.bind(node.name)
+    resolver.declare(node.name.value, node)
+    resolver.resolve_expression(node.value)
+
+
+def resolve_condition(resolver, node):
+    resolver.resolve_expression(node.test)
+    resolver.resolve_statements(node.if_body)
+    for cond in node.elifs:
+        resolver.resolve_expression(cond.test)
+        resolver.resolve_statements(cond.body)
+    if node.else_body is not None:
+        resolver.resolve_statements(node.else_body)
+
+
+def resolve_match(resolver, node):
+    resolver.resolve_expression(node.test)
+    for pattern in node.patterns:
+        resolver.resolve_expression(pattern.pattern)
+        resolver.resolve_statements(pattern.body)
+    if node.else_body is not None:
+        resolver.resolve_statements(node.else_body)
+
+
+def resolve_while_loop(resolver, node):
+    resolver.resolve_expression(node.test)
+    resolver.resolve_statements(node.body)
+
+
+def resolve_for_loop(resolver, node):
+    resolver.declare(node.var_name, node)
+    resolver.resolve_expression(node.collection)
+    resolver.resolve_statements(node.body)
+
+
+def resolve_enum(resolver, node):
+    for item in node.items:
+        resolver.declare(item.value, item)
+
+
+def resolve_classdef(resolver, node):
+    params = []
+    for stmt in node.body:
+        resolver.resolve_statement(stmt)
+        if isinstance(stmt, ast.TypedName):
+            params.append((stmt.name, stmt.type))
+    name = node.name.value
+    resolver.declare(name, ast.Call(name, params, None))
+
+
+statement_resolvers = {
+    ast.Function: resolve_function,
+    ast.TypedName: resolve_variable,
+    ast.InferedName: resolve_variable,
+    ast.Condition: resolve_condition,
+    ast.Match: resolve_match,
+    ast.WhileLoop: resolve_while_loop,
+    ast.ForLoop: resolve_for_loop,
+    ast.Enum: resolve_enum,
+    ast.ClassDefinition: resolve_classdef,
+}
+
+
+def resolve(program, env):
+    return Resolver(env).resolve(program)
@@ -0,0 +1,1081 @@
+#ifndef __FALCON_SYSTEM_DEFS__
+#define __FALCON_SYSTEM_DEFS__
+
+#include <stdint.h>
+#include <fstream>
+#include <stdio.h>
+#include <stdlib.h>
+#include <iostream>
+#include <vector>
+#include <stdexcept>
+#include <type_traits>
+#include <ranges>
+#include <span>
+#include <source_location>
+#include <charconv>
+#include <sstream>
+#include <string_view>
+#include <functional>
+#include <initializer_list>
+#include <memory>
+#include <utility>
+
+
+/**
+ * @brief predefined data types for Falcon programming language
+ *
+ * These types were chosen with the intent of being compatible with existing c/c++ codebases.
+ * Interger type names were/are inspired by the rust programming language
+ *
+ **/
+
+
+/**
+ * @brief Signed and unsigned 8-bit integers
+ *
+ */
+typedef unsigned char u8;
+typedef signed char i8;
+
+/**
+ * @brief Signed and unsigned 16-bit integers
+ *
+ */
+typedef unsigned short u16;
+typedef signed short i16;
+
+
+/**
+ * @brief Signed and unsigned 32-bit integers
+ *
+ */
+typedef unsigned int u32;
+typedef signed int i32;
+
+
+/**
+ * @brief Signed and unsigned 64-bit integers
+ *
+ */
+typedef unsigned long long u64;
+typedef signed long long i64;
+
+
+/**
+ * @brief 64-bit and 32-bit floating point real numbers
+ *
+ */
+typedef double f64;
+typedef float f32;
+
+
+/**
+ * @brief boolean type
+ *
+ */
+typedef bool boolean;
+
+
+/**
+ * @brief string type (OOP String for out-of-the-box features)
+ *
+ */
+typedef std::string string;
+
+
+/**
+ * @brief string view type, what slice() returns for a string
+ *
+ */
+typedef std::string_view strview;
+
+
+/**
+ * @brief File pointer |
+ * I chose to use the c version because in c++ we have to use different streams for reading and writing
+ * to files.
+ *
+ */
+typedef FILE* file;
+
+
+/**
+ * @brief null alias for compatability
+ *
+ */
+#define null (NULL)
+
+
+namespace falcon {
+
+    /**
+     * @brief array view type, what slice() returns for an array
+     *
+     */
+    template <typename T>
+    using slice = std::span<const T>;
+
+    template <typename K, typename V>
+    class dict;
+
+    /**
+     * @brief Standard output of print, println and log
+     *
+     * Output is collected in a large buffer and written when it fills, on flush() and
+     * when the program exits. Compiled with FALCON_LINE_BUFFERED (falcon --line-buffered)
+     * every complete line is written at once. Reading stdin flushes it first.
+     *
+     */
+    std::ostream& output();
+
+    /**
+     * @brief Append text to output() without going through the stream
+     *
+     */
+    void write(const char *text, size_t size);
+
+    /**
+     * @brief Write straight through to C stdout instead, for programs that also use it
+     *
+     */
+    void unbuffered_output();
+
+#ifdef FALCON_LOG_TIME
+    /**
+     * @brief "[seconds.microseconds] " in front of log and logf messages, compiled with
+     * FALCON_LOG_TIME (falcon --log-time)
+     *
+     */
+    struct log_time {
+        char text[48];
+
+        explicit log_time(i64 nanoseconds);
+    };
+
+    i64 log_clock();
+
+    inline std::ostream& operator<<(std::ostream& out, const log_time& time) {
+        return out << time.text;
+    }
+#endif
+
+    /**
+     * @brief Report the error of a builtin called at `where` to stderr and exit with `status`
+     *
+     * `where` defaults to the call in the program, so the message names the line that
+     * failed and not a line of the runtime. `format` is a printf format for the arguments.
+     *
+     */
+    [[noreturn]] void fail(std::source_location where, int status, const char *format, ...);
+
+    template <typename Printable, typename... Args>
+    void log_to(file fp, const char *source, int line, const char *function, const Printable& message, Args... args);
+
+#ifdef FALCON_ASYNC_LOG
+    /**
+     * @brief Asynchronous backend of log and logf, compiled with FALCON_ASYNC_LOG (falcon --async-log)
+     *
+     * A call stores a binary record in a lock-free ring buffer: its call site as the static
+     * __FILE__, __LINE__ and __func__ pointers, and its arguments. A background thread
+     * formats the records as the synchronous backend does and writes them out, log() to
+     * output() and logf() to its file. Printing waits for the log() records before it, the
+     * ring is drained on exit and before closefile().
+     *
+     */
+    struct log_record;
+
+    log_record *log_begin(file fp, const char *source, int line, const char *function);
+    void log_add(log_record *record, i64 value);
+    void log_add(log_record *record, u64 value);
+    void log_add(log_record *record, f64 value);
+    void log_add(log_record *record, strview value);
+    void log_commit(log_record *record);
+    void log_sync();
+
+    template <typename Printable, typename... Args>
+    void log_async(file fp, const char *source, int line, const char *function, const Printable& message, Args... args);
+#endif
+}
+
+
+/**
+ * @brief Write out everything printed so far
+ *
+ */
+i32 flush();
+
+
+template <typename Printable>
+static i32 print(const Printable& message, ...) {
+    // strings and integers skip the stream; one-byte integers print as characters
+    if constexpr (std::is_convertible_v<const Printable&, strview>) {
+        strview text = message;
+        falcon::write(text.data(), text.size());
+    } else if constexpr (std::is_integral_v<Printable> && !std::is_same_v<Printable, bool> && sizeof(Printable) > 1) {
+        char text[24];
+        char *end = std::to_chars(text, text + sizeof(text), message).ptr;
+        falcon::write(text, end - text);
+    } else {
+        falcon::output() << message;
+    }
+    return 0;
+}
+
+
+template <typename Listable>
+void print(const std::vector<Listable>& msg) {
+    print("[");
+
+    for (size_t x = 0; x < msg.size(); x++) {
+        if (x) {
+            print(", ");
+        }
+        print(msg[x]);
+    }
+    if (!msg.empty()) {
+        print("]");
+    }
+}
+
+template <typename Listable>
+void print(falcon::slice<Listable> msg) {
+    print("[");
+
+    for (size_t x = 0; x < msg.size(); x++) {
+        if (x) {
+            print(", ");
+        }
+        print(msg[x]);
+    }
+    if (!msg.empty()) {
+        print("]");
+    }
+}
+
+template <typename K, typename V>
+void print(const falcon::dict<K, V>& msg) {
+    print("{");
+
+    bool first = true;
+    for (const K& key : msg) {
+        if (!first) {
+            print(", ");
+        }
+        first = false;
+        print(key);
+        print(": ");
+        print(msg.at(key));
+    }
+    print("}");
+}
+
+template <typename Printable>
+static i32 println(const Printable& message, ...) {
+    print(message);
+    falcon::write("\n", 1);
+    return 0;
+}
+
+template <typename Listable>
+void println(const std::vector<Listable>& msg) {
+    print(msg);
+    println(" ");
+}
+
+template <typename Listable>
+void println(falcon::slice<Listable> msg) {
+    print(msg);
+    println(" ");
+}
+
+
+template <typename K, typename V>
+void println(const falcon::dict<K, V>& msg) {
+    print(msg);
+    falcon::write("\n", 1);
+}
+
+#ifdef FALCON_ASYNC_LOG
+#define logf(filePtr, ...) falcon::log_async(filePtr, __FILE__, __LINE__, __func__, __VA_ARGS__)
+#define log(...) falcon::log_async(null, __FILE__, __LINE__, __func__, __VA_ARGS__)
+#else
+#define logf(filePtr, ...) falcon::log_to(filePtr, __FILE__, __LINE__, __func__, __VA_ARGS__)
+#ifdef FALCON_LOG_TIME
+#define log(...) falcon::output() << falcon::log_time(falcon::log_clock()) << __FILE__ << ": " << __LINE__ << ": " << __func__ << "():  " << __VA_ARGS__ << "\n"
+#else
+#define log(...) falcon::output() << __FILE__ << ": " << __LINE__ << ": " << __func__ << "():  " << __VA_ARGS__ << "\n"
+#endif
+#endif
+#define COLOR_ERROR "\033[91m"
+#define COLOR_CLEAR "\033[0m"
+#define COLOR_SUCCESS "\033[92m"
+
+
+/**
+ * @brief logf(fp, message, ...) writes a located message to fp
+ *
+ * A C string message is a printf format for the arguments that follow it,
+ * anything else is written as print() would.
+ *
+ */
+template <typename Printable, typename... Args>
+void falcon::log_to(file fp, const char *source, int line, const char *function, const Printable& message, Args... args) {
+    if (fp == stdout || fp == stderr) {
+        // keep the order of what was printed before on a terminal
+        flush();
+    }
+#ifdef FALCON_LOG_TIME
+    fputs(log_time(log_clock()).text, fp);
+#endif
+    fprintf(fp, "%s: %d: %s(): fp @%p ", source, line, function, (void *) fp);
+    if constexpr (std::is_convertible_v<Printable, const char *>) {
+        fprintf(fp, message, args...);
+    } else {
+        std::ostringstream text;
+        text << message;
+        fputs(text.str().c_str(), fp);
+    }
+}
+
+
+#ifdef FALCON_ASYNC_LOG
+/**
+ * @brief log(...) and logf(fp, message, ...) with the asynchronous backend
+ *
+ * Numbers and strings are stored as they are; other values, and a printf format
+ * with its arguments, are formatted here.
+ *
+ */
+template <typename Printable, typename... Args>
+void falcon::log_async(file fp, const char *source, int line, const char *function, const Printable& message, Args... args) {
+    auto add = [](log_record *record, const auto& value) {
+        using Value = std::decay_t<decltype(value)>;
+        if constexpr (std::is_convertible_v<const Value&, strview>) {
+            log_add(record, strview(value));
+        } else if constexpr (std::is_integral_v<Value> && sizeof(Value) > 1 && std::is_signed_v<Value>) {
+            log_add(record, i64(value));
+        } else if constexpr (std::is_integral_v<Value> && sizeof(Value) > 1) {
+            log_add(record, u64(value));
+        } else if constexpr (std::is_floating_point_v<Value>) {
+            log_add(record, f64(value));
+        } else {
+            std::ostringstream text;
+            text << value;
+            log_add(record, strview(text.str()));
+        }
+    };
+
+    log_record *record = log_begin(fp, source, line, function);
+    if constexpr (std::is_convertible_v<Printable, const char *> && sizeof...(Args) > 0) {
+        string text(snprintf(null, 0, message, args...), '\0');
+        snprintf(text.data(), text.size() + 1, message, args...);
+        log_add(record, strview(text));
+    } else {
+        add(record, message);
+        (add(record, args), ...);
+    }
+    log_commit(record);
+}
+#endif
+
+
+/**
+ * @brief Number of elements, in O(1) for anything with a size()
+ *
+ */
+template <typename Loopable>
+i32 len(const Loopable& arr) {
+    if constexpr (requires { arr.size(); }) {
+        return arr.size();
+    } else {
+        return std::ranges::distance(arr);
+    }
+}
+
+
+/**
+ * @brief File and console IO, defined in falconrt.cpp (libfalconrt)
+ *
+ * The builtins that can fail take the location of their call, see falcon::fail.
+ *
+ */
+file open(const string& filename, const string& mode, std::source_location where = std::source_location::current());
+string readfile(file fp);
+strview mapfile(const string& filename, std::source_location where = std::source_location::current());
+i32 unmapfile(strview view, std::source_location where = std::source_location::current());
+string readline();
+i64 read_i64(std::source_location where = std::source_location::current());
+f64 read_f64(std::source_location where = std::source_location::current());
+i32 closefile(file fileptr, std::source_location where = std::source_location::current());
+
+
+namespace falcon {
+
+    /**
+     * @brief Lines of a file for `for line in lines(fp)`, without their newline
+     *
+     * The file is read in large chunks into one buffer that is reused for the whole
+     * loop. Each line is a view into it, valid until the next line is read.
+     *
+     */
+    class line_reader {
+        public:
+            struct sentinel {};
+
+            class iterator {
+                public:
+                    iterator(line_reader *reader) : reader(reader) {}
+
+                    strview operator*() const {
+                        return reader->line;
+                    }
+
+                    iterator& operator++() {
+                        reader->next();
+                        return *this;
+                    }
+
+                    bool operator!=(sentinel) const {
+                        return !reader->done;
+                    }
+
+                private:
+                    line_reader *reader;
+            };
+
+            line_reader(file fp);
+
+            iterator begin() {
+                next();
+                return iterator(this);
+            }
+
+            sentinel end() const {
+                return sentinel();
+            }
+
+        private:
+            void next();
+
+            file fp;
+            std::vector<char> buffer;
+            size_t start;
+            size_t filled;
+            strview line;
+            bool eof;
+            bool done;
+    };
+}
+
+falcon::line_reader lines(file fp);
+
+
+/**
+ * @brief Owning copies of views, inserted by the compiler where a view escapes
+ *
+ */
+inline string copy(strview view) {
+    return string(view);
+}
+
+template <typename T>
+std::vector<T> copy(falcon::slice<T> view) {
+    return std::vector<T>(view.begin(), view.end());
+}
+
+template <typename T>
+std::vector<T> copy(const std::vector<T>& arr) {
+    return arr;
+}
+
+
+namespace falcon {
+
+    /**
+     * @brief Hash map type, what a dictionary literal `{key: value}` makes
+     *
+     * Open addressing with Robin Hood probing. The table keeps one 32-bit word per slot
+     * in an array of its own: the distance of the entry from its home slot in the high
+     * byte, 24 bits of its hash below, 0 for an empty slot. A lookup walks these words
+     * and only reads an entry whose word matches in full, and it stops as soon as it
+     * meets an entry closer to home than the key would be. Erasing shifts the entries
+     * that follow back, so there are no tombstones. Iterating yields the keys.
+     *
+     */
+    template <typename K, typename V>
+    class dict {
+        public:
+            // string keys are looked up with views, without building a string
+            using key_type = std::conditional_t<std::is_same_v<K, string>, strview, const K&>;
+
+            class iterator {
+                public:
+                    iterator(const dict *table, size_t slot) : table(table), slot(slot) {
+                        skip();
+                    }
+
+                    const K& operator*() const {
+                        return table->entries[slot].first;
+                    }
+
+                    iterator& operator++() {
+                        slot++;
+                        skip();
+                        return *this;
+                    }
+
+                    bool operator==(const iterator& other) const {
+                        return slot == other.slot;
+                    }
+
+                    bool operator!=(const iterator& other) const {
+                        return slot != other.slot;
+                    }
+
+                private:
+                    // the word past the last slot is never empty
+                    void skip() {
+                        while (!table->info[slot]) {
+                            slot++;
+                        }
+                    }
+
+                    const dict *table;
+                    size_t slot;
+            };
+
+            dict() {}
+
+            dict(std::initializer_list<std::pair<K, V>> items) {
+                reserve(items.size());
+                for (const auto& item : items) {
+                    (*this)[item.first] = item.second;
+                }
+            }
+
+            template <typename K2, typename V2>
+            dict(const dict<K2, V2>& other) {
+                reserve(other.size());
+                for (size_t slot = 0; slot < other.capacity; slot++) {
+                    if (other.info[slot]) {
+                        (*this)[K(other.entries[slot].first)] = V(other.entries[slot].second);
+                    }
+                }
+            }
+
+            dict(const dict& other) {
+                reserve(other.size());
+                for (size_t slot = 0; slot < other.capacity; slot++) {
+                    if (other.info[slot]) {
+                        place(std::pair<K, V>(other.entries[slot]), hash(other.entries[slot].first));
+                    }
+                }
+            }
+
+            dict(dict&& other) noexcept {
+                swap(other);
+            }
+
+            dict& operator=(dict other) noexcept {
+                swap(other);
+                return *this;
+            }
+
+            ~dict() {
+                release();
+            }
+
+            void swap(dict& other) noexcept {
+                std::swap(info, other.info);
+                std::swap(entries, other.entries);
+                std::swap(mask, other.mask);
+                std::swap(capacity, other.capacity);
+                std::swap(count, other.count);
+                std::swap(limit, other.limit);
+            }
+
+            /**
+             * @brief The value of `key`, inserted with its default value if missing
+             *
+             */
+            V& operator[](key_type key) {
+                u64 h = hash(key);
+                size_t slot = h & mask;
+                u32 word = first_word(h);
+                while (true) {
+                    u32 current = info[slot];
+                    if (current == word && entries[slot].first == key) {
+                        return entries[slot].second;
+                    }
+                    if (current < (word & distance_mask)) {
+                        break;
+                    }
+                    slot = (slot + 1) & mask;
+                    word += distance_one;
+                }
+                // placing may move the entries
+                slot = place(std::pair<K, V>(K(key), V()), h);
+                return entries[slot].second;
+            }
+
+            const V& at(key_type key) const {
+                size_t slot = find(key);
+                if (slot == capacity) {
+                    throw std::out_of_range("dict::at: key not found");
+                }
+                return entries[slot].second;
+            }
+
+            bool contains(key_type key) const {
+                return find(key) != capacity;
+            }
+
+            /**
+             * @brief Remove `key`, returning the number of entries removed
+             *
+             */
+            size_t erase(key_type key) {
+                size_t slot = find(key);
+                if (slot == capacity) {
+                    return 0;
+                }
+                std::destroy_at(&entries[slot]);
+                size_t next = (slot + 1) & mask;
+                while (info[next] >= 2 * distance_one) {
+                    std::construct_at(&entries[slot], std::move(entries[next]));
+                    std::destroy_at(&entries[next]);
+                    info[slot] = info[next] - distance_one;
+                    slot = next;
+                    next = (next + 1) & mask;
+                }
+                info[slot] = 0;
+                count--;
+                return 1;
+            }
+
+            void clear() {
+                for (size_t slot = 0; slot < capacity; slot++) {
+                    if (info[slot]) {
+                        std::destroy_at(&entries[slot]);
+                        info[slot] = 0;
+                    }
+                }
+                count = 0;
+            }
+
+            /**
+             * @brief Make room for `size` entries without growing again
+             *
+             */
+            void reserve(size_t size) {
+                size_t slots = 8;
+                while (slots * max_load_num / max_load_den < size) {
+                    slots *= 2;
+                }
+                if (slots > capacity) {
+                    rehash(slots);
+                }
+            }
+
+            size_t size() const {
+                return count;
+            }
+
+            bool empty() const {
+                return count == 0;
+            }
+
+            iterator begin() const {
+                return iterator(this, 0);
+            }
+
+            iterator end() const {
+                return iterator(this, capacity);
+            }
+
+        private:
+            template <typename, typename>
+            friend class dict;
+
+            using entry = std::pair<K, V>;
+
+            static constexpr u32 distance_one = 1u << 24;
+            static constexpr u32 distance_mask = 0xff000000u;
+            static constexpr size_t max_load_num = 4;
+            static constexpr size_t max_load_den = 5;
+
+            // an empty table looks up a single slot that is not empty but is closer to home than any key
+            static inline u32 empty_info[1] = {1};
+
+            static u64 hash(key_type key) {
+                // std::hash of integers is the identity: mix the bits the table indexes with
+                u64 h = std::hash<std::remove_cvref_t<key_type>>{}(key);
+                __uint128_t product = (__uint128_t) h * 0x9e3779b97f4a7c15ull;
+                return (u64) product ^ (u64) (product >> 64);
+            }
+
+            // the word of a key in its home slot: distance 1 and the top 24 bits of its hash
+            static u32 first_word(u64 h) {
+                return distance_one | (u32) (h >> 40);
+            }
+
+            size_t find(key_type key) const {
+                u64 h = hash(key);
+                size_t slot = h & mask;
+                u32 word = first_word(h);
+                while (true) {
+                    u32 current = info[slot];
+                    if (current == word && entries[slot].first == key) {
+                        return slot;
+                    }
+                    if (current < (word & distance_mask)) {
+                        return capacity;
+                    }
+                    slot = (slot + 1) & mask;
+                    word += distance_one;
+                }
+            }
+
+            /**
+             * @brief Insert an entry whose key is not in the table, returning its slot
+             *
+             * The entry takes the first slot holding an entry closer to its home, and the
+             * run of entries from there to the next empty slot moves one slot on.
+             *
+             */
+            size_t place(entry&& item, u64 h) {
+                while (true) {
+                    if (count + 1 > limit) {
+                        rehash(capacity ? capacity * 2 : 8);
+                    }
+                    size_t slot = h & mask;
+                    u32 word = first_word(h);
+                    while (info[slot] >= (word & distance_mask)) {
+                        slot = (slot + 1) & mask;
+                        word += distance_one;
+                        if (!(word & distance_mask)) {
+                            break;
+                        }
+                    }
+                    size_t empty = slot;
+                    bool overflow = !(word & distance_mask);
+                    while (!overflow && info[empty]) {
+                        overflow = info[empty] >= distance_mask;
+                        empty = (empty + 1) & mask;
+                    }
+                    if (overflow) {
+                        // a probe would need a 256th slot
+                        rehash(capacity * 2);
+                        continue;
+                    }
+                    for (size_t to = empty; to != slot; ) {
+                        size_t from = (to - 1) & mask;
+                        std::construct_at(&entries[to], std::move(entries[from]));
+                        std::destroy_at(&entries[from]);
+                        info[to] = info[from] + distance_one;
+                        to = from;
+                    }
+                    std::construct_at(&entries[slot], std::move(item));
+                    info[slot] = word;
+                    count++;
+                    return slot;
+                }
+            }
+
+            void rehash(size_t slots) {
+                dict old;
+                swap(old);
+                info = new u32[slots + 1]();
+                info[slots] = 1;
+                entries = std::allocator<entry>().allocate(slots);
+                mask = slots - 1;
+                capacity = slots;
+                limit = slots * max_load_num / max_load_den;
+                for (size_t slot = 0; slot < old.capacity; slot++) {
+                    if (old.info[slot]) {
+                        place(std::move(old.entries[slot]), hash(old.entries[slot].first));
+                    }
+                }
+            }
+
+            void release() {
+                if (info == empty_info) {
+                    return;
+                }
+                clear();
+                delete[] info;
+                std::allocator<entry>().deallocate(entries, capacity);
+            }
+
+            u32 *info = empty_info;
+            entry *entries = nullptr;
+            size_t mask = 0;
+            size_t capacity = 0;
+            size_t count = 0;
+            size_t limit = 0;
+    };
+}
+
+using falcon::dict;
+
+
+template <typename K, typename V>
+bool contains(const dict<K, V>& map, typename dict<K, V>::key_type key) {
+    return map.contains(key);
+}
+
+template <typename K, typename V>
+i32 erase(dict<K, V>& map, typename dict<K, V>::key_type key) {
+    return map.erase(key);
+}
+
+
+namespace falcon {
+
+    /**
+     * @brief Append `value` to `text` as print would write it
+     *
+     */
+    template <typename T>
+    void append_to(string& text, const T& value) {
+        if constexpr (std::is_convertible_v<const T&, strview>) {
+            text.append(strview(value));
+        } else if constexpr (std::is_integral_v<T> && !std::is_same_v<T, bool> && sizeof(T) > 1) {
+            char digits[24];
+            char *end = std::to_chars(digits, digits + sizeof(digits), value).ptr;
+            text.append(digits, end - digits);
+        } else {
+            std::ostringstream stream;
+            stream << value;
+            text.append(stream.str());
+        }
+    }
+
+    /**
+     * @brief String builder type, appended to in place
+     *
+     * `builder = builder + value` and append() add to the end of one buffer that grows
+     * geometrically, so building a string piece by piece takes linear time. Numbers are
+     * formatted straight into the buffer. A builder reads as a strview, so it can be
+     * printed or passed where a view is expected; tostring() copies out the result.
+     *
+     */
+    class stringbuilder {
+        public:
+            template <typename T>
+            stringbuilder& operator+=(const T& value) {
+                append_to(text, value);
+                return *this;
+            }
+
+            void reserve(size_t size) {
+                text.reserve(size);
+            }
+
+            size_t size() const {
+                return text.size();
+            }
+
+            const string& str() const {
+                return text;
+            }
+
+            operator strview() const {
+                return text;
+            }
+
+        private:
+            string text;
+    };
+}
+
+using falcon::stringbuilder;
+
+
+template <typename T>
+i32 append(stringbuilder& builder, const T& value) {
+    builder += value;
+    return 0;
+}
+
+template <typename T>
+i32 append(string& text, const T& value) {
+    falcon::append_to(text, value);
+    return 0;
+}
+
+inline i32 reserve(stringbuilder& builder, i64 size) {
+    builder.reserve(size);
+    return 0;
+}
+
+inline string tostring(const stringbuilder& builder) {
+    return builder.str();
+}
+
+
+class FalconBase {
+    public:
+        string toString() {
+            return "Object()";
+        }
+};
+
+namespace range {
+
+    #include <iostream>
+
+    template <typename IntType>
+    std::vector<IntType> range(IntType start, IntType stop, IntType step)
+    {
+    if (step == IntType(0))
+    {
+        throw std::invalid_argument("step for range must be non-zero");
+    }
+
+    std::vector<IntType> result;
+    IntType i = start;
+    while ((step > 0) ? (i < stop) : (i > stop))
+    {
+        result.push_back(i);
+        i += step;
+    }
+
+    return result;
+    }
+
+    template <typename IntType>
+    std::vector<IntType> range(IntType start, IntType stop)
+    {
+        if (start > stop) return range(start, stop - IntType(1), IntType(-1)); //for i in 200...0:
+        return range(start, stop + IntType(1), IntType(1));
+    }
+
+    template <typename IntType>
+    std::vector<IntType> range(IntType stop)
+    {
+    return range(IntType(0), stop, IntType(1));
+    }
+
+    /**
+     * @brief Lazy version of range(start, stop) for `for i in start .. stop` loops
+     *
+     * Yields the same values, counting down when start > stop, without storing them.
+     *
+     */
+    template <typename IntType>
+    class view {
+        public:
+            struct sentinel {};
+
+            class iterator {
+                public:
+                    iterator(IntType value, IntType stop, IntType step) : value(value), stop(stop), step(step), done(false) {}
+
+                    IntType operator*() const {
+                        return value;
+                    }
+
+                    iterator& operator++() {
+                        if constexpr (std::is_integral_v<IntType>) {
+                            // stopping at stop itself never steps past the end of the type
+                            done = value == stop;
+                        } else {
+                            done = step > IntType(0) ? !(value + step < stop + step) : !(value + step > stop + step);
+                        }
+                        if (!done) {
+                            value += step;
+                        }
+                        return *this;
+                    }
+
+                    bool operator!=(sentinel) const {
+                        return !done;
+                    }
+
+                private:
+                    IntType value;
+                    IntType stop;
+                    IntType step;
+                    bool done;
+            };
+
+            view(IntType start, IntType stop) : start(start), stop(stop) {}
+
+            iterator begin() const {
+                return iterator(start, stop, start > stop ? IntType(-1) : IntType(1));
+            }
+
+            sentinel end() const {
+                return sentinel();
+            }
+
+        private:
+            IntType start;
+            IntType stop;
+    };
+}
+
+
+/**
+ * @brief slice(arr, start, end) is arr[start..end], end included
+ *
+ * Slicing a named array or string returns a view of it in O(1). Slicing a temporary
+ * returns an owning copy, since a view of it would outlive it.
+ *
+ */
+template <typename T>
+falcon::slice<T> slice(falcon::slice<T> arr, int start, int end, std::source_location where = std::source_location::current()) {
+    int alen = arr.size();
+
+    if (start < 0) {
+        falcon::fail(where, 512, COLOR_ERROR "Array index error:" COLOR_CLEAR " Array slice start point is out of range. index at %d", start);
+    }
+
+    if (end > alen) {
+        falcon::fail(where, 512, COLOR_ERROR "Array index error:" COLOR_CLEAR " Array slice end point is out of range. index at %d", end);
+    }
+
+    if (start > end) {
+        return falcon::slice<T>();
+    }
+    if (end == alen) {
+        throw std::out_of_range("slice: end is past the last element");
+    }
+    return arr.subspan(start, end - start + 1);
+}
+
+template <typename T>
+falcon::slice<T> slice(const std::vector<T>& arr, int start, int end, std::source_location where = std::source_location::current()) {
+    return slice(falcon::slice<T>(arr), start, end, where);
+}
+
+template <typename T>
+std::vector<T> slice(std::vector<T>&& arr, int start, int end, std::source_location where = std::source_location::current()) {
+    return copy(slice(falcon::slice<T>(arr), start, end, where));
+}
+
+// bits of a std::vector<bool> cannot be viewed
+inline std::vector<bool> slice(const std::vector<bool>& arr, int start, int end, std::source_location where = std::source_location::current()) {
+    std::vector<bool> ret;
+    int alen = arr.size();
+
+    if (start < 0) {
+        falcon::fail(where, 512, COLOR_ERROR "Array index error:" COLOR_CLEAR " Array slice start point is out of range. index at %d", start);
+    }
+
+    if (end > alen) {
+        falcon::fail(where, 512, COLOR_ERROR "Array index error:" COLOR_CLEAR " Array slice end point is out of range. index at %d", end);
+    }
+
+    if (start <= end) {
+        arr.at(end);
+        ret.assign(arr.begin() + start, arr.begin() + end + 1);
+    }
+    return ret;
+}
+
+strview slice(strview str, int start, int end, std::source_location where = std::source_location::current());
+string slice(string&& str, int start, int end, std::source_location where = std::source_location::current());
+
+#endif //__FALCON_SYSTEM_DEFS__
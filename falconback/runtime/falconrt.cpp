@@ -0,0 +1,641 @@
+#include "falcon.h"
+
+#include <cctype>
+#include <cstdarg>
+#include <charconv>
+#include <cstring>
+#include <fcntl.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
+#include <exception>
+#ifdef FALCON_ASYNC_LOG
+#include <atomic>
+#include <chrono>
+#include <condition_variable>
+#include <mutex>
+#include <thread>
+#endif
+#ifdef FALCON_LOG_TIME
+#include <chrono>
+#endif
+
+
+#ifdef FALCON_LINE_BUFFERED
+static const bool line_buffered = true;
+#else
+static const bool line_buffered = false;
+#endif
+
+
+namespace {
+
+#ifdef FALCON_ASYNC_LOG
+    // log() records queued and not yet in the output buffer. The writer thread
+    // appends them to it; the program waits for them before it touches the
+    // buffer itself, so the two never write at once and print and log keep
+    // their order.
+    std::atomic<size_t> pending_logs(0);
+    // wakes the writer when the program waits for it
+    std::mutex log_mutex;
+    std::condition_variable log_wake;
+    bool log_hurry = false;
+#endif
+
+    void wait_for_log() {
+#ifdef FALCON_ASYNC_LOG
+        size_t pending = pending_logs.load(std::memory_order_acquire);
+        if (pending == 0) {
+            return;
+        }
+        {
+            std::lock_guard<std::mutex> lock(log_mutex);
+            log_hurry = true;
+        }
+        log_wake.notify_one();
+        while (pending != 0) {
+            pending_logs.wait(pending, std::memory_order_acquire);
+            pending = pending_logs.load(std::memory_order_acquire);
+        }
+#endif
+    }
+
+    // The buffer of falcon::output(). Everything goes to C stdout, in
+    // large writes, so output written there directly stays in order after
+    // a flush.
+    class output_buffer : public std::streambuf {
+        public:
+            output_buffer() : buffer(1 << 16) {
+                setp(buffer.data(), buffer.data() + buffer.size());
+            }
+
+            ~output_buffer() {
+                sync();
+            }
+
+            void unbuffer() {
+                drain();
+                setp(null, null);
+            }
+
+            std::streamsize put(const char *data, std::streamsize size) {
+                if (size > epptr() - pptr() && !drain()) {
+                    return 0;
+                }
+                if (size <= epptr() - pptr()) {
+                    memcpy(pptr(), data, size);
+                    pbump(size);
+                } else {
+                    // larger than the buffer, or unbuffered
+                    size = fwrite(data, 1, size, stdout);
+                }
+                if (line_buffered && memchr(data, '\n', size) != null) {
+                    write_out();
+                }
+                return size;
+            }
+
+        protected:
+            int sync() override {
+                wait_for_log();
+                return write_out();
+            }
+
+            int_type overflow(int_type c) override {
+                if (traits_type::eq_int_type(c, traits_type::eof())) {
+                    return drain() ? traits_type::not_eof(c) : traits_type::eof();
+                }
+                char ch = c;
+                return xsputn(&ch, 1) == 1 ? c : traits_type::eof();
+            }
+
+            std::streamsize xsputn(const char *data, std::streamsize size) override {
+                return put(data, size);
+            }
+
+        private:
+            int write_out() {
+                return drain() && fflush(stdout) == 0 ? 0 : -1;
+            }
+
+            bool drain() {
+                size_t size = pptr() - pbase();
+                bool written = size == 0 || fwrite(pbase(), 1, size, stdout) == size;
+                setp(pbase(), epptr());
+                return written;
+            }
+
+            std::vector<char> buffer;
+    };
+
+    std::terminate_handler terminate_handler;
+
+    // an uncaught exception ends the program without running destructors
+    void flush_and_terminate() {
+        flush();
+        terminate_handler();
+    }
+
+    struct output_stream {
+        output_buffer buffer;
+        std::ostream stream;
+
+        output_stream() : stream(&buffer) {
+            std::cin.tie(&stream);
+            terminate_handler = std::set_terminate(flush_and_terminate);
+        }
+
+        ~output_stream() {
+            std::cin.tie(&std::cout);
+        }
+    };
+
+    output_stream& output_stream_instance() {
+        // created on first use and flushed by its destructor on exit
+        static output_stream instance;
+        return instance;
+    }
+}
+
+
+std::ostream& falcon::output() {
+    wait_for_log();
+    return output_stream_instance().stream;
+}
+
+void falcon::write(const char *text, size_t size) {
+    wait_for_log();
+    output_stream_instance().buffer.put(text, size);
+}
+
+void falcon::unbuffered_output() {
+    output_stream_instance().buffer.unbuffer();
+}
+
+i32 flush() {
+    falcon::output().flush();
+    return 0;
+}
+
+void falcon::fail(std::source_location where, int status, const char *format, ...) {
+    // what was printed and logged before the error comes first
+#ifdef FALCON_ASYNC_LOG
+    log_sync();
+#endif
+    flush();
+    fprintf(stderr, "%s: %u: ", where.file_name(), (unsigned) where.line());
+    va_list args;
+    va_start(args, format);
+    vfprintf(stderr, format, args);
+    va_end(args);
+    fputc('\n', stderr);
+    exit(status);
+}
+
+#ifdef FALCON_LOG_TIME
+i64 falcon::log_clock() {
+    return std::chrono::duration_cast<std::chrono::nanoseconds>(std::chrono::system_clock::now().time_since_epoch()).count();
+}
+
+falcon::log_time::log_time(i64 nanoseconds) {
+    snprintf(text, sizeof(text), "[%lld.%06lld] ", (long long) (nanoseconds / 1000000000), (long long) (nanoseconds / 1000 % 1000000));
+}
+#endif
+
+
+file open(const string& filename, const string& mode, std::source_location where) {
+    file fp = fopen(filename.c_str(), mode.c_str());
+    if (fp == null) {
+        falcon::fail(where, 404, COLOR_ERROR "IO error:" COLOR_CLEAR " could not create or open file '%s'", filename.c_str());
+    }
+    return fp;
+}
+
+string readfile(file fp) {
+    fseek(fp, 0, SEEK_END);
+    size_t size = ftell(fp);
+    fseek(fp, 0, SEEK_SET);
+
+    string result(size, '\0');
+    result.resize(fread(result.data(), 1, size, fp));
+    return result;
+}
+
+strview mapfile(const string& filename, std::source_location where) {
+    int fd = ::open(filename.c_str(), O_RDONLY);
+    struct stat info;
+    if (fd < 0 || fstat(fd, &info) < 0) {
+        falcon::fail(where, 404, COLOR_ERROR "IO error:" COLOR_CLEAR " could not open file '%s'", filename.c_str());
+    }
+    if (info.st_size == 0) {
+        // nothing to map, and mmap refuses a zero length
+        close(fd);
+        return strview();
+    }
+
+    void *data = mmap(null, info.st_size, PROT_READ, MAP_PRIVATE, fd, 0);
+    close(fd);
+    if (data == MAP_FAILED) {
+        falcon::fail(where, 404, COLOR_ERROR "IO error:" COLOR_CLEAR " could not map file '%s'", filename.c_str());
+    }
+    madvise(data, info.st_size, MADV_SEQUENTIAL);
+    return strview((const char *) data, info.st_size);
+}
+
+i32 unmapfile(strview view, std::source_location where) {
+    if (view.empty()) {
+        return 0;
+    }
+    if (munmap((void *) view.data(), view.size()) < 0) {
+        falcon::fail(where, 408, COLOR_ERROR "IO error:" COLOR_CLEAR " unmapfile expects a view returned by mapfile ('%p')", view.data());
+    }
+    return 0;
+}
+
+string readline() {
+    string result = string("");
+    std::cin >> result;
+    return result;
+}
+
+// the next whitespace separated word of stdin, at most size bytes
+static size_t read_word(char *word, size_t size) {
+    // skips the whitespace and flushes the output before waiting for input
+    std::cin >> std::ws;
+    std::streambuf *in = std::cin.rdbuf();
+    size_t length = 0;
+    int c;
+    while (length < size && (c = in->sgetc()) != EOF && !isspace(c)) {
+        word[length++] = c;
+        in->sbumpc();
+    }
+    return length;
+}
+
+template <typename Number>
+static Number read_number(const char *expected, std::source_location where) {
+    char word[128];
+    size_t length = read_word(word, sizeof(word));
+    Number value = 0;
+    auto [end, error] = std::from_chars(word, word + length, value);
+    if (length == 0 || length == sizeof(word) || error != std::errc() || end != word + length) {
+        falcon::fail(where, 400, COLOR_ERROR "IO error:" COLOR_CLEAR " expected %s on standard input", expected);
+    }
+    return value;
+}
+
+i64 read_i64(std::source_location where) {
+    return read_number<i64>("an integer", where);
+}
+
+f64 read_f64(std::source_location where) {
+    return read_number<f64>("a number", where);
+}
+
+falcon::line_reader::line_reader(file fp) : fp(fp), buffer(1 << 18), start(0), filled(0), eof(false), done(false) {}
+
+void falcon::line_reader::next() {
+    while (true) {
+        char *begin = buffer.data() + start;
+        size_t available = filled - start;
+        char *newline = (char *) memchr(begin, '\n', available);
+        if (newline != null) {
+            line = strview(begin, newline - begin);
+            start += newline - begin + 1;
+            return;
+        }
+        if (eof) {
+            // the last line may have no newline
+            done = available == 0;
+            line = strview(begin, available);
+            start = filled;
+            return;
+        }
+
+        // keep the partial line and refill the rest of the buffer
+        memmove(buffer.data(), begin, available);
+        start = 0;
+        filled = available;
+        if (filled == buffer.size()) {
+            buffer.resize(buffer.size() * 2);
+        }
+        size_t count = fread(buffer.data() + filled, 1, buffer.size() - filled, fp);
+        filled += count;
+        eof = count == 0;
+    }
+}
+
+falcon::line_reader lines(file fp) {
+    return falcon::line_reader(fp);
+}
+
+i32 closefile(file fileptr, std::source_location where) {
+    if (fileptr == null) {
+        falcon::fail(where, 408, COLOR_ERROR "IO error:" COLOR_CLEAR " double free on closing file pointer ('%p')", &fileptr);
+    }
+
+#ifdef FALCON_ASYNC_LOG
+    // logf records for it may still be queued
+    falcon::log_sync();
+#endif
+    fclose(fileptr);
+    return 0;
+}
+
+
+strview slice(strview str, int start, int end, std::source_location where) {
+    int alen = str.length();
+
+    if (start < 0) {
+        falcon::fail(where, 512, COLOR_ERROR "Array index error:" COLOR_CLEAR " String slice start point is out of range. index at %d", start);
+    }
+
+    if (end > alen) {
+        falcon::fail(where, 100, COLOR_ERROR "Array index error:" COLOR_CLEAR " String slice end point is out of range. index at %d", end);
+    }
+
+    if (start > end) {
+        return strview();
+    }
+    str.at(end);
+    return str.substr(start, end - start + 1);
+}
+
+string slice(string&& str, int start, int end, std::source_location where) {
+    return string(slice(strview(str), start, end, where));
+}
+
+
+#ifdef FALCON_ASYNC_LOG
+
+// Arguments are stored in the payload as a tag byte and the value. What does
+// not fit is formatted into the spill string instead.
+enum log_tag : char {
+    LOG_I64 = 'i',
+    LOG_U64 = 'u',
+    LOG_F64 = 'f',
+    LOG_STRING = 's',
+};
+
+struct falcon::log_record {
+    size_t position;
+#ifdef FALCON_LOG_TIME
+    i64 time;
+#endif
+    const char *source;
+    int line;
+    const char *function;
+    file fp;
+    u32 size;
+    string *spill;
+    char payload[168];
+};
+
+namespace {
+
+    // A bounded multi-producer, single-consumer ring: producers claim a slot with
+    // one compare-and-swap on the tail, the background thread is the only reader.
+    class log_ring {
+        public:
+            log_ring() : slots(capacity), tail(0), head(0), stopping(false) {
+                for (size_t i = 0; i < capacity; i++) {
+                    slots[i].sequence.store(i, std::memory_order_relaxed);
+                }
+                writer = std::thread(&log_ring::run, this);
+            }
+
+            ~log_ring() {
+                stopping.store(true, std::memory_order_release);
+                writer.join();
+            }
+
+            falcon::log_record *claim() {
+                size_t position = tail.load(std::memory_order_relaxed);
+                while (true) {
+                    slot& claimed = slots[position & (capacity - 1)];
+                    size_t sequence = claimed.sequence.load(std::memory_order_acquire);
+                    if (sequence == position) {
+                        if (tail.compare_exchange_weak(position, position + 1, std::memory_order_relaxed)) {
+                            claimed.record.position = position;
+                            return &claimed.record;
+                        }
+                    } else if (sequence < position) {
+                        // full: wait for the writer
+                        std::this_thread::yield();
+                        position = tail.load(std::memory_order_relaxed);
+                    } else {
+                        position = tail.load(std::memory_order_relaxed);
+                    }
+                }
+            }
+
+            void publish(falcon::log_record *record) {
+                slots[record->position & (capacity - 1)].sequence.store(record->position + 1, std::memory_order_release);
+            }
+
+            // wait until everything logged so far is written
+            void sync() {
+                size_t position = tail.load(std::memory_order_acquire);
+                while (head.load(std::memory_order_acquire) < position) {
+                    std::this_thread::sleep_for(std::chrono::microseconds(100));
+                }
+            }
+
+        private:
+            static const size_t capacity = 1 << 12;
+
+            struct alignas(64) slot {
+                std::atomic<size_t> sequence;
+                falcon::log_record record;
+            };
+
+            // log() records (a null fp) go to falcon::output(), logf() records to their file
+            void run() {
+                file out = null;
+                string batch;
+                size_t logs = 0;
+                size_t position = head.load(std::memory_order_relaxed);
+                while (true) {
+                    slot& next = slots[position & (capacity - 1)];
+                    if (next.sequence.load(std::memory_order_acquire) == position + 1) {
+                        file fp = next.record.fp;
+                        if (fp != out || batch.size() >= 1 << 16) {
+                            write(out, batch, logs);
+                            out = fp;
+                        }
+                        format(next.record, batch);
+                        logs += fp == null;
+                        next.sequence.store(position + capacity, std::memory_order_release);
+                        position++;
+                        continue;
+                    }
+
+                    write(out, batch, logs);
+                    head.store(position, std::memory_order_release);
+                    if (stopping.load(std::memory_order_acquire) && position == tail.load(std::memory_order_acquire)) {
+                        return;
+                    }
+                    std::unique_lock<std::mutex> lock(log_mutex);
+                    log_wake.wait_for(lock, std::chrono::microseconds(500), [] { return log_hurry; });
+                    log_hurry = false;
+                }
+            }
+
+            static void write(file fp, string& batch, size_t& logs) {
+                if (batch.empty()) {
+                    return;
+                }
+                if (fp == null) {
+                    // the program waits on pending_logs and keeps off the buffer
+                    output_stream_instance().buffer.put(batch.data(), batch.size());
+                    pending_logs.fetch_sub(logs, std::memory_order_release);
+                    pending_logs.notify_all();
+                    logs = 0;
+                } else {
+                    fwrite(batch.data(), 1, batch.size(), fp);
+                    fflush(fp);
+                }
+                batch.clear();
+            }
+
+            static void format(falcon::log_record& record, string& out) {
+                char number[64];
+#ifdef FALCON_LOG_TIME
+                out += falcon::log_time(record.time).text;
+#endif
+                out += record.source;
+                out += ": ";
+                out += std::to_string(record.line);
+                out += ": ";
+                out += record.function;
+                if (record.fp == null) {
+                    out += "():  ";
+                } else {
+                    snprintf(number, sizeof(number), "(): fp @%p ", (void *) record.fp);
+                    out += number;
+                }
+
+                const char *item = record.payload;
+                const char *end = record.payload + record.size;
+                while (item < end) {
+                    char tag = *item++;
+                    if (tag == LOG_STRING) {
+                        u32 size;
+                        memcpy(&size, item, sizeof(size));
+                        out.append(item + sizeof(size), size);
+                        item += sizeof(size) + size;
+                        continue;
+                    }
+                    char *last = number;
+                    if (tag == LOG_I64) {
+                        i64 value;
+                        memcpy(&value, item, sizeof(value));
+                        last = std::to_chars(number, number + sizeof(number), value).ptr;
+                    } else if (tag == LOG_U64) {
+                        u64 value;
+                        memcpy(&value, item, sizeof(value));
+                        last = std::to_chars(number, number + sizeof(number), value).ptr;
+                    } else if (tag == LOG_F64) {
+                        f64 value;
+                        memcpy(&value, item, sizeof(value));
+                        // what std::ostream prints by default
+                        last = number + snprintf(number, sizeof(number), "%g", value);
+                    }
+                    out.append(number, last);
+                    item += 8;
+                }
+                if (record.spill != null) {
+                    out += *record.spill;
+                    delete record.spill;
+                }
+                if (record.fp == null) {
+                    out += '\n';
+                }
+            }
+
+            std::vector<slot> slots;
+            std::atomic<size_t> tail;
+            std::atomic<size_t> head;
+            std::atomic<bool> stopping;
+            std::thread writer;
+    };
+
+    std::atomic<bool> log_started(false);
+
+    log_ring& log_ring_instance() {
+        // the output is created first, so it outlives the writer that appends to it
+        output_stream_instance();
+        // started on first use, drained and joined by its destructor on exit
+        static log_ring instance;
+        log_started.store(true, std::memory_order_relaxed);
+        return instance;
+    }
+
+    template <typename Value>
+    void add_value(falcon::log_record *record, char tag, Value value) {
+        if (record->spill != null || record->size + 1 + sizeof(value) > sizeof(record->payload)) {
+            std::ostringstream text;
+            text << value;
+            falcon::log_add(record, strview(text.str()));
+            return;
+        }
+        record->payload[record->size] = tag;
+        memcpy(record->payload + record->size + 1, &value, sizeof(value));
+        record->size += 1 + sizeof(value);
+    }
+}
+
+falcon::log_record *falcon::log_begin(file fp, const char *source, int line, const char *function) {
+    falcon::log_record *record = log_ring_instance().claim();
+#ifdef FALCON_LOG_TIME
+    record->time = log_clock();
+#endif
+    if (fp == null) {
+        pending_logs.fetch_add(1, std::memory_order_relaxed);
+    }
+    record->source = source;
+    record->line = line;
+    record->function = function;
+    record->fp = fp;
+    record->size = 0;
+    record->spill = null;
+    return record;
+}
+
+void falcon::log_add(log_record *record, i64 value) {
+    add_value(record, LOG_I64, value);
+}
+
+void falcon::log_add(log_record *record, u64 value) {
+    add_value(record, LOG_U64, value);
+}
+
+void falcon::log_add(log_record *record, f64 value) {
+    add_value(record, LOG_F64, value);
+}
+
+void falcon::log_add(log_record *record, strview value) {
+    u32 size = value.size();
+    if (record->spill == null && record->size + 1 + sizeof(size) + size <= sizeof(record->payload)) {
+        record->payload[record->size] = LOG_STRING;
+        memcpy(record->payload + record->size + 1, &size, sizeof(size));
+        memcpy(record->payload + record->size + 1 + sizeof(size), value.data(), size);
+        record->size += 1 + sizeof(size) + size;
+    } else if (record->spill == null) {
+        record->spill = new string(value);
+    } else {
+        record->spill->append(value);
+    }
+}
+
+void falcon::log_commit(log_record *record) {
+    log_ring_instance().publish(record);
+}
+
+void falcon::log_sync() {
+    if (log_started.load(std::memory_order_relaxed)) {
+        log_ring_instance().sync();
+    }
+}
+
+#endif
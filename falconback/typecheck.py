@@ -0,0 +1,538 @@
+"""
+Typecheck
+---------
+
+Types of the expressions of a program, inferred after name resolution
+from literals, declarations and calls, for code generation to write
+concrete types where the program leaves them out, and type errors that
+would otherwise only surface in g++ output, or not at all.
+"""
+import re
+from collections import namedtuple
+from falconback import ast
+from falconback.errors import AbrvalgCompileTimeError
+from falconback.lexer import Token
+from falconback.usage import functions
+
+Types = namedtuple('Types', ['params', 'returns'])
+
+# types a number converts to and from without a cast
+NUMBER_TYPES = frozenset([
+    'i8', 'u8', 'i16', 'u16', 'i32', 'u32', 'i64', 'u64', 'f32', 'f64',
+    'bool', 'boolean', 'int', 'float', 'double', 'size_t',
+])
+TEXT_TYPES = frozenset(['string', 'strview'])
+
+# integer types after the usual arithmetic conversions, by rank
+PROMOTED = {
+    'bool': 'i32', 'boolean': 'i32', 'char': 'i32', 'i8': 'i32', 'u8': 'i32', 'i16': 'i32', 'u16': 'i32',
+    'int': 'i32', 'i32': 'i32', 'u32': 'u32', 'i64': 'i64', 'u64': 'u64', 'size_t': 'u64',
+}
+RANKS = ('i32', 'u32', 'i64', 'u64')
+FLOATS = {'f32': 'f32', 'float': 'f32', 'f64': 'f64', 'double': 'f64'}
+
+# return types of builtins that name a C++ type
+BUILTIN_RETURNS = {
+    'size': 'i32', 'string': 'string', 'bool': 'bool', 'i32': 'i32', 'i64': 'i64', 'f64': 'f64',
+    'file': 'file', 'strview': 'strview', 'lines': 'lines',
+}
+
+COMPARISONS = ('>', '>=', '<', '<=', '==', '!=', '&&', '||')
+INT_MAX = 2 ** 31 - 1
+
+_word_regex = re.compile(r'[A-Za-z_]\w*')
+
+
+def arithmetic(left, right):
+    """The type of ``left`` and ``right`` combined by an arithmetic operator, or None."""
+    if left in FLOATS or right in FLOATS:
+        if (left not in FLOATS and left not in PROMOTED) or (right not in FLOATS and right not in PROMOTED):
+            return None
+        return 'f64' if 'f64' in (FLOATS.get(left), FLOATS.get(right)) else 'f32'
+    if left not in PROMOTED or right not in PROMOTED:
+        return None
+    return max(PROMOTED[left], PROMOTED[right], key=RANKS.index)
+
+
+def element_type(kind):
+    """The type of the elements of a ``kind`` array, string or dict, or None."""
+    if kind is None:
+        return None
+    if kind.startswith('std::vector<') and kind.endswith('>'):
+        return kind[len('std::vector<'):-1]
+    if kind in TEXT_TYPES:
+        return 'char'
+    return None
+
+
+def dict_types(kind):
+    """The key and value types of a ``dict<K, V>``, or None."""
+    if kind is None or not kind.startswith('dict<') or not kind.endswith('>'):
+        return None
+    inner = kind[len('dict<'):-1]
+    depth = 0
+    for i, char in enumerate(inner):
+        if char == '<':
+            depth += 1
+        elif char == '>':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            return inner[:i].strip(), inner[i + 1:].strip()
+    return None
+
+
+def mismatch(expected, actual):
+    """Whether a value of type ``actual`` cannot stand where ``expected`` is declared."""
+    return (expected in NUMBER_TYPES and actual in TEXT_TYPES) or (expected in TEXT_TYPES and actual in NUMBER_TYPES)
+
+
+def first_token(node):
+    """The leftmost name token of the expression ``node``, or None."""
+    work = [node]
+    while work:
+        node = work.pop()
+        if isinstance(node, Token):
+            return node
+        if type(node) == ast.Identifier:
+            work.append(node.value)
+        elif type(node) == ast.Call:
+            work.append(node.left)
+        elif isinstance(node, (tuple, list)):
+            work.extend(reversed(node))
+    return None
+
+
+class TypeInference(object):
+    """
+    Infers the types of a program. An untyped parameter gets the type
+    every call passes it, and a function without a return type the one
+    every ``return`` gives it. Both are first assumed from the calls and
+    returns whose types are known, which lets recursion through the
+    function agree with itself, then dropped wherever a call or return
+    disagrees, until nothing changes.
+
+    Only programs with a ``main`` are inferred, since the functions of a
+    library may be called with anything. Functions that share a name with
+    another function or a builtin, and functions named in inline C++, are
+    overloads or called from code we cannot see, and are left alone.
+    """
+
+    def __init__(self, program, env):
+        self.env = env
+        self.bindings = env.bindings
+        self.params = {}
+        self.returns = {}
+        # id of an expression -> its type under the assumed types, which
+        # are in memo_key, and the types that do not depend on them
+        self.memo = {}
+        self.memo_key = None
+        self.known = {}
+        # how often an assumed type was looked up, to tell the two apart
+        self.assumed_reads = 0
+        # class name -> (top level index, {member name: TypedName or Function})
+        self.classes = {}
+        # id of a function -> top level index of the statement it is in
+        self.positions = {}
+        self.functions = []
+        self.calls = []
+        counts = {}
+        for index, statement in enumerate(program.body):
+            if type(statement) == ast.ClassDefinition:
+                members = {}
+                for stmt in statement.body:
+                    if type(stmt) in (ast.TypedName, ast.Function):
+                        members.setdefault(stmt.name.value, stmt)
+                self.classes.setdefault(statement.name.value, (index, members))
+                methods = [stmt for stmt in statement.body if type(stmt) == ast.Function]
+            elif type(statement) == ast.Function:
+                methods = [statement]
+            else:
+                continue
+            for function in methods:
+                self.positions[id(function)] = index
+                counts[function.name.value] = counts.get(function.name.value, 0) + 1
+        self.has_main = any(type(statement) == ast.Function and statement.name.value == 'main' for statement in program.body)
+        self.inline = set()
+        work = [program.body]
+        while work:
+            node = work.pop()
+            if type(node) == ast.Cpp:
+                for statement in node.statements:
+                    self.inline.update(_word_regex.findall(statement.value))
+            elif type(node) in (ast.Call, ast.ClassAccess):
+                self.calls.append(node)
+            if isinstance(node, (tuple, list)) and not isinstance(node, Token):
+                work.extend(node)
+        self.overloaded = set(name for name, count in counts.items() if count > 1 or name in env.builtins)
+        self.functions = list(functions(program.body))
+
+    def decl_type(self, decl, seen):
+        tp = type(decl)
+        if tp == ast.TypedName:
+            return decl.type.value
+        if tp == ast.TypedParam:
+            return decl.data_type.value
+        if tp == ast.InferedName:
+            if id(decl) in seen:
+                return None
+            return self.type_of(decl.value, seen | {id(decl)})
+        if tp == Token:
+            self.assumed_reads += 1
+            return self.params.get(id(decl))
+        if tp == ast.ForLoop:
+            collection = decl.collection
+            if type(collection) == ast.BinaryOperator and collection.operator in ('..', '...'):
+                left = self.type_of(collection.left, seen)
+                return left if left == self.type_of(collection.right, seen) else None
+            kind = self.type_of(collection, seen)
+            if kind == 'lines':
+                return 'strview'
+            keys = dict_types(kind)
+            return keys[0] if keys is not None else element_type(kind)
+        return None
+
+    def callee(self, node):
+        """The Function or class constructor the call ``node`` binds to, or None."""
+        if type(node.left) != ast.Identifier:
+            return None
+        binding = self.bindings.get(id(node.left.value))
+        return binding.value if binding is not None else None
+
+    def method(self, node):
+        """The method the member call ``node`` names, or None."""
+        if type(node.right) != ast.Call or type(node.right.left) != ast.Identifier:
+            return None
+        kind = self.type_of(node.left)
+        if kind not in self.classes:
+            return None
+        member = self.classes[kind][1].get(node.right.left.value.value)
+        return member if type(member) == ast.Function else None
+
+    def operands(self, node):
+        """The operands whose types give the type of ``node``, or None if it has none."""
+        tp = type(node)
+        if tp == ast.GroupExpression:
+            return [node.left]
+        if tp == ast.UnaryOperator and node.operator != '!':
+            return [node.right]
+        if tp == ast.BinaryOperator and node.operator not in COMPARISONS:
+            return [node.left, node.right]
+        if tp == ast.SubscriptOperator:
+            return [node.left]
+        if tp == ast.Array:
+            return node.items
+        if tp == ast.ClassAccess and type(node.right) == ast.Identifier:
+            return [node.left]
+        return None
+
+    def combine(self, node, kinds):
+        """The type of ``node`` from the types of its operands."""
+        tp = type(node)
+        if tp == ast.GroupExpression:
+            return kinds[0]
+        if tp == ast.UnaryOperator:
+            return arithmetic(kinds[0], 'i32')
+        if tp == ast.BinaryOperator:
+            left, right = kinds
+            if node.operator == '+' and 'string' in (left, right):
+                other = right if left == 'string' else left
+                return 'string' if other in TEXT_TYPES or other == 'char' else None
+            return arithmetic(left, right)
+        if tp == ast.SubscriptOperator:
+            values = dict_types(kinds[0])
+            return values[1] if values is not None else element_type(kinds[0])
+        if tp == ast.Array:
+            items = set(kinds)
+            if len(items) != 1 or None in items:
+                return None
+            return 'std::vector<{}>'.format(items.pop())
+        if kinds[0] in self.classes:
+            member = self.classes[kinds[0]][1].get(node.right.value.value)
+            return member.type.value if type(member) == ast.TypedName else None
+        return None
+
+    def leaf_type(self, node, seen):
+        tp = type(node)
+        if tp == ast.Number:
+            if type(node.value) == float:
+                return 'f64'
+            return 'i32' if abs(node.value) <= INT_MAX else 'i64'
+        if tp == ast.String:
+            return 'string'
+        if tp in (ast.UnaryOperator, ast.BinaryOperator):
+            # negations and comparisons
+            return 'bool'
+        if tp == ast.Identifier:
+            if not isinstance(node.value, Token):
+                return None
+            if node.value.value in ('true', 'false'):
+                return 'bool'
+            binding = self.bindings.get(id(node.value))
+            return self.decl_type(binding.value, seen) if binding is not None else None
+        if tp == ast.Call:
+            fx = self.callee(node)
+            if isinstance(fx, ast.Call):
+                return fx.left
+            if not isinstance(fx, ast.Function):
+                return None
+            if isinstance(fx.name, Token):
+                return fx.ret.value if fx.ret is not None else self.assumed_return(fx)
+            if fx.name.value == 'slice' and node.arguments:
+                return 'strview' if self.type_of(node.arguments[0], seen) in TEXT_TYPES else None
+            return BUILTIN_RETURNS.get(fx.ret)
+        if tp == ast.ClassAccess:
+            fx = self.method(node)
+            if fx is None:
+                return None
+            return fx.ret.value if fx.ret is not None else self.assumed_return(fx)
+        return None
+
+    def assumed_return(self, fx):
+        self.assumed_reads += 1
+        return self.returns.get(id(fx))
+
+    def type_of(self, node, seen=frozenset()):
+        """
+        The type of the expression ``node``, or None if it is not known.
+        Operands are typed before the operation on them, from a work list
+        like fold in the optimizer. Types that read an assumed type are
+        kept until the assumed types change, the others for good.
+        """
+        key = id(node)
+        if key in self.known:
+            return self.known[key]
+        if key in self.memo:
+            return self.memo[key]
+        # (node, operands already typed)
+        work = [(node, False)]
+        # (type, whether it read an assumed type)
+        kinds = []
+        while work:
+            node, ready = work.pop()
+            key = id(node)
+            if key in self.known:
+                kinds.append((self.known[key], False))
+                continue
+            if key in self.memo:
+                kinds.append((self.memo[key], True))
+                continue
+            operands = self.operands(node)
+            if operands is None:
+                reads = self.assumed_reads
+                kind = self.leaf_type(node, seen)
+                assumed = self.assumed_reads != reads
+            elif not ready:
+                work.append((node, True))
+                work.extend((operand, False) for operand in reversed(operands))
+                continue
+            else:
+                typed = kinds[len(kinds) - len(operands):]
+                del kinds[len(kinds) - len(operands):]
+                kind = self.combine(node, [operand for operand, _ in typed])
+                assumed = any(read for _, read in typed)
+            (self.memo if assumed else self.known)[key] = kind
+            kinds.append((kind, assumed))
+        return kinds[0][0]
+
+    def emittable(self, kind, function):
+        """
+        Whether ``kind`` can be written in the signature of ``function``:
+        a C++ type whose classes are all declared before it.
+        """
+        if kind is None or kind == 'lines':
+            return False
+        position = self.positions[id(function)]
+        for word in _word_regex.findall(kind):
+            if word in self.classes and self.classes[word][0] >= position:
+                return False
+        return True
+
+    def inferable(self, function):
+        return (id(function) in self.positions and function.name.value not in self.overloaded
+                and function.name.value not in self.inline and function.name.value != 'main')
+
+    def arguments(self):
+        """(function, argument nodes) for every call of an inferable function."""
+        for node in self.calls:
+            if type(node) == ast.Call:
+                fx = self.callee(node)
+                arguments = node.arguments
+            elif type(node.right) == ast.Call:
+                fx = self.method(node)
+                arguments = node.right.arguments
+            else:
+                continue
+            if isinstance(fx, ast.Function) and isinstance(fx.name, Token) and self.inferable(fx):
+                yield fx, arguments
+
+    def observed(self):
+        """
+        The types the calls pass to every untyped parameter and the types
+        every function without a return type returns, by id, under the
+        types assumed so far. None stands for a type that is not known.
+        """
+        key = (self.params, self.returns)
+        if key != self.memo_key:
+            self.memo, self.memo_key = {}, key
+        passed = {}
+        for fx, arguments in self.arguments():
+            if len(arguments) != len(fx.params):
+                continue
+            for param, argument in zip(fx.params, arguments):
+                if type(param) == Token:
+                    passed.setdefault(id(param), set()).add(self.type_of(argument))
+        returned = {}
+        for fx in self.functions:
+            if fx.ret is not None or not self.inferable(fx):
+                continue
+            kinds = returned.setdefault(id(fx), set())
+            work = list(fx.body)
+            while work:
+                node = work.pop()
+                tp = type(node)
+                if tp == ast.Return:
+                    # a view of a local is returned as a copy
+                    kind = self.type_of(node.value) if node.value is not None else 'void'
+                    kinds.add(None if kind == 'strview' else kind)
+                elif tp == ast.Condition:
+                    work.extend(node.if_body)
+                    for cond in node.elifs:
+                        work.extend(cond.body)
+                    work.extend(node.else_body or [])
+                elif tp == ast.Match:
+                    for pattern in node.patterns:
+                        work.extend(pattern.body)
+                    work.extend(node.else_body or [])
+                elif tp in (ast.WhileLoop, ast.ForLoop):
+                    work.extend(node.body)
+        return passed, returned
+
+    def infer(self):
+        if not self.has_main:
+            return Types({}, {})
+        untyped = {}
+        for fx in self.functions:
+            if self.inferable(fx):
+                for param in fx.params:
+                    if type(param) == Token:
+                        untyped[id(param)] = fx
+        # assume what the known types agree on
+        for _ in range(len(self.functions) + 2):
+            passed, returned = self.observed()
+            assumed = {}
+            for key, fx in untyped.items():
+                kinds = passed.get(key, set()) - {None}
+                if len(kinds) == 1 and self.emittable(next(iter(kinds)), fx):
+                    assumed[key] = next(iter(kinds))
+            results = {}
+            for fx in self.functions:
+                kinds = returned.get(id(fx), set()) - {None}
+                if len(kinds) == 1 and 'void' not in kinds and self.emittable(next(iter(kinds)), fx):
+                    results[id(fx)] = next(iter(kinds))
+            if assumed == self.params and results == self.returns:
+                break
+            self.params, self.returns = assumed, results
+        # then keep only what every call and return agrees with
+        while True:
+            passed, returned = self.observed()
+            params = dict((key, kind) for key, kind in self.params.items() if passed.get(key) == {kind})
+            returns = dict((key, kind) for key, kind in self.returns.items() if returned.get(key) == {kind})
+            if params == self.params and returns == self.returns:
+                break
+            self.params, self.returns = params, returns
+        return Types(self.params, self.returns)
+
+    def report(self, token, expected, actual):
+        if token is None:
+            return
+        message = 'Type mismatch: expected {} but got {}'.format(expected, actual)
+        self.env.report(AbrvalgCompileTimeError(message, token.line, token.column), len(str(token.value)))
+
+    def check_value(self, expected, node, anchor):
+        actual = self.type_of(node)
+        if mismatch(expected, actual):
+            self.report(first_token(node) or anchor, expected, actual)
+
+    def check_expression(self, node, anchor):
+        work = [node]
+        while work:
+            node = work.pop()
+            tp = type(node)
+            if tp == ast.BinaryOperator and node.operator not in ('..', '...', '&&', '||'):
+                left, right = self.type_of(node.left), self.type_of(node.right)
+                if mismatch(left, right) or mismatch(right, left) or (
+                        node.operator in ('-', '*', '/', '%') and (left in TEXT_TYPES or right in TEXT_TYPES)):
+                    self.report(first_token(node) or anchor, left, right)
+            if tp == ast.Call and isinstance(self.callee(node), ast.Function):
+                self.check_call(self.callee(node), node.arguments, node.left.value)
+            if tp == ast.ClassAccess and self.method(node) is not None:
+                self.check_call(self.method(node), node.right.arguments, node.right.left.value)
+            if tp in (ast.Function, ast.ClassDefinition, ast.Cpp) or isinstance(node, Token):
+                continue
+            if isinstance(node, (tuple, list)):
+                work.extend(node)
+
+    def check_call(self, fx, arguments, token):
+        if not isinstance(fx.name, Token) or fx.name.value in self.overloaded or len(arguments) != len(fx.params):
+            return
+        for param, argument in zip(fx.params, arguments):
+            if type(param) == ast.TypedParam:
+                self.check_value(param.data_type.value, argument, token)
+
+    def check_statements(self, statements, function):
+        for node in statements:
+            tp = type(node)
+            if tp == ast.Function:
+                self.check_statements(node.body, node)
+            elif tp == ast.ClassDefinition:
+                self.check_statements(node.body, function)
+            elif tp == ast.TypedName and node.value is not None:
+                self.check_value(node.type.value, node.value, node.name)
+                self.check_expression(node.value, node.name)
+            elif tp == ast.InferedName:
+                self.check_expression(node.value, node.name)
+            elif tp == ast.Assignment:
+                if type(node.left) == ast.Identifier and isinstance(node.left.value, Token):
+                    binding = self.bindings.get(id(node.left.value))
+                    expected = self.decl_type(binding.value, frozenset()) if binding is not None else None
+                    self.check_value(expected, node.right, node.left.value)
+                self.check_expression(node.right, first_token(node.left))
+            elif tp == ast.Return and node.value is not None:
+                if function is not None and function.ret is not None:
+                    self.check_value(function.ret.value, node.value, function.name)
+                self.check_expression(node.value, function.name if function is not None else None)
+            elif tp == ast.Condition:
+                self.check_expression(node.test, None)
+                self.check_statements(node.if_body, function)
+                for cond in node.elifs:
+                    self.check_expression(cond.test, None)
+                    self.check_statements(cond.body, function)
+                self.check_statements(node.else_body or [], function)
+            elif tp == ast.Match:
+                self.check_expression(node.test, None)
+                # each case is compared with the test, as == would be
+                for pattern in node.patterns:
+                    self.check_value(self.type_of(node.test), pattern.pattern, first_token(node.test))
+                    self.check_expression(pattern.pattern, None)
+                self.check_statements([statement for pattern in node.patterns for statement in pattern.body], function)
+                self.check_statements(node.else_body or [], function)
+            elif tp == ast.WhileLoop:
+                self.check_expression(node.test, None)
+                self.check_statements(node.body, function)
+            elif tp == ast.ForLoop:
+                self.check_expression(node.collection, None)
+                self.check_statements(node.body, function)
+            elif tp in (ast.Call, ast.ClassAccess):
+                self.check_expression(node, None)
+
+
+def infer(program, env):
+    """
+    Infer the types of the untyped parameters and return types of
+    ``program``, by id of the parameter token and of the function, and
+    report its type errors through the CompilationContext ``env``.
+    """
+    inference = TypeInference(program, env)
+    types = inference.infer()
+    inference.check_statements(program.body, None)
+    return types
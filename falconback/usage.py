@@ -0,0 +1,308 @@
+"""
+Usage
+-----
+
+How functions use their parameters and variables, found after name
+resolution for code generation to pick between copies, references and
+moves.
+"""
+from collections import namedtuple
+from falconback import ast
+from falconback.lexer import Token
+
+Usage = namedtuple('Usage', ['references', 'moves'])
+
+# types that are no more expensive to copy than to refer to
+SCALAR_TYPES = frozenset([
+    'i8', 'u8', 'i16', 'u16', 'i32', 'u32', 'i64', 'u64', 'f32', 'f64',
+    'bool', 'boolean', 'char', 'int', 'float', 'double', 'size_t', 'file', 'strview',
+])
+
+# builtins that modify their first argument
+MUTATING_BUILTINS = ('erase', 'append', 'reserve')
+
+# builtins that return a view into their first argument
+VIEW_BUILTINS = ('slice',)
+
+# builtins that return a new string or array
+OWNING_RETURNS = ('string', 'owned')
+
+
+# A read of a declaration: the name token, the loops around it, the
+# innermost statement it is part of, and for arguments the function
+# called and the parameter index.
+Use = namedtuple('Use', ['token', 'loops', 'statement', 'movable', 'callee', 'index'])
+
+
+def declared_type(decl):
+    """The type name of a parameter or variable declaration, or None if it has none."""
+    if type(decl) == ast.TypedParam:
+        return decl.data_type.value
+    if type(decl) == ast.TypedName:
+        return decl.type.value
+    return None
+
+
+def is_user_function(value):
+    return isinstance(value, ast.Function) and isinstance(value.name, Token)
+
+
+class FunctionUsage(object):
+    """
+    Walks the body of one function, given its parameters and statements,
+    in source order and records, for every declaration its names are bound
+    to, whether it may be modified and where it is read.
+
+    A declaration counts as modified when it is assigned to, assigned
+    through a subscript or a member, has a method called, is erased from
+    or is returned, since returning a parameter is cheaper from a copy
+    the function owns. A subscript read counts too unless the type is
+    known not to be a dict, whose subscript inserts missing keys. Inline
+    C++ may do anything with any name, so a function with a ``__cpp__``
+    block is left alone.
+    """
+
+    def __init__(self, params, statements, bindings):
+        self.bindings = bindings
+        self.modified = set()
+        self.viewed = set()
+        self.uses = {}
+        # ids of the loops around each declaration, by id: equal loops in
+        # different places are still different loops
+        self.scopes = {}
+        self.decls = {}
+        self.opaque = False
+        for param in params:
+            self.declare(param, ())
+        self.walk_statements(statements, ())
+
+    def declare(self, decl, loops):
+        self.scopes[id(decl)] = loops
+        self.decls[id(decl)] = decl
+
+    def decl_of(self, node):
+        """The declaration the name ``node`` is bound to, through subscripts and groups."""
+        while type(node) in (ast.SubscriptOperator, ast.GroupExpression):
+            node = node.left
+        if type(node) != ast.Identifier:
+            return None
+        binding = self.bindings.get(id(node.value))
+        return binding.value if binding is not None else None
+
+    def modify(self, node):
+        decl = self.decl_of(node)
+        if decl is not None:
+            self.modified.add(id(decl))
+
+    def walk_statements(self, statements, loops):
+        for statement in statements:
+            self.walk_statement(statement, loops)
+
+    def walk_statement(self, node, loops):
+        tp = type(node)
+        if tp in (ast.TypedName, ast.InferedName):
+            self.declare(node, loops)
+            if node.value is not None:
+                self.walk_expression(node.value, loops, node, movable=True)
+        elif tp == ast.Assignment:
+            if type(node.left) == ast.ClassAccess:
+                self.modify(node.left.left)
+                self.walk_expression(node.left.left, loops, node)
+            else:
+                self.modify(node.left)
+                if type(node.left) == ast.SubscriptOperator:
+                    self.walk_expression(node.left, loops, node)
+            # moving a variable into itself would empty it
+            target = self.decl_of(node.left)
+            movable = target is None or target is not self.decl_of(node.right)
+            self.walk_expression(node.right, loops, node, movable=movable)
+        elif tp == ast.Return:
+            if node.value is not None:
+                if type(node.value) == ast.Identifier:
+                    self.modify(node.value)
+                self.walk_expression(node.value, loops, node)
+        elif tp == ast.Condition:
+            self.walk_expression(node.test, loops, node)
+            self.walk_statements(node.if_body, loops)
+            for cond in node.elifs:
+                self.walk_expression(cond.test, loops, cond)
+                self.walk_statements(cond.body, loops)
+            if node.else_body is not None:
+                self.walk_statements(node.else_body, loops)
+        elif tp == ast.Match:
+            self.walk_expression(node.test, loops, node)
+            for pattern in node.patterns:
+                self.walk_expression(pattern.pattern, loops, pattern)
+                self.walk_statements(pattern.body, loops)
+            if node.else_body is not None:
+                self.walk_statements(node.else_body, loops)
+        elif tp == ast.WhileLoop:
+            # the test runs on every iteration
+            inner = loops + (id(node),)
+            self.walk_expression(node.test, inner, node)
+            self.walk_statements(node.body, inner)
+        elif tp == ast.ForLoop:
+            self.walk_expression(node.collection, loops, node)
+            inner = loops + (id(node),)
+            self.declare(node, inner)
+            self.walk_statements(node.body, inner)
+        elif tp == ast.Cpp:
+            self.opaque = True
+        elif tp in (ast.Function, ast.ClassDefinition, ast.Enum, ast.UsingNode, ast.Break, ast.Continue):
+            pass
+        else:
+            self.walk_expression(node, loops, node)
+
+    def walk_expression(self, node, loops, statement, movable=False):
+        # (node, movable, callee, index); a work list like the resolver's
+        work = [(node, movable, None, None)]
+        while work:
+            node, movable, callee, index = work.pop()
+            tp = type(node)
+            if tp == ast.Identifier:
+                self.read(node, loops, statement, movable, callee, index)
+            elif tp == ast.Call:
+                self.walk_call(node, work)
+            elif tp == ast.ClassAccess:
+                # the right side names a member, only call arguments are reads
+                if type(node.right) == ast.Call:
+                    self.modify(node.left)
+                    work.extend((argument, False, None, None) for argument in reversed(node.right.arguments))
+                work.append((node.left, False, None, None))
+            elif tp == ast.SubscriptOperator:
+                decl = self.decl_of(node.left)
+                kind = declared_type(decl)
+                if kind is None and type(decl) == ast.InferedName and type(decl.value) in (ast.Array, ast.String):
+                    kind = type(decl.value).__name__
+                if kind is None or kind.startswith('dict<'):
+                    self.modify(node.left)
+                work += ((node.key, False, None, None), (node.left, False, None, None))
+            elif tp == ast.BinaryOperator:
+                work += ((node.right, False, None, None), (node.left, False, None, None))
+            elif tp in (ast.UnaryOperator, ast.GroupExpression):
+                work.append((node.right if tp == ast.UnaryOperator else node.left, False, None, None))
+            elif tp == ast.Array:
+                work.extend((item, False, None, None) for item in reversed(node.items))
+            elif tp == ast.Dictionary:
+                for key, value in reversed(node.items):
+                    work += ((value, False, None, None), (key, False, None, None))
+
+    def walk_call(self, node, work):
+        binding = self.bindings.get(id(node.left.value))
+        fx = binding.value if binding is not None else None
+        name = fx.name.value if isinstance(fx, ast.Function) and type(fx.name) == ast.Identifier else None
+        if name in MUTATING_BUILTINS and node.arguments:
+            self.modify(node.arguments[0])
+        if name in VIEW_BUILTINS and node.arguments:
+            decl = self.decl_of(node.arguments[0])
+            if decl is not None:
+                self.viewed.add(id(decl))
+        # arguments of functions and constructors of the program may be moved
+        callee = fx if is_user_function(fx) or isinstance(fx, ast.Call) else None
+        for index in range(len(node.arguments) - 1, -1, -1):
+            work.append((node.arguments[index], callee is not None, callee, index))
+
+    def read(self, node, loops, statement, movable, callee, index):
+        binding = self.bindings.get(id(node.value))
+        if binding is None or id(binding.value) not in self.scopes:
+            return
+        use = Use(node.value, loops, statement, movable, callee, index)
+        self.uses.setdefault(id(binding.value), []).append(use)
+
+    def references(self):
+        """The parameters and for loops whose names can be bound by ``const&``."""
+        if self.opaque:
+            return set()
+        found = set()
+        for key, decl in self.decls.items():
+            if key in self.modified:
+                continue
+            if type(decl) == ast.ForLoop:
+                found.add(key)
+            elif (type(decl) == ast.TypedParam and decl.data_type.value not in SCALAR_TYPES) or type(decl) == Token:
+                found.add(key)
+        return found
+
+    def owns_value(self, decl, references):
+        """Whether the declaration holds a value of its own that is worth moving."""
+        if id(decl) in references or id(decl) in self.viewed:
+            return False
+        kind = declared_type(decl)
+        if kind is not None:
+            return kind not in SCALAR_TYPES
+        if type(decl) == ast.InferedName:
+            return is_owning_expression(decl.value, self.bindings)
+        # untyped parameters and loop variables taken by value
+        return type(decl) in (Token, ast.ForLoop)
+
+    def moves(self, references):
+        """
+        The uses that are the last read of a variable, where its value can
+        be moved: the last one in source order, outside any loop the
+        variable was not declared in and not next to another read of it in
+        the same statement.
+        """
+        if self.opaque:
+            return []
+        found = []
+        for key, uses in self.uses.items():
+            last = uses[-1]
+            if not last.movable or last.loops != self.scopes[key]:
+                continue
+            if len(uses) > 1 and uses[-2].statement is last.statement:
+                continue
+            if self.owns_value(self.decls[key], references):
+                found.append(last)
+        return found
+
+
+def is_owning_expression(node, bindings):
+    """Whether ``node`` makes a new string, array or dict."""
+    if type(node) in (ast.String, ast.Array, ast.Dictionary):
+        return True
+    if type(node) == ast.Call:
+        binding = bindings.get(id(node.left.value))
+        fx = binding.value if binding is not None else None
+        if isinstance(fx, ast.Call):
+            return True
+        if is_user_function(fx):
+            return fx.ret is not None and fx.ret.value not in SCALAR_TYPES
+        if isinstance(fx, ast.Function):
+            return fx.ret in OWNING_RETURNS
+    return False
+
+
+def functions(statements):
+    """The functions and methods declared in ``statements``."""
+    for statement in statements:
+        if type(statement) == ast.Function:
+            yield statement
+            for nested in functions(statement.body):
+                yield nested
+        elif type(statement) == ast.ClassDefinition:
+            for method in functions(statement.body):
+                yield method
+
+
+def analyze(program, env):
+    """
+    Find the parameters and for loop variables of ``program`` that are
+    never modified, by id of their declaration, and the name tokens that
+    are the last read of a variable, by id. Arguments are only moved into
+    parameters that are taken by value.
+    """
+    analyses = [FunctionUsage(function.params, function.body, env.bindings) for function in functions(program.body)]
+    references = set()
+    for analysis in analyses:
+        references |= analysis.references()
+    moves = set()
+    for analysis in analyses:
+        for use in analysis.moves(references):
+            if is_user_function(use.callee):
+                params = use.callee.params
+                if use.index >= len(params) or id(params[use.index]) in references:
+                    continue
+                if declared_type(params[use.index]) in SCALAR_TYPES:
+                    continue
+            moves.add(id(use.token))
+    return Usage(references, moves)
@@ -5,6 +5,7 @@ Utils
 Utility functions.
 """
 import pprint
+from falconback.usage import functions
 
 _pp = pprint.PrettyPrinter(indent=2)
 
@@ -36,3 +37,24 @@ def print_tokens(tokens):
 
 def print_env(env):
     _pp.pprint(env.asdict())
+
+
+def print_hoisted(hoists):
+    for line, code, name in hoists:
+        print('line {}: {} -> {}'.format(line, code, name))
+
+
+def print_removed(names):
+    for name in names:
+        print(name)
+
+
+def print_types(statements, types):
+    for function in functions(statements):
+        params = [p for p in function.params if id(p) in types.params]
+        if not params and id(function) not in types.returns:
+            continue
+        print('line {}: {}({}) -> {}'.format(
+            function.name.line, function.name.value,
+            ', '.join('{}: {}'.format(p.value, types.params[id(p)]) for p in params),
+            types.returns.get(id(function), function.ret.value if function.ret is not None else 'auto')))
@@ -0,0 +1,65 @@
+"""
+Writer
+------
+
+Streaming code writer.
+"""
+
+
+class CodeWriter(object):
+    """
+    Evaluators append code fragments with ``write``. Fragments are collected
+    and handed to ``stream`` every ``buffer_size`` characters, so the program
+    is never held in memory as a whole. Every line is prefixed with
+    ``indent_symbol`` once per open ``indent``.
+    """
+
+    def __init__(self, stream, indent_symbol=' ' * 4, buffer_size=1 << 16):
+        self.stream = stream
+        self.indent_symbol = indent_symbol
+        self.buffer_size = buffer_size
+        self.level = 0
+        self._prefix = ''
+        self._line_start = True
+        self._parts = []
+        self._size = 0
+
+    def indent(self):
+        self.level += 1
+        self._prefix = self.indent_symbol * self.level
+
+    def dedent(self):
+        self.level -= 1
+        self._prefix = self.indent_symbol * self.level
+
+    def _indent_lines(self, text):
+        lines = text.split('\n')
+        for i, line in enumerate(lines):
+            if i:
+                self._line_start = True
+            if line and self._line_start:
+                lines[i] = self._prefix + line
+                self._line_start = False
+        return '\n'.join(lines)
+
+    def write(self, text):
+        if not text:
+            return
+        if '\n' not in text:
+            if self._line_start and self._prefix:
+                text = self._prefix + text
+            self._line_start = False
+        elif self._prefix:
+            text = self._indent_lines(text)
+        else:
+            self._line_start = text[-1] == '\n'
+        self._parts.append(text)
+        self._size += len(text)
+        if self._size >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self._parts:
+            self.stream.write(''.join(self._parts))
+            self._parts = []
+            self._size = 0